@@ -0,0 +1,93 @@
+"""
+告警检测基准：在临时数据库上对 10~10000 个测点配置调用 POST /alerts/check 的路由函数，
+对比逐个配置查询最新值（改动前的做法）和一次查询加 NumPy 整批比较的耗时，以及 window 模式判断一天内全部读数的耗时。
+
+运行:
+    python benchmarks/bench_alerts.py --sizes 10,100,1000,10000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from sqlalchemy import insert  # noqa: E402
+from sql_app import async_crud, crud, database, migrations, models, rollups, schemas  # noqa: E402
+import main  # noqa: E402
+
+migrations.migrate()
+
+def seed(points: int, readings: int) -> datetime:
+    start = datetime(2024, 1, 1)
+    with database.SessionLocal() as db:
+        db.execute(insert(models.MonitorPoint), [
+            {"point_code": f"P{i}", "point_name": f"测点{i}", "device_type": "水位", "longitude": 0, "latitude": 0, "height": 0}
+            for i in range(points)
+        ])
+        db.commit()
+        items = [
+            schemas.MeasurementCreate(point_code=f"P{i}", value=random.uniform(0, 100), time=start + timedelta(hours=h))
+            for h in range(readings) for i in range(points)
+        ]
+        for offset in range(0, len(items), 20000):
+            crud.bulk_create(db, rollups.MEASUREMENTS, items[offset:offset + 20000])
+    return start + timedelta(hours=readings)
+
+async def legacy_check(db, configs):
+    """改动前的做法：每个配置查询一次最新值"""
+    found = 0
+    for alert_config in configs:
+        latest = await async_crud.get_latest_row(db, rollups.MEASUREMENTS, alert_config.point_code)
+        if latest is None:
+            continue
+        await async_crud.get_cached_point(db, alert_config.point_code)
+        if alert_config.max_value is not None and latest.value > alert_config.max_value:
+            found += 1
+        if alert_config.min_value is not None and latest.value < alert_config.min_value:
+            found += 1
+    return found
+
+async def timed(call, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with database.AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await call(db)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+async def run(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    end = seed(max(sizes), args.readings)
+    window_start = end - timedelta(days=1)
+
+    # 预热连接、测点缓存和编译缓存
+    async with database.AsyncSessionLocal() as db:
+        await main.check_alerts([schemas.AlertConfig(point_code="P0", max_value=95.0)], mode="latest", start_time=None, end_time=None, db=db)
+
+    print(f"{'配置数':>8} {'逐条查询(ms)':>14} {'批量 latest(ms)':>16} {'批量 window(ms)':>16}")
+    for size in sizes:
+        configs = [schemas.AlertConfig(point_code=f"P{i}", min_value=5.0, max_value=95.0) for i in range(size)]
+        batch = await timed(lambda db: main.check_alerts(configs, mode="latest", start_time=None, end_time=None, db=db), args.repeat)
+        window = await timed(lambda db: main.check_alerts(configs, mode="window", start_time=window_start, end_time=None, db=db), args.repeat)
+        if size <= args.legacy_limit:
+            legacy = f"{await timed(lambda db: legacy_check(db, configs), args.repeat):>14.1f}"
+        else:
+            legacy = f"{'跳过':>12}"
+        print(f"{size:>8} {legacy} {batch:>16.1f} {window:>16.1f}")
+    await database.async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="告警检测基准")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="逗号分隔的配置个数（每个配置一个测点）")
+    parser.add_argument("--readings", type=int, default=48, help="每个测点的读数个数（每小时一条）")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--legacy-limit", type=int, default=10000, help="配置数超过此值时跳过逐条查询")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+并发吞吐基准：以 50~500 个并发客户端请求大屏常用的只读接口，统计每秒请求数和延迟分位数。
+
+先启动服务（uvicorn main:app），再运行:
+    python benchmarks/bench_concurrency.py --url http://127.0.0.1:8000 --concurrency 50,100,200,500
+
+对比改动前后时，分别在两个版本的服务上运行本脚本，使用同一个数据库文件。
+需要 httpx (pip install httpx)。
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post("/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def dashboard_paths(client: httpx.AsyncClient, headers: dict, point_codes, full_history: bool):
+    """大屏轮询的接口组合：测点列表、全部最新值，以及各测点的详情、最新值和最近一天的降采样曲线"""
+    paths = ["/points/", "/measurements/latest"]
+    for code in point_codes:
+        paths += [f"/points/{code}", f"/measurements/{code}/latest"]
+        if full_history:
+            paths.append(f"/measurements/{code}?max_points=200")
+            continue
+        response = await client.get(f"/measurements/{code}/latest", headers=headers)
+        if response.status_code == 200:
+            end = datetime.fromisoformat(response.json()["time"])
+            start = end - timedelta(days=1)
+            paths.append(f"/measurements/{code}/range?start_time={start.isoformat()}&end_time={end.isoformat()}&max_points=200")
+    return paths
+
+async def run_level(client: httpx.AsyncClient, headers: dict, paths, concurrency: int, total: int) -> dict:
+    counter = itertools.count()
+    path_cycle = itertools.cycle(paths)
+    latencies, failures = [], collections.Counter()
+
+    async def worker():
+        while next(counter) < total:
+            path = next(path_cycle)
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code >= 500:
+                    failures[f"HTTP {response.status_code}"] += 1
+            except httpx.HTTPError as e:
+                failures[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "failures": sum(failures.values()),
+        "failure_kinds": dict(failures),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+async def main(args):
+    levels = [int(level) for level in args.concurrency.split(",")]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        headers = await login(client, args.username, args.password)
+        points = (await client.get("/points/", headers=headers)).json()
+        paths = await dashboard_paths(client, headers, [p["point_code"] for p in points[:args.points]], args.full_history)
+
+        # 预热：建立连接、加载缓存
+        await run_level(client, headers, paths, min(levels), min(levels) * 2)
+
+        print(f"{'并发':>6} {'请求数':>8} {'失败':>6} {'req/s':>10} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10}")
+        for level in levels:
+            result = await run_level(client, headers, paths, level, max(args.requests, level * 4))
+            print(f"{result['concurrency']:>6} {result['requests']:>8} {result['failures']:>6} {result['rps']:>10.1f} "
+                  f"{result['p50']:>10.1f} {result['p95']:>10.1f} {result['p99']:>10.1f}")
+            if result["failure_kinds"]:
+                print(f"{'':>6} 失败原因: {result['failure_kinds']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发吞吐基准")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--concurrency", default="50,100,200,500", help="逗号分隔的并发客户端数")
+    parser.add_argument("--requests", type=int, default=2000, help="每个并发级别的请求总数")
+    parser.add_argument("--points", type=int, default=10, help="参与请求的测点个数")
+    parser.add_argument("--full-history", action="store_true", help="曲线请求取测点全部历史数据（CPU 开销大，吞吐主要取决于降采样）")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
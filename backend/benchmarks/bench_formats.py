@@ -0,0 +1,69 @@
+"""
+响应格式基准：在临时数据库上为一个测点写入 1千~10万条数据，进程内调用 GET /measurements/{point_code}，
+对比逐行 JSON、列式 JSON（Accept: application/vnd.columnar+json）和 Arrow IPC（Accept: application/vnd.apache.arrow.stream）
+的响应体大小和处理耗时。关闭响应体缓存，每次请求都重新查询和编码。
+
+运行:
+    python benchmarks/bench_formats.py --sizes 1000,10000,100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(tempfile.mkdtemp())
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from init_db import init_db  # noqa: E402
+from sql_app import columnar, crud, database, models, response_cache, rollups, schemas  # noqa: E402
+import main  # noqa: E402
+
+FORMATS = [("JSON", columnar.JSON), ("列式 JSON", columnar.COLUMNAR_JSON), ("Arrow", columnar.ARROW_STREAM)]
+
+def seed(sizes) -> None:
+    start = datetime(2024, 1, 1)
+    with database.SessionLocal() as db:
+        db.execute(insert(models.MonitorPoint), [
+            {"point_code": f"P{size}", "point_name": f"测点{size}", "device_type": "倒垂线", "longitude": 0, "latitude": 0, "height": 0}
+            for size in sizes
+        ])
+        db.commit()
+        for size in sizes:
+            items = [
+                schemas.MeasurementCreate(point_code=f"P{size}", value=round(i * 0.013 % 7, 3), time=start + timedelta(minutes=10 * i), measurement_type="左右岸")
+                for i in range(size)
+            ]
+            for offset in range(0, len(items), 20000):
+                crud.bulk_create(db, rollups.MEASUREMENTS, items[offset:offset + 20000])
+
+def run(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    init_db()
+    seed(sizes)
+    # 每次请求都走查询和编码，不从响应体缓存返回
+    response_cache.response_cache.max_bytes = 0
+    client = TestClient(main.app)
+    token = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).json()["access_token"]
+
+    print(f"{'行数':>8} {'格式':<10} {'响应体(KB)':>12} {'耗时(ms)':>10}")
+    for size in sizes:
+        for name, media_type in FORMATS:
+            headers = {"Authorization": f"Bearer {token}", "Accept": media_type}
+            body = client.get(f"/measurements/P{size}", headers=headers).content
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                client.get(f"/measurements/P{size}", headers=headers)
+                timings.append(time.perf_counter() - started)
+            print(f"{size:>8} {name:<10} {len(body) / 1024:>12.1f} {statistics.median(timings) * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="响应格式基准")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="逗号分隔的数据行数（每个行数一个测点）")
+    parser.add_argument("--repeat", type=int, default=5)
+    run(parser.parse_args())
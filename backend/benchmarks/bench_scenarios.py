@@ -0,0 +1,288 @@
+"""
+场景压测：按前端的调用组合模拟用户操作，统计每个接口的吞吐和 p50/p95/p99 延迟，结果可保存为 JSON 并与上次结果对比。
+
+场景（括号内为默认权重）:
+    dashboard (30)   打开大屏：GET /points/、GET /measurements/latest
+    detail (25)      点击测点：/measurements/{code}/latest、/stats、/measurements/{code}?limit=1000
+    range (15)       曲线时间段：/measurements/{code}/range?start_time&end_time&max_points=500
+    water_level (10) 水体动画：/water-level/{code}?skip=0&limit=10000
+    search (10)      后台数据检索：/measurements/search 首页 200 条和统计用的 10000 条
+    login (5)        登录：POST /auth/login
+    ingest (5)       批量写入：POST /measurements/batch 100 条
+
+先准备数据（python benchmarks/gen_data.py），再启动服务并运行:
+    python benchmarks/bench_scenarios.py --url http://127.0.0.1:8000 --users 50 --duration 60 --output before.json
+    python benchmarks/bench_scenarios.py --users 50 --duration 60 --output after.json --compare before.json
+不启动服务时可用 --in-process 直接在本进程内调用应用（httpx ASGITransport，不经过网络和 uvicorn）。
+对比时任一接口 p95 变慢超过 --threshold 即以非零状态退出。ingest 场景会向数据库写入数据，请在生成的压测数据库上运行。
+需要 httpx (pip install httpx)。
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+DEFAULT_MIX = {"dashboard": 30, "detail": 25, "range": 15, "water_level": 10, "search": 10, "login": 5, "ingest": 5}
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+class Recorder:
+    """按接口（路由模板）记录延迟和状态码"""
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+
+    def add(self, endpoint: str, seconds: float, status):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][str(status)] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            latencies = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400),
+                "statuses": dict(statuses),
+                "rps": len(latencies) / elapsed,
+                "p50": percentile(latencies, 0.50) * 1000,
+                "p95": percentile(latencies, 0.95) * 1000,
+                "p99": percentile(latencies, 0.99) * 1000,
+                "mean": statistics.fmean(latencies) * 1000,
+            }
+        everything = [value for values in self.latencies.values() for value in values]
+        total = {
+            "requests": len(everything),
+            "errors": sum(item["errors"] for item in endpoints.values()),
+            "rps": len(everything) / elapsed,
+            "p50": percentile(everything, 0.50) * 1000,
+            "p95": percentile(everything, 0.95) * 1000,
+            "p99": percentile(everything, 0.99) * 1000,
+        }
+        return {"endpoints": endpoints, "total": total}
+
+class User:
+    """一个模拟用户：按场景顺序发请求；--revalidate 时像浏览器一样带上次的 ETag 做条件请求"""
+    def __init__(self, client: httpx.AsyncClient, headers: dict, targets: dict, recorder: Recorder, rng: random.Random, args):
+        self.client = client
+        self.headers = headers
+        self.targets = targets
+        self.recorder = recorder
+        self.rng = rng
+        self.args = args
+        self.etags = {}
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs):
+        headers = dict(self.headers)
+        if method == "GET" and self.args.revalidate and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            status = response.status_code
+            if "etag" in response.headers:
+                self.etags[url] = response.headers["etag"]
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.recorder.add(endpoint, time.perf_counter() - started, status)
+        return response
+
+    async def dashboard(self):
+        await self.request("GET /points/", "GET", "/points/")
+        await self.request("GET /measurements/latest", "GET", "/measurements/latest")
+
+    async def detail(self):
+        code, _ = self.rng.choice(self.targets["measurement"])
+        await self.request("GET /measurements/{code}/latest", "GET", f"/measurements/{code}/latest")
+        await self.request("GET /measurements/{code}/stats", "GET", f"/measurements/{code}/stats")
+        await self.request("GET /measurements/{code}?limit=1000", "GET", f"/measurements/{code}?limit=1000")
+
+    async def range(self):
+        code, latest = self.rng.choice(self.targets["measurement"])
+        end = latest - timedelta(days=self.rng.randint(0, self.args.range_days))
+        start = end - timedelta(days=self.args.range_days)
+        await self.request(
+            "GET /measurements/{code}/range", "GET",
+            f"/measurements/{code}/range?start_time={start.isoformat()}&end_time={end.isoformat()}&max_points=500",
+        )
+
+    async def water_level(self):
+        if not self.targets["water_level"]:
+            return
+        code = self.rng.choice(self.targets["water_level"])
+        await self.request("GET /water-level/{code}?limit=10000", "GET", f"/water-level/{code}?skip=0&limit=10000")
+
+    async def search(self):
+        params = {"device_type": self.rng.choice(self.targets["device_types"])}
+        await self.request("GET /measurements/search?limit=200", "GET", "/measurements/search", params={**params, "limit": 200})
+        await self.request("GET /measurements/search?limit=10000", "GET", "/measurements/search", params={**params, "limit": 10000})
+
+    async def login(self):
+        await self.request("POST /auth/login", "POST", "/auth/login",
+                           json={"username": self.args.username, "password": self.args.password})
+
+    async def ingest(self):
+        now = datetime.now()
+        codes = [code for code, _ in self.targets["measurement"]]
+        measurements = [
+            {"point_code": self.rng.choice(codes), "value": round(self.rng.uniform(-5, 5), 3),
+             "time": (now - timedelta(seconds=i)).isoformat(), "measurement_type": "压测"}
+            for i in range(self.args.ingest_size)
+        ]
+        await self.request("POST /measurements/batch", "POST", "/measurements/batch?return_rows=false",
+                           json={"measurements": measurements})
+
+async def discover(client: httpx.AsyncClient, headers: dict, max_points: int) -> dict:
+    """取测点列表和各测点的最新时间，作为场景中的请求对象"""
+    response = await client.get("/points/", headers=headers)
+    response.raise_for_status()
+    points = response.json()
+    measurement = []
+    for point in points[:max_points]:
+        latest = await client.get(f"/measurements/{point['point_code']}/latest", headers=headers)
+        if latest.status_code == 200:
+            measurement.append((point["point_code"], datetime.fromisoformat(latest.json()["time"])))
+    if not measurement:
+        sys.exit("没有带测量数据的测点，先运行 python benchmarks/gen_data.py 生成数据")
+    return {
+        "measurement": measurement,
+        "water_level": [p["point_code"] for p in points if p["device_type"] == "水位"],
+        "device_types": sorted({p["device_type"] for p in points if p["device_type"]}),
+    }
+
+async def run(client: httpx.AsyncClient, args) -> dict:
+    response = await client.post("/auth/login", json={"username": args.username, "password": args.password})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    targets = await discover(client, headers, args.points)
+
+    mix = parse_mix(args.mix)
+    scenarios, weights = list(mix), list(mix.values())
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def user_loop(index: int):
+        # 每个用户独立的随机序列，相同参数重复运行时请求组合一致
+        rng = random.Random(args.seed * 1000 + index)
+        user = User(client, headers, targets, recorder, rng, args)
+        while time.perf_counter() < deadline:
+            await getattr(user, rng.choices(scenarios, weights)[0])()
+            if args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user_loop(i) for i in range(args.users)))
+    return recorder.summary(time.perf_counter() - started)
+
+def parse_mix(text: str) -> dict:
+    if not text:
+        return DEFAULT_MIX
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            sys.exit(f"未知场景: {name}，可选 {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def print_report(result: dict):
+    print(f"{'接口':<42} {'请求数':>7} {'错误':>5} {'req/s':>8} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9}")
+    rows = list(result["endpoints"].items()) + [("合计", result["total"])]
+    for endpoint, item in rows:
+        print(f"{endpoint:<42} {item['requests']:>7} {item['errors']:>5} {item['rps']:>8.1f} "
+              f"{item['p50']:>9.1f} {item['p95']:>9.1f} {item['p99']:>9.1f}")
+    for endpoint, item in result["endpoints"].items():
+        if item["errors"]:
+            print(f"{endpoint} 状态码: {item['statuses']}")
+
+def compare(result: dict, baseline: dict, threshold: float) -> list:
+    """逐接口对比 p50/p95/p99 和吞吐，返回 p95 变慢超过阈值的接口"""
+    regressions = []
+    print(f"\n对比 {baseline.get('meta', {}).get('revision') or '基线'}（变化为 当前/基线 - 1）")
+    print(f"{'接口':<42} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8}")
+    for endpoint, item in result["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(endpoint)
+        if not old:
+            print(f"{endpoint:<42} {'(新增)':>8}")
+            continue
+        changes = [item[key] / old[key] - 1 if old[key] else 0.0 for key in ("p50", "p95", "p99", "rps")]
+        flag = ""
+        if changes[1] > threshold:
+            regressions.append(endpoint)
+            flag = "  <- 变慢"
+        print(f"{endpoint:<42} " + " ".join(f"{change:>+8.0%}" for change in changes) + flag)
+    return regressions
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.in_process:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout)
+    async with client:
+        result = await run(client, args)
+    result["meta"] = {
+        "revision": git_revision(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "target": "in-process" if args.in_process else args.url,
+        "python": platform.python_version(),
+        "args": vars(args),
+    }
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="前端调用组合的场景压测")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true", help="在本进程内调用应用，不需要启动服务")
+    parser.add_argument("--username", default="admin", help="需要管理员账号才能执行 ingest 场景")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--users", type=int, default=20, help="并发模拟用户数")
+    parser.add_argument("--duration", type=float, default=30, help="运行秒数")
+    parser.add_argument("--think-time", type=float, default=0.0, help="每个场景之间的平均等待秒数，0 表示不等待")
+    parser.add_argument("--mix", default="", help="场景权重，如 dashboard=50,detail=50；默认见文件开头")
+    parser.add_argument("--points", type=int, default=50, help="参与请求的测点个数")
+    parser.add_argument("--range-days", type=int, default=30, help="曲线请求的时间段天数")
+    parser.add_argument("--ingest-size", type=int, default=100, help="每次批量写入的条数")
+    parser.add_argument("--revalidate", action="store_true", help="GET 请求带上次响应的 ETag（模拟浏览器缓存）")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="结果保存为 JSON")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 变慢超过这个比例视为回退")
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args))
+    print_report(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 个接口 p95 变慢超过 {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,85 @@
+"""
+列表接口序列化基准：对 1千~10万条查询结果（列元组），对比改动前的做法
+（逐行构造 MeasurementSearchOut，再由 FastAPI 按 response_model 校验、转换并用 json.dumps 输出）
+和 fastjson 直接编码（orjson，未安装时为标准库 json）的每秒行数。只计序列化，不含查询。
+
+运行:
+    python benchmarks/bench_serialization.py --sizes 1000,10000,100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from sql_app import fastjson, schemas  # noqa: E402
+import main  # noqa: E402
+
+# 与 async_crud.search_measurements 返回的列相同
+Row = namedtuple("Row", ["id", "point_code", "value", "time", "measurement_type", "base_point_code"])
+
+def make_rows(size: int) -> list:
+    start = datetime(2024, 1, 1)
+    return [Row(i, "IP1左右岸", round(i * 0.013 % 7, 3), start + timedelta(minutes=10 * i), "左右岸", "IP1") for i in range(size)]
+
+def response_field():
+    for route in main.app.routes:
+        if getattr(route, "path", None) == "/measurements/search":
+            return route.response_field
+    raise RuntimeError("未找到 /measurements/search 路由")
+
+async def legacy(rows: list, field) -> bytes:
+    """改动前：逐行构造 Pydantic 模型，FastAPI 再按 response_model 校验并转换，最后 json.dumps"""
+    content = [
+        schemas.MeasurementSearchOut(
+            id=r.id, point_code=r.point_code, value=r.value, time=r.time,
+            device_type="倒垂线", point_name="IP1", measurement_type=r.measurement_type
+        )
+        for r in rows
+    ]
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+def fast(rows: list) -> bytes:
+    return fastjson.dumps([
+        {
+            "point_code": r.point_code, "value": r.value, "time": r.time, "measurement_type": r.measurement_type,
+            "id": r.id, "device_type": "倒垂线", "point_name": "IP1"
+        }
+        for r in rows
+    ])
+
+async def timed(call, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        if asyncio.iscoroutine(result):
+            await result
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+async def run(args):
+    field = response_field()
+    encoder = "orjson" if fastjson.orjson is not None else "json"
+    print(f"{'行数':>8} {'改动前(行/秒)':>16} {f'fastjson/{encoder}(行/秒)':>24} {'加速':>8}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        rows = make_rows(size)
+        # 两种做法输出的数据相同
+        assert json.loads(await legacy(rows[:100], field)) == json.loads(fast(rows[:100]))
+        before = await timed(lambda: legacy(rows, field), args.repeat)
+        after = await timed(lambda: fast(rows), args.repeat)
+        print(f"{size:>8} {size / before:>16,.0f} {size / after:>24,.0f} {before / after:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="列表接口序列化基准")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="逗号分隔的行数")
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
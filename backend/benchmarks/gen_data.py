@@ -0,0 +1,131 @@
+"""
+合成数据生成：向数据库写入 N 个测点 × M 年的监测数据，用于基准测试和压测。
+
+测点轮流分配为倒垂线、引张线、静力水准、水位四类，每个读数同时写入对应的仪器数据表和 measurements 表
+（倒垂线在 measurements 中按 左右岸 / 上下游 两种测量类型各一行），走与接口相同的批量写入路径，
+汇总表、最新值表和数据版本号同步维护。同时创建 init_db.py 中的 admin / user 账号。
+
+运行（在 backend 目录）:
+    python benchmarks/gen_data.py --points 50 --years 1                 # 写入 water_platform.db（DATABASE_URL）
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/gen_data.py --points 200 --years 3 --interval-hours 6
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from init_db import init_db  # noqa: E402
+from sql_app import crud, database, models, rollups  # noqa: E402
+
+# 仪器类型 -> (测点编号前缀, 仪器数据表, measurements 中的测量类型)
+DEVICE_TYPES = [
+    ("倒垂线", "IP", rollups.INVERTED_PLUMB, ["左右岸", "上下游"]),
+    ("引张线", "EX", rollups.TENSION_LINE, ["位移"]),
+    ("静力水准", "TC", rollups.STATIC_LEVEL, ["沉降"]),
+    ("水位", "WL", rollups.WATER_LEVEL, ["水位"]),
+]
+
+def make_points(count: int, prefix: str) -> list:
+    points = []
+    for i in range(count):
+        device_type, code_prefix, source, types = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        number = i // len(DEVICE_TYPES) + 1
+        code = f"{prefix}{code_prefix}{number}"
+        # 水位测点按上游 / 下游交替命名，大屏按名称查找
+        name = f"{'上游' if number % 2 else '下游'}水位{number}" if source == rollups.WATER_LEVEL else code
+        points.append((code, name, device_type, source, types))
+    return points
+
+def series(rng: random.Random, source: str, times: list) -> list:
+    """一个测点的读数：水位为年周期加噪声，其余为带季节项的随机游走（位移 mm）"""
+    values = []
+    level = rng.uniform(-1, 1)
+    phase = rng.uniform(0, 2 * math.pi)
+    for t in times:
+        season = math.sin(2 * math.pi * t.timetuple().tm_yday / 365 + phase)
+        if source == rollups.WATER_LEVEL:
+            values.append(round(140 + 8 * season + rng.gauss(0, 0.3), 2))
+        else:
+            level += rng.gauss(0, 0.05)
+            values.append(round(level + 2 * season, 3))
+    return values
+
+def generate(args):
+    init_db()
+    rng = random.Random(args.seed)
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    step = timedelta(hours=args.interval_hours)
+    count = int(args.years * 365 * 24 / args.interval_hours)
+    times = [end - step * (count - 1 - i) for i in range(count)]
+    points = make_points(args.points, args.prefix)
+
+    db = database.SessionLocal()
+    try:
+        existing = crud.existing_point_codes(db, (code for code, *_ in points))
+        if existing:
+            sys.exit(f"数据库中已有同名测点（如 {sorted(existing)[0]}），请换用空数据库或指定 --prefix")
+        db.add_all(
+            models.MonitorPoint(
+                point_code=code, point_name=name, device_type=device_type,
+                longitude=120 + rng.uniform(-0.005, 0.005), latitude=30 + rng.uniform(-0.005, 0.005), height=rng.choice([43, 88, 120, 153]),
+            )
+            for code, name, device_type, _, _ in points
+        )
+        db.commit()
+
+        print(f"{len(points)} 个测点 × {count} 个时刻（{times[0]} ~ {times[-1]}，间隔 {args.interval_hours} 小时）")
+        started = time.perf_counter()
+        written = 0
+        pending = {}
+
+        def flush(source):
+            nonlocal written
+            rows = pending.pop(source, [])
+            if rows:
+                crud.bulk_insert(db, source, rows)
+                db.commit()
+                written += len(rows)
+
+        for index, (code, _, _, source, types) in enumerate(points, 1):
+            values = series(rng, source, times)
+            if source == rollups.INVERTED_PLUMB:
+                # 上下游方向的位移取左右岸的一半加独立噪声
+                second = [round(v / 2 + rng.gauss(0, 0.02), 3) for v in values]
+                pending.setdefault(source, []).extend(
+                    {"point_code": code, "left_right_value": a, "up_down_value": b, "time": t} for t, a, b in zip(times, values, second)
+                )
+                columns = [values, second]
+            else:
+                pending.setdefault(source, []).extend({"point_code": code, "value": v, "time": t} for t, v in zip(times, values))
+                columns = [values]
+            pending.setdefault(rollups.MEASUREMENTS, []).extend(
+                {"point_code": code, "value": v, "time": t, "measurement_type": measurement_type}
+                for measurement_type, column in zip(types, columns)
+                for t, v in zip(times, column)
+            )
+            for source_name in list(pending):
+                if len(pending[source_name]) >= args.chunk_size:
+                    flush(source_name)
+            elapsed = time.perf_counter() - started
+            print(f"\r测点 {index}/{len(points)}，已写入 {written} 行，{written / elapsed:.0f} 行/秒", end="", flush=True)
+        for source_name in list(pending):
+            flush(source_name)
+        elapsed = time.perf_counter() - started
+        print(f"\r完成：写入 {written} 行，用时 {elapsed:.1f} 秒，{written / elapsed:.0f} 行/秒" + " " * 20)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成监测数据生成")
+    parser.add_argument("--points", type=int, default=50, help="测点个数")
+    parser.add_argument("--years", type=float, default=1.0, help="数据年数，截止到当前时间")
+    parser.add_argument("--interval-hours", type=float, default=1.0, help="读数间隔小时数")
+    parser.add_argument("--prefix", default="", help="测点编号前缀，向已有数据库追加时避免与现有测点重名")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="每次写入提交的行数")
+    parser.add_argument("--seed", type=int, default=1, help="随机数种子，相同参数生成相同数据")
+    generate(parser.parse_args())
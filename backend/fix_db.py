@@ -1,6 +1,14 @@
 import sqlite3
 import os
 
+# 已被 (point_code, time) 复合索引取代的单列索引
+OBSOLETE_INDEXES = [
+    "ix_inverted_plumb_data_point_code",
+    "ix_static_level_data_point_code",
+    "ix_tension_line_data_point_code",
+    "ix_water_level_data_point_code",
+]
+
 def add_column():
     db_path = 'water_platform.db'
     if not os.path.exists(db_path):
@@ -19,5 +27,41 @@ def add_column():
     finally:
         conn.close()
 
+def migrate_indexes():
+    db_path = 'water_platform.db'
+    if not os.path.exists(db_path):
+        print(f"Database {db_path} not found.")
+        return
+
+    from sql_app import database, models
+    models.create_missing_indexes(database.engine)
+    print("Composite (point_code, time) indexes created.")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.commit()
+        print("Obsolete single-column indexes dropped.")
+    finally:
+        conn.close()
+
+def migrate_base_point_code():
+    db_path = 'water_platform.db'
+    if not os.path.exists(db_path):
+        print(f"Database {db_path} not found.")
+        return
+
+    from sql_app import crud, database, models
+    models.create_missing_columns(database.engine)
+    db = database.SessionLocal()
+    try:
+        count = crud.backfill_base_point_codes(db)
+        print(f"base_point_code backfilled for {count} point codes.")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    add_column()
\ No newline at end of file
+    add_column()
+    migrate_base_point_code()
+    migrate_indexes()
@@ -0,0 +1,375 @@
+"""
+Excel 监测资料导入：只读模式流式读取工作簿，每个工作表在独立的工作进程中解析，主进程按块幂等写入对应的仪器数据表。
+
+工作表按名称（单工作表的工作簿按文件名）识别仪器类型：倒垂线、引张线、静力水准、水位，以及测点信息表 测点。
+表头可以是单行（第一行为 观测时间 和测点编号列，如 data/倒垂线.xlsx），也可以是 监测资料.xlsx 的多行表头（部位、平面位置、高程、仪器编号……观测时间）。
+每个读数同时写入对应的仪器数据表和 measurements 表（测量类型与汇总表相同，倒垂线为 左右岸 / 上下游 两行），
+数据检索、历史数据、统计等 /measurements 接口和 base_point_code 归属查询都读取 measurements 表。
+写入按 (point_code, time) 去重（measurements 表再区分测量类型）：重复导入同一文件不会产生重复数据，数值有变化的行被更新，汇总表、最新值表随之维护。
+数据中出现、数据库中尚不存在的测点会自动创建，已存在的测点信息不做修改。
+
+运行:
+    python import_excel.py                                   # 默认导入 data/测点.xlsx 和 data/监测资料.xlsx
+    python import_excel.py data/倒垂线.xlsx data/引张线.xlsx --workers 4 --chunk-size 5000
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import openpyxl
+from sql_app import crud, database, models, rollups, schemas
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_FILES = [os.path.join(DATA_DIR, "测点.xlsx"), os.path.join(DATA_DIR, "监测资料.xlsx")]
+
+# 仪器类型（即测点的 device_type）-> (来源数据表, 测点编号格式)
+INSTRUMENTS = {
+    "倒垂线": (rollups.INVERTED_PLUMB, re.compile(r"IP\d+")),
+    "引张线": (rollups.TENSION_LINE, re.compile(r"EX\d+-\d+′?")),
+    "静力水准": (rollups.STATIC_LEVEL, re.compile(r"TC\d+-\d+′?")),
+    "水位": (rollups.WATER_LEVEL, None),
+}
+POINT_SHEET = "测点"
+# 水位工作表没有测点编号，按列标题中的关键字对应固定测点：关键字 -> (测点编号, 测点名称)
+WATER_LEVEL_POINTS = {"上游": ("WL1", "上游水位"), "下游": ("WL2", "下游水位")}
+# 倒垂线每个测点两列，按列标题区分
+PLUMB_FIELDS = {"左右岸": "left_right_value", "上下游": "up_down_value"}
+TIME_LABEL = "观测时间"
+# 表头最多的行数，超过仍未找到观测时间列时放弃该工作表
+MAX_HEADER_ROWS = 20
+
+# 平面位置换算经纬度的基准点（坝轴线原点）
+BASE_LON = 120.0
+BASE_LAT = 30.0
+_STATION = re.compile(r"坝([左右上下])\s*(\d+)\+(\d+(?:\.\d+)?)")
+
+# 测点编号 -> (测点名称, 仪器类型, 平面位置, 高程)
+PointInfo = Tuple[str, str, Optional[str], Optional[float]]
+
+def parse_position(position: Optional[str]) -> Tuple[float, float]:
+    """平面位置（如 '坝下0+007.600 坝左0+161.800'）换算为经纬度：坝左/坝右为沿坝轴线的偏移，坝上/坝下为上下游方向的偏移"""
+    x_offset = y_offset = 0.0
+    for side, km, meters in _STATION.findall(position or ""):
+        offset = int(km) * 1000 + float(meters)
+        if side == "左":
+            x_offset = -offset
+        elif side == "右":
+            x_offset = offset
+        elif side == "上":
+            y_offset = offset
+        else:
+            y_offset = -offset
+    return BASE_LON + x_offset / (111000 * 0.77), BASE_LAT + y_offset / 111000
+
+def open_workbook(path: str):
+    """只读模式逐行读取；data_only 取公式单元格缓存的计算结果；不加载外部链接的缓存数据（监测资料.xlsx 中占打开时间的绝大部分）"""
+    return openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+
+def parse_time(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    return None
+
+def parse_value(value) -> Optional[float]:
+    """数值单元格转 float，空白、文字和没有缓存结果的公式视为缺测"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and not value.startswith("="):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+def sheet_kind(path: str, sheet_name: str, sheet_count: int) -> Optional[str]:
+    known = set(INSTRUMENTS) | {POINT_SHEET}
+    if sheet_name in known:
+        return sheet_name
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if sheet_count == 1 and stem in known:
+        return stem
+    return None
+
+def _cell_text(row: tuple, col: int) -> Optional[str]:
+    value = row[col] if col < len(row) else None
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+def _row_label(row: tuple) -> str:
+    # 多行表头的行名在前两列，如 '平面位置(m)'、'高程(m)'
+    return next((text for text in (_cell_text(row, 0), _cell_text(row, 1)) if text), "")
+
+def _match_code(pattern, label: str) -> Optional[str]:
+    for suffix in PLUMB_FIELDS:
+        label = label.split(suffix)[0]
+    return label if pattern.fullmatch(label.strip()) else None
+
+def parse_header(kind: str, header: List[tuple]) -> Tuple[Optional[int], List[Tuple[int, str, str]], Dict[str, PointInfo]]:
+    """解析表头，返回 (观测时间列, [(列号, 测点编号, 数值列)], 表头中的测点信息)"""
+    source, pattern = INSTRUMENTS[kind]
+    width = max((len(row) for row in header), default=0)
+    positions = next((row for row in header if _row_label(row).startswith("平面位置")), ())
+    heights = next((row for row in header if _row_label(row).startswith("高程")), ())
+    time_col = None
+    columns = []
+    points: Dict[str, PointInfo] = {}
+    previous_code = None
+    for col in range(width):
+        labels = [text for text in (_cell_text(row, col) for row in header) if text]
+        if TIME_LABEL in labels:
+            time_col = col
+            continue
+        if source == rollups.WATER_LEVEL:
+            for keyword, (code, name) in WATER_LEVEL_POINTS.items():
+                if any(keyword in label for label in labels):
+                    columns.append((col, code, "value"))
+                    points[code] = (name, kind, None, None)
+                    break
+            continue
+        code = next((code for code in (_match_code(pattern, label) for label in labels) if code), None)
+        field = "value"
+        if source == rollups.INVERTED_PLUMB:
+            field = next((f for suffix, f in PLUMB_FIELDS.items() if any(suffix in label for label in labels)), None)
+            # 多行表头中测点编号只写在左右岸列上，上下游列沿用左侧的编号
+            if code is None and field == "up_down_value":
+                code = previous_code
+            if field is None:
+                field = "left_right_value"
+        previous_code = code
+        if code is None:
+            continue
+        columns.append((col, code, field))
+        if code not in points:
+            position = _cell_text(positions, col)
+            height = heights[col] if col < len(heights) and isinstance(heights[col], (int, float)) else None
+            points[code] = (code, kind, position, height)
+    return time_col, columns, points
+
+def parse_point_sheet(rows) -> Dict[str, PointInfo]:
+    """测点信息表：仪器编号、平面位置、高程……，仪器类型按编号格式判断"""
+    rows = iter(rows)
+    header = [str(value).strip() if value is not None else "" for value in next(rows, ())]
+    if "仪器编号" not in header:
+        return {}
+    code_col = header.index("仪器编号")
+    position_col = header.index("平面位置") if "平面位置" in header else None
+    height_col = header.index("高程") if "高程" in header else None
+    points = {}
+    for row in rows:
+        code = _cell_text(row, code_col)
+        if not code:
+            continue
+        kind = next((kind for kind, (_, pattern) in INSTRUMENTS.items() if pattern and pattern.fullmatch(code)), None)
+        if kind is None:
+            continue
+        position = _cell_text(row, position_col) if position_col is not None else None
+        height = row[height_col] if height_col is not None and isinstance(row[height_col], (int, float)) else None
+        points[code] = (code, kind, position, height)
+    return points
+
+# 工作进程：解析结果通过有界队列交给主进程，写入跟不上时解析自然阻塞，内存占用与文件大小无关
+_results = None
+
+def _init_worker(results):
+    global _results
+    _results = results
+
+def _parse_sheet(path: str, sheet_name: str, kind: str, chunk_size: int):
+    key = f"{os.path.basename(path)}/{sheet_name}"
+    try:
+        source = INSTRUMENTS[kind][0]
+        wb = open_workbook(path)
+        try:
+            rows_read = skipped = 0
+            header, columns, time_col = [], None, None
+            chunk = []
+            for row in wb[sheet_name].iter_rows(values_only=True):
+                if columns is None:
+                    header.append(row)
+                    time_col, found, points = parse_header(kind, header)
+                    # 表头结束于观测时间列第一次出现时间值的行
+                    if time_col is None or parse_time(row[time_col] if time_col < len(row) else None) is None:
+                        if len(header) > MAX_HEADER_ROWS:
+                            raise ValueError(f"前 {MAX_HEADER_ROWS} 行中没有找到 {TIME_LABEL} 列")
+                        continue
+                    header.pop()
+                    time_col, columns, points = parse_header(kind, header)
+                    if not columns:
+                        raise ValueError("表头中没有可识别的测点列")
+                    _results.put(("points", key, points))
+                rows_read += 1
+                observed = parse_time(row[time_col] if time_col < len(row) else None)
+                if observed is None:
+                    skipped += 1
+                    continue
+                records: Dict[str, dict] = {}
+                for col, code, field in columns:
+                    value = parse_value(row[col] if col < len(row) else None)
+                    if value is None:
+                        continue
+                    record = records.get(code)
+                    if record is None:
+                        record = records[code] = {"point_code": code, "time": observed}
+                        if source == rollups.INVERTED_PLUMB:
+                            record.update(left_right_value=None, up_down_value=None)
+                    record[field] = value
+                chunk.extend(records.values())
+                if len(chunk) >= chunk_size:
+                    _results.put(("rows", key, source, chunk, rows_read))
+                    chunk, rows_read = [], 0
+            if columns is None:
+                raise ValueError(f"没有找到 {TIME_LABEL} 列或数据行")
+            _results.put(("rows", key, source, chunk, rows_read))
+            _results.put(("done", key, skipped))
+        finally:
+            wb.close()
+    except Exception as e:
+        _results.put(("error", key, f"{type(e).__name__}: {e}"))
+
+# 主进程：测点创建和数据写入
+def measurement_rows(source: str, rows: List[dict]) -> List[dict]:
+    """仪器数据行展开为 measurements 表的行：每个有值的数值列一行，测量类型取自 rollups.SOURCES"""
+    _, value_columns = rollups.SOURCES[source]
+    return [
+        {"point_code": row["point_code"], "time": row["time"], "value": row[column], "measurement_type": measurement_type}
+        for row in rows
+        for measurement_type, column in value_columns
+        if row.get(column) is not None
+    ]
+
+def ensure_points(db, points: Dict[str, PointInfo]) -> List[str]:
+    """创建尚不存在的测点，返回新建的测点编号"""
+    existing = crud.existing_point_codes(db, points)
+    created = []
+    for code, (name, kind, position, height) in points.items():
+        if code in existing:
+            continue
+        longitude, latitude = parse_position(position)
+        crud.create_point(db, schemas.PointCreate(
+            point_code=code, point_name=name, device_type=kind,
+            longitude=longitude, latitude=latitude, height=height or 0.0,
+        ))
+        created.append(code)
+    return created
+
+def find_sheets(paths: List[str]) -> Tuple[List[Tuple[str, str, str]], List[Tuple[str, str]]]:
+    """返回 ([(文件, 数据工作表, 仪器类型)], [(文件, 测点工作表)])"""
+    data_sheets, point_sheets = [], []
+    for path in paths:
+        wb = open_workbook(path)
+        try:
+            for sheet_name in wb.sheetnames:
+                kind = sheet_kind(path, sheet_name, len(wb.sheetnames))
+                if kind == POINT_SHEET:
+                    point_sheets.append((path, sheet_name))
+                elif kind:
+                    data_sheets.append((path, sheet_name, kind))
+                else:
+                    print(f"跳过无法识别的工作表: {os.path.basename(path)}/{sheet_name}")
+        finally:
+            wb.close()
+    return data_sheets, point_sheets
+
+def import_workbooks(paths: List[str], workers: int, chunk_size: int):
+    models.Base.metadata.create_all(bind=database.engine)
+    data_sheets, point_sheets = find_sheets(paths)
+    db = database.SessionLocal()
+    try:
+        # 测点信息表先导入，数据工作表中的测点才能带上位置和高程
+        for path, sheet_name in point_sheets:
+            wb = open_workbook(path)
+            try:
+                created = ensure_points(db, parse_point_sheet(wb[sheet_name].iter_rows(values_only=True)))
+            finally:
+                wb.close()
+            print(f"{os.path.basename(path)}/{sheet_name}: 新建测点 {len(created)} 个")
+        if data_sheets:
+            load_sheets(db, data_sheets, workers, chunk_size)
+    finally:
+        db.close()
+
+def load_sheets(db, data_sheets: List[Tuple[str, str, str]], workers: int, chunk_size: int):
+    workers = max(1, min(workers, len(data_sheets)))
+    results = multiprocessing.Queue(maxsize=workers * 4)
+    counters = ("read", "inserted", "updated", "measurements_inserted", "measurements_updated", "failed")
+    totals = dict.fromkeys(counters, 0)
+    per_sheet: Dict[str, Dict[str, int]] = {}
+    started = last_report = time.perf_counter()
+    print(f"解析 {len(data_sheets)} 个工作表，工作进程 {workers} 个，每块 {chunk_size} 行")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(results,)) as executor:
+        futures = {
+            executor.submit(_parse_sheet, path, sheet_name, kind, chunk_size): f"{os.path.basename(path)}/{sheet_name}"
+            for path, sheet_name, kind in data_sheets
+        }
+        running = set(futures.values())
+        while running:
+            try:
+                message = results.get(timeout=1)
+            except queue.Empty:
+                # 工作进程异常退出时不会发送结束消息
+                for future, key in futures.items():
+                    if key in running and future.done() and future.exception() is not None:
+                        print(f"{key}: 解析进程异常退出: {future.exception()}")
+                        running.discard(key)
+                continue
+            kind, key = message[0], message[1]
+            stats = per_sheet.setdefault(key, dict.fromkeys(counters, 0))
+            if kind == "points":
+                created = ensure_points(db, message[2])
+                if created:
+                    print(f"{key}: 新建测点 {', '.join(created)}")
+            elif kind == "rows":
+                _, _, source, rows, rows_read = message
+                try:
+                    # 仪器数据表和 measurements 表在同一事务中写入，汇总表、最新值表和数据版本号一并维护
+                    inserted, updated = crud.bulk_upsert(db, source, rows)
+                    measurements_inserted, measurements_updated = crud.bulk_upsert(db, rollups.MEASUREMENTS, measurement_rows(source, rows))
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    print(f"{key}: 写入 {len(rows)} 条数据失败: {e}")
+                    inserted = updated = measurements_inserted = measurements_updated = 0
+                    stats["failed"] += len(rows)
+                    totals["failed"] += len(rows)
+                for name, count in (
+                    ("read", rows_read), ("inserted", inserted), ("updated", updated),
+                    ("measurements_inserted", measurements_inserted), ("measurements_updated", measurements_updated),
+                ):
+                    stats[name] += count
+                    totals[name] += count
+            elif kind == "done":
+                running.discard(key)
+                print(f"{key}: 完成，读取 {stats['read']} 行（跳过无观测时间的 {message[2]} 行），"
+                      f"新增 {stats['inserted']} 条，更新 {stats['updated']} 条；"
+                      f"measurements 新增 {stats['measurements_inserted']} 条，更新 {stats['measurements_updated']} 条")
+            elif kind == "error":
+                running.discard(key)
+                print(f"{key}: 导入失败: {message[2]}")
+            now = time.perf_counter()
+            if now - last_report >= 2:
+                last_report = now
+                print(f"进度: 读取 {totals['read']} 行，新增 {totals['inserted']} 条，更新 {totals['updated']} 条，"
+                      f"{totals['read'] / (now - started):.0f} 行/秒")
+    elapsed = time.perf_counter() - started
+    print(f"导入完成，用时 {elapsed:.1f} 秒：读取 {totals['read']} 行，新增 {totals['inserted']} 条，"
+          f"更新 {totals['updated']} 条，失败 {totals['failed']} 条，{totals['read'] / elapsed:.0f} 行/秒；"
+          f"measurements 新增 {totals['measurements_inserted']} 条，更新 {totals['measurements_updated']} 条")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导入 Excel 监测资料")
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES, help="工作簿路径，默认 data/测点.xlsx 和 data/监测资料.xlsx")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="解析工作表的进程数")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="每次写入提交的最大行数")
+    args = parser.parse_args()
+    import_workbooks(args.files, args.workers, args.chunk_size)
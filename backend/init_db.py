@@ -1,10 +1,12 @@
-from sql_app import database, models, crud, schemas, auth
+from sql_app import database, crud, migrations, schemas
 
 def init_db():
     db = database.SessionLocal()
     try:
-        database.Base.metadata.create_all(bind=database.engine)
+        result = migrations.migrate()
         print("数据库表创建成功")
+        for table in result["hypertables"]:
+            print(f"已转换为 TimescaleDB 超表: {table}")
         
         admin_user = crud.get_user_by_username(db, username="admin")
         if not admin_user:
@@ -1,15 +1,28 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
-from sql_app import models, schemas, database, crud, auth
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sql_app import schemas, database, config, async_crud, alerts, auth, columnar, fastjson, hashing, live, metrics, migrations, point_cache, profiling, response_cache, rollups, ingest, export, pagination
+from sql_app.downsample import downsample_rows
+import asyncio
 from datetime import datetime, timedelta
-
-# 创建数据库表
-models.Base.metadata.create_all(bind=database.engine)
+from typing import Optional, Union
 
 app = FastAPI(title="智慧水利监测平台 API")
 
+# /measurements/{point_code}/range 的响应头：整个时间范围（降采样前）的数据条数和最小、最大值
+RANGE_COUNT_HEADER = "X-Range-Count"
+RANGE_MIN_HEADER = "X-Range-Min"
+RANGE_MAX_HEADER = "X-Range-Max"
+
+@app.on_event("startup")
+async def run_migrations():
+    # 建表和补加列、索引不在导入 main 时执行：部署时先运行 python migrate.py 并设置 AUTO_MIGRATE=false，
+    # 或由每个 worker 启动时执行，多个 worker 同时启动时由迁移锁串行执行
+    if config.AUTO_MIGRATE:
+        await run_in_threadpool(migrations.migrate)
+
 # 配置 CORS (允许前端 Vue 访问)
 app.add_middleware(
     CORSMiddleware,
@@ -17,17 +30,76 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, RANGE_COUNT_HEADER, RANGE_MIN_HEADER, RANGE_MAX_HEADER],
 )
-
-def get_db():
-    db = database.SessionLocal()
+# 时序查询接口的响应缓存：路由依赖 response_cache.conditional 负责 ETag 校验，中间件保存生成的响应体
+app.add_middleware(response_cache.ResponseCacheMiddleware)
+app.add_exception_handler(response_cache.CachedResponse, response_cache.cached_response_handler)
+# 按请求的 SQL 条数和耗时剖析（抽样），放在最外层以计入整个请求
+app.add_middleware(profiling.ProfilingMiddleware)
+# Prometheus 指标：按路由模板统计请求数和处理时间
+app.add_middleware(metrics.MetricsMiddleware)
+
+# 接口统一使用异步会话；与 auth.get_current_user 依赖同一个函数，每个请求只打开一个会话
+get_db = database.get_async_db
+
+# 列表接口的分页参数：cursor 取自上一页响应头 X-Next-Cursor，skip 仅为兼容旧调用保留
+CURSOR_QUERY = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor")
+SKIP_QUERY = Query(0, ge=0, deprecated=True, description="已废弃，深分页请使用 cursor")
+
+def parse_cursor(cursor: Optional[str]) -> Optional[pagination.Cursor]:
+    if cursor is None:
+        return None
     try:
-        yield db
-    finally:
-        db.close()
+        return pagination.decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def paged(response: Response, rows: list, limit: int) -> list:
+    """有下一页时把游标写入响应头"""
+    token = pagination.next_cursor(rows, limit)
+    if token:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = token
+    return rows
+
+MEASUREMENT_FIELDS = [column.key for column in async_crud.MEASUREMENT_COLUMNS]
+
+def encode_measurements(fmt: str, rows: list, max_points: Optional[int], bucket: str, point_code: str, device_type: Optional[str]) -> bytes:
+    """降采样后直接由列元组编码：逐行 JSON 与 MeasurementOut 的字段和顺序相同；
+    列式格式中 point_code 即路径参数，放在元数据里，不再逐行重复"""
+    rows = downsample_rows(rows, max_points, bucket)
+    with profiling.serializing():
+        if fmt == columnar.JSON:
+            return fastjson.dumps([
+                {
+                    "point_code": row.point_code,
+                    "value": row.value,
+                    "time": row.time,
+                    "measurement_type": row.measurement_type,
+                    "id": row.id,
+                    "device_type": device_type
+                }
+                for row in rows
+            ])
+        columns = columnar.transpose(rows, MEASUREMENT_FIELDS)
+        del columns["point_code"]
+        return columnar.encode(fmt, columns, {"point_code": point_code, "device_type": device_type})
+
+async def time_series_page(request: Request, response: Response, db: AsyncSession, source: str, point_code: str, skip: int, limit: int, cursor: Optional[str]):
+    """专用数据表按时间倒序的一页，只查询列元组并直接编码（列顺序即响应模型的字段顺序）"""
+    names, rows = await async_crud.get_time_series_columns(db, source, point_code, skip, limit, parse_cursor(cursor))
+    paged(response, rows, limit)
+    fmt = columnar.negotiate(request)
+    with profiling.serializing():
+        if fmt == columnar.JSON:
+            return fastjson.response(fastjson.dump_rows(names, rows), response.headers)
+        columns = columnar.transpose(rows, names)
+        del columns["point_code"]
+        body = await run_in_threadpool(columnar.encode, fmt, columns, {"point_code": point_code})
+    return columnar.response(fmt, body, response.headers)
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {
         "message": "智慧水利监测平台 API",
         "version": "1.0.0",
@@ -46,96 +118,62 @@ def read_root():
 
 # 1. 获取所有测点 (用于 Cesium 打点) [cite: 21]
 @app.get("/points/", response_model=list[schemas.MonitorPointOut])
-def read_points(current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
-    points = db.query(models.MonitorPoint).all()
-    return points
+async def read_points(request: Request, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(get_db)):
+    # 测点列表取自缓存，响应体已预先序列化；客户端带 If-None-Match 重新验证时内容未变返回 304
+    snapshot = await point_cache.get(db)
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if response_cache.etag_matches(request, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
 
 # === 静态路由必须放在动态路由 {point_code} 之前 ===
 
 @app.get("/measurements/search", response_model=list[schemas.MeasurementSearchOut])
-def search_measurements(
+async def search_measurements(
+    response: Response,
     start_time: datetime = Query(None),
     end_time: datetime = Query(None),
     device_type: str = Query(None),
     point_name: str = Query(None),
-    skip: int = 0,
-    limit: int = 200,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    from sqlalchemy import or_
-    # 由于 Measurement.point_code 格式如 'IP3左右岸'，MonitorPoint.point_code 格式如 'IP3'
-    # 需要使用 LIKE 匹配
-    query = db.query(models.Measurement)
-    
-    if start_time:
-        query = query.filter(models.Measurement.time >= start_time)
-    if end_time:
-        query = query.filter(models.Measurement.time <= end_time)
-    
-    # 如果有设备类型或测点名筛选，需要先获取符合条件的测点编号前缀
-    if device_type or point_name:
-        point_query = db.query(models.MonitorPoint)
-        if device_type:
-            point_query = point_query.filter(models.MonitorPoint.device_type == device_type)
-        if point_name:
-            point_query = point_query.filter(models.MonitorPoint.point_name.like(f"%{point_name}%"))
-        matching_points = point_query.all()
-        matching_codes = [p.point_code for p in matching_points]
-        
-        if matching_codes:
-            # 使用 OR 条件匹配 point_code 前缀
-            conditions = [models.Measurement.point_code.like(f"{code}%") for code in matching_codes]
-            query = query.filter(or_(*conditions))
-        else:
-            # 没有匹配的测点，返回空
-            return []
-    
-    results = query.order_by(models.Measurement.time.desc()).offset(skip).limit(limit).all()
-    
-    # 获取所有测点信息用于映射
-    all_points = {p.point_code: p for p in db.query(models.MonitorPoint).all()}
-    
-    mapped_results = []
-    for m in results:
-        # 尝试匹配测点：从 'IP3左右岸' 提取 'IP3'
-        matched_point = None
-        for code, point in all_points.items():
-            if m.point_code.startswith(code):
-                matched_point = point
-                break
-        
-        out = schemas.MeasurementSearchOut(
-            id=m.id,
-            point_code=m.point_code,
-            value=m.value,
-            time=m.time,
-            device_type=matched_point.device_type if matched_point else None,
-            point_name=matched_point.point_name if matched_point else m.point_code,
-            measurement_type=m.measurement_type
-        )
-        mapped_results.append(out)
-        
-    return mapped_results
-
-@app.get("/measurements/latest", response_model=list[schemas.MeasurementLatest])
-def get_all_latest_measurements(current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
-    subquery = db.query(
-        models.Measurement.point_code,
-        func.max(models.Measurement.time).label('max_time')
-    ).group_by(models.Measurement.point_code).subquery()
-    
-    latest_data = db.query(models.Measurement).join(
-        subquery,
-        (models.Measurement.point_code == subquery.c.point_code) &
-        (models.Measurement.time == subquery.c.max_time)
-    ).all()
-    
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(200, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    position = parse_cursor(cursor)
+    conditions = await async_crud.measurement_search_conditions(db, start_time, end_time, device_type, point_name)
+    if conditions is None:
+        # 没有匹配的测点，返回空
+        return []
+    
+    results = await async_crud.search_measurements(db, conditions, skip, limit, position)
+    paged(response, results, limit)
+    
+    # 一次取出结果涉及的测点，按 base_point_code 直接映射；字段和顺序与 MeasurementSearchOut 相同
+    points = await async_crud.points_by_code(db, (m.base_point_code for m in results))
+    
+    with profiling.serializing():
+        mapped_results = []
+        for m in results:
+            matched_point = points.get(m.base_point_code)
+            mapped_results.append({
+                "point_code": m.point_code,
+                "value": m.value,
+                "time": m.time,
+                "measurement_type": m.measurement_type,
+                "id": m.id,
+                "device_type": matched_point.device_type if matched_point else None,
+                "point_name": matched_point.point_name if matched_point else m.point_code
+            })
+        body = fastjson.dumps(mapped_results)
+    return fastjson.response(body, response.headers)
+
+@app.get("/measurements/latest", response_model=list[schemas.MeasurementLatest], dependencies=[response_cache.conditional(rollups.MEASUREMENTS, per_point=False)])
+async def get_all_latest_measurements(current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(get_db)):
+    # 最新值表与测点表一次联表查询
     result = []
-    for measurement in latest_data:
-        point = db.query(models.MonitorPoint).filter(
-            models.MonitorPoint.point_code == measurement.point_code
-        ).first()
+    for measurement, point in await async_crud.get_all_latest_with_points(db, rollups.MEASUREMENTS):
         result.append(schemas.MeasurementLatest(
             point_code=measurement.point_code,
             point_name=point.point_name if point else measurement.point_code,
@@ -145,72 +183,137 @@ def get_all_latest_measurements(current_user: models.User = Depends(auth.get_cur
     
     return result
 
-@app.post("/measurements/batch", response_model=list[schemas.MeasurementOut])
-def create_measurements_batch(batch: schemas.MeasurementBatch, current_user: models.User = Depends(auth.get_current_admin_user), db: Session = Depends(get_db)):
-    result = []
-    for item in batch.measurements:
-        point = db.query(models.MonitorPoint).filter(
-            models.MonitorPoint.point_code == item.point_code
-        ).first()
-        if not point:
-            continue
-        
-        db_item = models.Measurement(
-            point_code=item.point_code,
-            value=item.value,
-            time=item.time or datetime.now(),
-            measurement_type=item.measurement_type
-        )
-        db.add(db_item)
-        result.append(db_item)
+async def bulk_create(db: AsyncSession, source: str, items: list, return_rows: bool):
+    """批量写入：一次查询校验测点，多行 INSERT ... RETURNING 写入，不存在的测点跳过"""
+    inserted = await async_crud.bulk_create(db, source, items)
     
-    db.commit()
-    for item in result:
-        db.refresh(item)
-    
-    return result
+    if not return_rows:
+        return schemas.BatchResult(inserted=len(inserted), skipped=len(items) - len(inserted))
+    return inserted
+
+@app.post("/measurements/batch", response_model=Union[list[schemas.MeasurementOut], schemas.BatchResult])
+async def create_measurements_batch(
+    batch: schemas.MeasurementBatch,
+    return_rows: bool = Query(True, description="是否返回写入的数据行，为 false 时只返回条数"),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await bulk_create(db, rollups.MEASUREMENTS, batch.measurements, return_rows)
+
+@app.post("/ingest/stream", response_model=schemas.IngestReport)
+async def ingest_stream(
+    request: Request,
+    table: str = Query(
+        rollups.MEASUREMENTS,
+        pattern="^(measurements|inverted_plumb|static_level|tension_line|water_level)$",
+        description="写入的数据表"
+    ),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$", description="数据格式，不传时按 Content-Type 判断"),
+    chunk_size: int = Query(1000, ge=1, le=10000, description="每个事务写入的行数"),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 直接读取 ASGI 请求体流，不把整个上传内容解析进内存
+    data_format = ingest.detect_format(fmt, request.headers.get("content-type"))
+    return await ingest.ingest_stream(request.stream(), db, table, data_format, chunk_size)
+
+@app.websocket("/ws/measurements")
+async def measurements_feed(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="访问令牌，浏览器 WebSocket 不能设置 Authorization 头时使用"),
+    source: list[str] = Query([], description="只推送这些数据表，可重复"),
+    point_code: list[str] = Query([], description="只推送这些测点，可重复"),
+    device_type: list[str] = Query([], description="只推送这些设备类型，可重复")
+):
+    # 实时推送新写入的数据，代替轮询 /measurements/latest；每条消息为 {"source": 数据表, "data": [数据行...]}
+    authorization = websocket.headers.get("authorization", "")
+    token = token or authorization.removeprefix("Bearer ").strip()
+    try:
+        async with database.AsyncSessionLocal() as db:
+            await auth.get_current_active_user(await auth.get_current_user(token=token, db=db))
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e.detail))
+        return
+    # 先订阅再完成握手，客户端连接成功后写入的数据都能收到
+    subscription = live.broker.subscribe(source, point_code, device_type)
+
+    async def forward():
+        while (message := await subscription.get()) is not None:
+            await websocket.send_text(message)
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="消费过慢，积压消息已丢弃")
+
+    async def wait_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = []
+    try:
+        await websocket.accept()
+        tasks = [asyncio.create_task(forward()), asyncio.create_task(wait_disconnect())]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        live.broker.unsubscribe(subscription)
+
+@app.get("/export/measurements")
+async def export_measurements(
+    start_time: datetime = Query(None),
+    end_time: datetime = Query(None),
+    device_type: str = Query(None),
+    point_name: str = Query(None),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$", description="导出格式: csv / ndjson / parquet"),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user)
+):
+    # 筛选条件与 /measurements/search 相同，结果按时间升序逐批流式输出
+    if fmt == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=400, detail="服务端未安装 pyarrow，无法导出 Parquet")
+    
+    batches = export.iter_batches(start_time, end_time, device_type, point_name)
+    return StreamingResponse(
+        export.ENCODERS[fmt](batches),
+        media_type=export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="measurements.{fmt}"'}
+    )
 
 # === 动态路由 ===
 
 # 2. 获取指定测点的历史数据 (用于 ECharts 折线图) [cite: 20]
-@app.get("/measurements/{point_code}", response_model=list[schemas.MeasurementOut])
-def read_measurements(point_code: str, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
-    data = db.query(models.Measurement).filter(
-        models.Measurement.point_code == point_code
-    ).order_by(models.Measurement.time).all()
-    return data
+@app.get("/measurements/{point_code}", response_model=list[schemas.MeasurementOut], dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def read_measurements(
+    point_code: str,
+    request: Request,
+    response: Response,
+    max_points: Optional[int] = Query(None, ge=3, description="最大返回点数，超出时在服务端降采样"),
+    bucket: str = Query("lttb", pattern="^(lttb|minmax)$", description="降采样方式: lttb / minmax"),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 只查询列元组，不构造 ORM 对象
+    data = await async_crud.get_measurement_columns(db, point_code)
+    fmt = columnar.negotiate(request)
+    # 降采样和编码是纯 CPU 计算，放到线程池执行，不阻塞事件循环
+    body = await run_in_threadpool(encode_measurements, fmt, data, max_points, bucket, point_code, None)
+    return columnar.response(fmt, body, response.headers)
 
 # 3. 动态添加监测数据 (对应指导书具体任务 [cite: 22])
 @app.post("/measurements/", response_model=schemas.MeasurementOut)
-def create_measurement(item: schemas.MeasurementCreate, current_user: models.User = Depends(auth.get_current_admin_user), db: Session = Depends(get_db)):
-    point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == item.point_code).first()
-    if not point:
+async def create_measurement(item: schemas.MeasurementCreate, current_user: schemas.Principal = Depends(auth.get_current_admin_user), db: AsyncSession = Depends(get_db)):
+    created = await async_crud.create_data(db, rollups.MEASUREMENTS, item)
+    if created is None:
         raise HTTPException(status_code=404, detail="测点不存在")
-    
-    db_item = models.Measurement(
-        point_code=item.point_code,
-        value=item.value,
-        time=item.time or datetime.now(),
-        measurement_type=item.measurement_type
-    )
-    db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
-    return db_item
+    return created
 
-@app.get("/points/{point_code}", response_model=schemas.MonitorPointDetail)
-def read_point_detail(point_code: str, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
-    point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == point_code).first()
+@app.get("/points/{point_code}", response_model=schemas.MonitorPointDetail, dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def read_point_detail(point_code: str, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(get_db)):
+    point = await async_crud.get_cached_point(db, point_code)
     if not point:
         raise HTTPException(status_code=404, detail="测点不存在")
     
-    latest_measurement = db.query(models.Measurement).filter(
-        models.Measurement.point_code == point_code
-    ).order_by(models.Measurement.time.desc()).first()
+    latest_measurement = await async_crud.get_latest_row(db, rollups.MEASUREMENTS, point_code)
     
-    data_count = db.query(models.Measurement).filter(
-        models.Measurement.point_code == point_code
-    ).count()
+    stats = await async_crud.query_stats(db, rollups.MEASUREMENTS, point_code)
+    data_count = stats["count"] if stats else 0
     
     return schemas.MonitorPointDetail(
         point_code=point.point_code,
@@ -230,101 +333,111 @@ def read_point_detail(point_code: str, current_user: models.User = Depends(auth.
 
 
 
-@app.get("/measurements/{point_code}/stats", response_model=schemas.MeasurementStats)
-def get_measurement_stats(point_code: str, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
-    stats = db.query(
-        func.max(models.Measurement.value).label('max_value'),
-        func.min(models.Measurement.value).label('min_value'),
-        func.avg(models.Measurement.value).label('avg_value'),
-        func.count(models.Measurement.id).label('count'),
-        func.max(models.Measurement.time).label('latest_time'),
-        func.min(models.Measurement.time).label('earliest_time')
-    ).filter(models.Measurement.point_code == point_code).first()
+@app.get("/measurements/{point_code}/stats", response_model=schemas.MeasurementStats, dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def get_measurement_stats(
+    point_code: str,
+    start_time: datetime = Query(None, description="开始时间"),
+    end_time: datetime = Query(None, description="结束时间"),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 由小时/天/月汇总表计算，开销与时间桶数量相关，与原始数据量无关
+    stats = await async_crud.query_stats(db, rollups.MEASUREMENTS, point_code, start_time, end_time)
     
-    if not stats or stats.count == 0:
+    if not stats:
         raise HTTPException(status_code=404, detail="测点无数据")
     
     return schemas.MeasurementStats(
         point_code=point_code,
-        max_value=stats.max_value,
-        min_value=stats.min_value,
-        avg_value=stats.avg_value,
-        count=stats.count,
-        latest_time=stats.latest_time,
-        earliest_time=stats.earliest_time
+        max_value=stats["max"],
+        min_value=stats["min"],
+        avg_value=stats["sum"] / stats["count"],
+        count=stats["count"],
+        latest_time=stats["latest_time"],
+        earliest_time=stats["earliest_time"]
     )
 
-@app.get("/measurements/{point_code}/range", response_model=list[schemas.MeasurementOut])
-def get_measurements_by_range(
+@app.get("/measurements/{point_code}/rollups", response_model=list[schemas.MeasurementRollupOut], dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def get_measurement_rollups(
     point_code: str,
+    granularity: str = Query("day", pattern="^(hour|day|month)$", description="汇总粒度: hour / day / month"),
+    start_time: datetime = Query(None, description="开始时间"),
+    end_time: datetime = Query(None, description="结束时间"),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    buckets = await async_crud.query_buckets(db, rollups.MEASUREMENTS, point_code, granularity, start_time, end_time)
+    return [
+        schemas.MeasurementRollupOut(
+            point_code=b.point_code,
+            measurement_type=b.measurement_type or None,
+            granularity=b.granularity,
+            bucket_start=b.bucket_start,
+            count=b.count,
+            avg_value=b.sum_value / b.count,
+            min_value=b.min_value,
+            max_value=b.max_value,
+            first_value=b.first_value,
+            last_value=b.last_value
+        )
+        for b in buckets
+    ]
+
+@app.get("/measurements/{point_code}/range", response_model=list[schemas.MeasurementOut], dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def get_measurements_by_range(
+    point_code: str,
+    request: Request,
+    response: Response,
     start_time: datetime = Query(..., description="开始时间"),
     end_time: datetime = Query(..., description="结束时间"),
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    max_points: Optional[int] = Query(None, ge=3, description="最大返回点数，超出时在服务端降采样"),
+    bucket: str = Query("lttb", pattern="^(lttb|minmax)$", description="降采样方式: lttb / minmax"),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    point = db.query(models.MonitorPoint).filter(
-        models.MonitorPoint.point_code == point_code
-    ).first()
+    point = await async_crud.get_cached_point(db, point_code)
     
     device_type = point.device_type if point else None
     
-    data = db.query(models.Measurement).filter(
-        models.Measurement.point_code == point_code,
-        models.Measurement.time >= start_time,
-        models.Measurement.time <= end_time
-    ).order_by(models.Measurement.time).all()
-    
-    result = []
-    for item in data:
-        result.append(schemas.MeasurementOut(
-            id=item.id,
-            point_code=item.point_code,
-            value=item.value,
-            time=item.time,
-            device_type=device_type
-        ))
-    
-    return result
+    # 先由汇总表得到范围内的条数、极值和首末时间（与原始数据量无关）：范围内无数据时不再扫描原始数据，
+    # 有数据时只扫描 [最早, 最晚] 之间的行。降采样后客户端仍可由响应头得到整个范围的真实条数和极值
+    stats = await async_crud.query_stats(db, rollups.MEASUREMENTS, point_code, start_time, end_time)
+    if stats is None:
+        data = []
+        response.headers[RANGE_COUNT_HEADER] = "0"
+    else:
+        data = await async_crud.get_measurement_columns(db, point_code, stats["earliest_time"], stats["latest_time"])
+        response.headers.update({
+            RANGE_COUNT_HEADER: str(stats["count"]),
+            RANGE_MIN_HEADER: repr(stats["min"]),
+            RANGE_MAX_HEADER: repr(stats["max"]),
+        })
+    fmt = columnar.negotiate(request)
+    # 先降采样，只为保留下来的点编码
+    body = await run_in_threadpool(encode_measurements, fmt, data, max_points, bucket, point_code, device_type)
+    return columnar.response(fmt, body, response.headers)
 
 @app.put("/measurements/{measurement_id}", response_model=schemas.MeasurementOut)
-def update_measurement(measurement_id: int, item: schemas.MeasurementUpdate, current_user: models.User = Depends(auth.get_current_admin_user), db: Session = Depends(get_db)):
-    db_item = db.query(models.Measurement).filter(models.Measurement.id == measurement_id).first()
+async def update_measurement(measurement_id: int, item: schemas.MeasurementUpdate, current_user: schemas.Principal = Depends(auth.get_current_admin_user), db: AsyncSession = Depends(get_db)):
+    db_item = await async_crud.update_measurement(db, measurement_id, item)
     if not db_item:
         raise HTTPException(status_code=404, detail="数据不存在")
-    
-    if item.value is not None:
-        db_item.value = item.value
-    if item.time:
-        db_item.time = item.time
-    if item.measurement_type is not None:
-        db_item.measurement_type = item.measurement_type
-    
-    db.commit()
-    db.refresh(db_item)
     return db_item
 
 @app.delete("/measurements/{measurement_id}")
-def delete_measurement(measurement_id: int, current_user: models.User = Depends(auth.get_current_admin_user), db: Session = Depends(get_db)):
-    db_item = db.query(models.Measurement).filter(models.Measurement.id == measurement_id).first()
-    if not db_item:
+async def delete_measurement(measurement_id: int, current_user: schemas.Principal = Depends(auth.get_current_admin_user), db: AsyncSession = Depends(get_db)):
+    if not await async_crud.delete_measurement(db, measurement_id):
         raise HTTPException(status_code=404, detail="数据不存在")
-    
-    db.delete(db_item)
-    db.commit()
     return {"message": "删除成功"}
 
-@app.get("/measurements/{point_code}/latest", response_model=schemas.MeasurementLatest)
-def get_latest_measurement(point_code: str, current_user: models.User = Depends(auth.get_current_active_user), db: Session = Depends(get_db)):
-    measurement = db.query(models.Measurement).filter(
-        models.Measurement.point_code == point_code
-    ).order_by(models.Measurement.time.desc()).first()
+@app.get("/measurements/{point_code}/latest", response_model=schemas.MeasurementLatest, dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def get_latest_measurement(point_code: str, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(get_db)):
+    measurement = await async_crud.get_latest_row(db, rollups.MEASUREMENTS, point_code)
     
     if not measurement:
         raise HTTPException(status_code=404, detail="测点无数据")
     
-    point = db.query(models.MonitorPoint).filter(
-        models.MonitorPoint.point_code == point_code
-    ).first()
+    point = await async_crud.get_cached_point(db, point_code)
     
     return schemas.MeasurementLatest(
         point_code=measurement.point_code,
@@ -334,76 +447,110 @@ def get_latest_measurement(point_code: str, current_user: models.User = Depends(
     )
 
 @app.post("/alerts/check", response_model=list[schemas.AlertInfo])
-def check_alerts(configs: list[schemas.AlertConfig], db: Session = Depends(get_db)):
-    alerts = []
-    
-    for config in configs:
-        if not config.alert_enabled:
-            continue
-        
-        latest = db.query(models.Measurement).filter(
-            models.Measurement.point_code == config.point_code
-        ).order_by(models.Measurement.time.desc()).first()
-        
-        if not latest:
-            continue
-        
-        point = db.query(models.MonitorPoint).filter(
-            models.MonitorPoint.point_code == config.point_code
-        ).first()
-        
-        if config.max_value is not None and latest.value > config.max_value:
-            alerts.append(schemas.AlertInfo(
-                point_code=config.point_code,
-                point_name=point.point_name if point else config.point_code,
-                current_value=latest.value,
-                alert_type="超过上限",
-                threshold=config.max_value,
-                time=latest.time
-            ))
-        
-        if config.min_value is not None and latest.value < config.min_value:
-            alerts.append(schemas.AlertInfo(
-                point_code=config.point_code,
-                point_name=point.point_name if point else config.point_code,
-                current_value=latest.value,
-                alert_type="低于下限",
-                threshold=config.min_value,
-                time=latest.time
-            ))
-    
-    return alerts
+async def check_alerts(
+    configs: list[schemas.AlertConfig],
+    mode: str = Query("latest", pattern="^(latest|window)$", description="latest 只判断最新值，window 判断时间范围内的全部读数"),
+    start_time: Optional[datetime] = Query(None, description="window 模式的开始时间（必填）"),
+    end_time: Optional[datetime] = Query(None, description="window 模式的结束时间，不传表示至今"),
+    db: AsyncSession = Depends(get_db)
+):
+    # 一次查询取出全部测点的读数，再用 NumPy 对整批配置比较阈值，耗时与配置个数基本无关
+    point_codes = {alert_config.point_code for alert_config in configs if alert_config.alert_enabled}
+    if mode == "window":
+        if start_time is None:
+            raise HTTPException(status_code=400, detail="window 模式需要 start_time")
+        # 只取可能越限的读数，数据库端先按所有配置中最宽松的阈值过滤
+        above, below = alerts.window_bounds(configs)
+        if above is None and below is None:
+            return []
+        columns = await async_crud.get_measurement_values(db, point_codes, start_time, end_time, above, below)
+        violations = await run_in_threadpool(alerts.check_window, configs, *columns)
+    else:
+        latest_values = await async_crud.get_latest_values(db, rollups.MEASUREMENTS, point_codes)
+        violations = alerts.check_latest(configs, latest_values)
+
+    points = await async_crud.points_by_code(db, (configs[i].point_code for i, _, _, _, _ in violations))
+    return [
+        schemas.AlertInfo(
+            point_code=configs[i].point_code,
+            point_name=points[configs[i].point_code].point_name if configs[i].point_code in points else configs[i].point_code,
+            current_value=value,
+            alert_type=alert_type,
+            threshold=threshold,
+            time=time
+        )
+        for i, alert_type, value, threshold, time in violations
+    ]
 
-@app.get("/measurements/{point_code}/compare", response_model=schemas.MeasurementCompare)
-def compare_measurements(
+@app.get("/alerts", response_model=list[schemas.AlertEventOut])
+async def read_alert_events(
+    response: Response,
+    active: Optional[bool] = Query(None, description="true 只看持续中的告警，false 只看已解除的"),
+    point_code: Optional[str] = Query(None, description="规则的测点编号"),
+    start_time: Optional[datetime] = Query(None, description="触发时间不早于"),
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(100, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 告警在数据写入时已按规则判断并记录，这里只读取记录
+    events = await async_crud.get_alert_events(db, active, point_code, start_time, skip, limit, parse_cursor(cursor))
+    return paged(response, events, limit)
+
+@app.get("/alerts/rules", response_model=list[schemas.AlertRuleOut])
+async def read_alert_rules(current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(get_db)):
+    return await async_crud.get_alert_rules(db)
+
+@app.post("/alerts/rules", response_model=schemas.AlertRuleOut)
+async def create_alert_rule(
+    rule: schemas.AlertRuleCreate,
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not await async_crud.get_cached_point(db, rule.point_code):
+        raise HTTPException(status_code=404, detail="测点不存在")
+    return await async_crud.create_alert_rule(db, rule)
+
+@app.put("/alerts/rules/{rule_id}", response_model=schemas.AlertRuleOut)
+async def update_alert_rule(
+    rule_id: int,
+    rule_update: schemas.AlertRuleUpdate,
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # 只更新请求中明确传递的字段，传 null 可清除上下限
+    update_data = rule_update.model_dump(exclude_unset=True)
+    if not update_data:
+        raise HTTPException(status_code=400, detail="没有提供要更新的字段")
+    db_rule = await async_crud.update_alert_rule(db, rule_id, update_data)
+    if not db_rule:
+        raise HTTPException(status_code=404, detail="规则不存在")
+    return db_rule
+
+@app.delete("/alerts/rules/{rule_id}")
+async def delete_alert_rule(rule_id: int, current_user: schemas.Principal = Depends(auth.get_current_admin_user), db: AsyncSession = Depends(get_db)):
+    if not await async_crud.delete_alert_rule(db, rule_id):
+        raise HTTPException(status_code=404, detail="规则不存在")
+    return {"message": "规则删除成功"}
+
+@app.get("/measurements/{point_code}/compare", response_model=schemas.MeasurementCompare, dependencies=[response_cache.conditional(rollups.MEASUREMENTS)])
+async def compare_measurements(
     point_code: str, 
     current_time: datetime = Query(None, description="当前监测时间"),
     previous_time: datetime = Query(None, description="对比监测时间"),
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(models.Measurement).filter(
-        models.Measurement.point_code == point_code
-    )
-    
-    if current_time:
-        current = query.filter(models.Measurement.time <= current_time).order_by(
-            models.Measurement.time.desc()
-        ).first()
-    else:
-        current = query.order_by(models.Measurement.time.desc()).first()
+    current = await async_crud.get_measurement_before(db, point_code, current_time)
     
     if not current:
         raise HTTPException(status_code=404, detail="未找到当前监测数据")
     
     if previous_time:
-        previous = query.filter(models.Measurement.time <= previous_time).order_by(
-            models.Measurement.time.desc()
-        ).first()
+        previous = await async_crud.get_measurement_before(db, point_code, previous_time)
     else:
-        previous = query.filter(models.Measurement.time < current.time).order_by(
-            models.Measurement.time.desc()
-        ).first()
+        previous = await async_crud.get_measurement_before(db, point_code, current.time, inclusive=False)
     
     if not previous:
         raise HTTPException(status_code=404, detail="未找到对比监测数据")
@@ -411,9 +558,7 @@ def compare_measurements(
     change_value = current.value - previous.value
     change_percent = (change_value / previous.value * 100) if previous.value != 0 else 0
     
-    point = db.query(models.MonitorPoint).filter(
-        models.MonitorPoint.point_code == point_code
-    ).first()
+    point = await async_crud.get_cached_point(db, point_code)
     
     return schemas.MeasurementCompare(
         point_code=point_code,
@@ -426,21 +571,22 @@ def compare_measurements(
     )
 
 @app.post("/auth/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_username(db, username=user.username)
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await async_crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="用户名已存在")
     
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await async_crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="邮箱已被注册")
     
-    return crud.create_user(db=db, user=user)
+    return await async_crud.create_user(db=db, user=user)
 
 @app.post("/auth/login", response_model=schemas.Token)
-def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = auth.authenticate_user(db, user_credentials.username, user_credentials.password)
+async def login(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await async_crud.authenticate_user(db, user_credentials.username, user_credentials.password)
     if not user:
+        metrics.auth_failures.labels("bad_password").inc()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -464,7 +610,7 @@ def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
     )
 
 @app.get("/auth/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: schemas.Principal = Depends(auth.get_current_active_user)):
     return schemas.UserResponse(
         id=current_user.id,
         username=current_user.username,
@@ -475,13 +621,16 @@ def read_users_me(current_user: models.User = Depends(auth.get_current_active_us
     )
 
 @app.get("/auth/users", response_model=list[schemas.UserResponse])
-def read_users(
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+async def read_users(
+    response: Response,
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(100, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    users = crud.get_users(db, skip=skip, limit=limit)
+    users = await async_crud.get_users(db, skip=skip, limit=limit, cursor=parse_cursor(cursor))
+    paged(response, users, limit)
     return [
         schemas.UserResponse(
             id=user.id,
@@ -495,13 +644,13 @@ def read_users(
     ]
 
 @app.put("/auth/users/{user_id}", response_model=schemas.UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: dict,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = crud.update_user(db, user_id=user_id, user_update=user_update)
+    db_user = await async_crud.update_user(db, user_id=user_id, user_update=user_update)
     if db_user is None:
         raise HTTPException(status_code=404, detail="用户不存在")
     return schemas.UserResponse(
@@ -514,44 +663,63 @@ def update_user(
     )
 
 @app.delete("/auth/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    success = crud.delete_user(db, user_id=user_id)
+    success = await async_crud.delete_user(db, user_id=user_id)
     if not success:
         raise HTTPException(status_code=404, detail="用户不存在")
     return {"message": "用户删除成功"}
 
 @app.post("/auth/users", response_model=schemas.UserResponse)
-def create_user(
+async def create_user(
     user: schemas.UserCreate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await async_crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="用户名已存在")
-    return crud.create_user(db=db, user=user)
+    return await async_crud.create_user(db=db, user=user)
+
+@app.get("/auth/hashing/stats", response_model=schemas.HashPoolStats)
+async def read_hashing_stats(current_user: schemas.Principal = Depends(auth.get_current_admin_user)):
+    # 登录高峰时观察密码哈希的排队情况
+    return hashing.hash_pool.stats()
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(metrics.check_access)])
+async def read_metrics():
+    # 供 Prometheus 抓取，不使用用户令牌；按来源地址或 METRICS_TOKEN 限制访问
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/requests", response_model=list[schemas.RequestProfileOut])
+async def read_request_profiles(
+    n_plus_one: bool = Query(False, description="只返回检测到 N+1 查询的请求"),
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user)
+):
+    # 最近被抽样记录的请求，最新的在前
+    return profiling.recent.list(limit, n_plus_one)
 
 @app.post("/points/", response_model=schemas.MonitorPointOut)
-def create_point(
+async def create_point(
     point: schemas.PointCreate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    db_point = crud.get_point_by_code(db, point_code=point.point_code)
+    db_point = await async_crud.get_point_by_code(db, point_code=point.point_code)
     if db_point:
         raise HTTPException(status_code=400, detail="测点编号已存在")
-    return crud.create_point(db=db, point=point)
+    return await async_crud.create_point(db=db, point=point)
 
 @app.put("/points/{point_code}", response_model=schemas.MonitorPointOut)
-def update_point(
+async def update_point(
     point_code: str,
     point_update: schemas.PointUpdate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # 使用 exclude_unset=False 来保留显式设置的 None 值（用于解绑操作）
     # 这样前端传入 bind_model_id: null 时能正确清空数据库中的值
@@ -564,146 +732,194 @@ def update_point(
     if not update_data:
         raise HTTPException(status_code=400, detail="没有提供要更新的字段")
     
-    db_point = crud.update_point(db, point_code=point_code, point_update=update_data)
+    db_point = await async_crud.update_point(db, point_code=point_code, point_update=update_data)
     if not db_point:
         raise HTTPException(status_code=404, detail="测点不存在")
     return db_point
 
 @app.delete("/points/{point_code}")
-def delete_point(
+async def delete_point(
     point_code: str,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    success = crud.delete_point(db, point_code=point_code)
+    success = await async_crud.delete_point(db, point_code=point_code)
     if not success:
         raise HTTPException(status_code=404, detail="测点不存在")
     return {"message": "测点删除成功"}
 
-@app.get("/inverted-plumb/{point_code}", response_model=list[schemas.InvertedPlumbDataOut])
-def read_inverted_plumb_data(
+@app.get("/inverted-plumb/{point_code}", response_model=list[schemas.InvertedPlumbDataOut], dependencies=[response_cache.conditional(rollups.INVERTED_PLUMB)])
+async def read_inverted_plumb_data(
     point_code: str,
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(100, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_inverted_plumb_data(db, point_code, skip, limit)
+    return await time_series_page(request, response, db, rollups.INVERTED_PLUMB, point_code, skip, limit, cursor)
 
 @app.post("/inverted-plumb/", response_model=schemas.InvertedPlumbDataOut)
-def create_inverted_plumb_data(
+async def create_inverted_plumb_data(
     data: schemas.InvertedPlumbDataCreate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == data.point_code).first()
-    if not point:
+    created = await async_crud.create_data(db, rollups.INVERTED_PLUMB, data)
+    if created is None:
         raise HTTPException(status_code=404, detail="测点不存在")
-    return crud.create_inverted_plumb_data(db, data)
+    return created
+
+@app.post("/inverted-plumb/batch", response_model=Union[list[schemas.InvertedPlumbDataOut], schemas.BatchResult])
+async def create_inverted_plumb_data_batch(
+    batch: schemas.InvertedPlumbDataBatch,
+    return_rows: bool = Query(True, description="是否返回写入的数据行，为 false 时只返回条数"),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await bulk_create(db, rollups.INVERTED_PLUMB, batch.data, return_rows)
 
-@app.get("/inverted-plumb/{point_code}/latest", response_model=schemas.InvertedPlumbDataOut)
-def read_latest_inverted_plumb(
+@app.get("/inverted-plumb/{point_code}/latest", response_model=schemas.InvertedPlumbDataOut, dependencies=[response_cache.conditional(rollups.INVERTED_PLUMB)])
+async def read_latest_inverted_plumb(
     point_code: str,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    data = crud.get_latest_inverted_plumb(db, point_code)
+    data = await async_crud.get_latest_row(db, rollups.INVERTED_PLUMB, point_code)
     if not data:
         raise HTTPException(status_code=404, detail="测点无数据")
     return data
 
-@app.get("/static-level/{point_code}", response_model=list[schemas.StaticLevelDataOut])
-def read_static_level_data(
+@app.get("/static-level/{point_code}", response_model=list[schemas.StaticLevelDataOut], dependencies=[response_cache.conditional(rollups.STATIC_LEVEL)])
+async def read_static_level_data(
     point_code: str,
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(100, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_static_level_data(db, point_code, skip, limit)
+    return await time_series_page(request, response, db, rollups.STATIC_LEVEL, point_code, skip, limit, cursor)
 
 @app.post("/static-level/", response_model=schemas.StaticLevelDataOut)
-def create_static_level_data(
+async def create_static_level_data(
     data: schemas.StaticLevelDataCreate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == data.point_code).first()
-    if not point:
+    created = await async_crud.create_data(db, rollups.STATIC_LEVEL, data)
+    if created is None:
         raise HTTPException(status_code=404, detail="测点不存在")
-    return crud.create_static_level_data(db, data)
+    return created
+
+@app.post("/static-level/batch", response_model=Union[list[schemas.StaticLevelDataOut], schemas.BatchResult])
+async def create_static_level_data_batch(
+    batch: schemas.StaticLevelDataBatch,
+    return_rows: bool = Query(True, description="是否返回写入的数据行，为 false 时只返回条数"),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await bulk_create(db, rollups.STATIC_LEVEL, batch.data, return_rows)
 
-@app.get("/static-level/{point_code}/latest", response_model=schemas.StaticLevelDataOut)
-def read_latest_static_level(
+@app.get("/static-level/{point_code}/latest", response_model=schemas.StaticLevelDataOut, dependencies=[response_cache.conditional(rollups.STATIC_LEVEL)])
+async def read_latest_static_level(
     point_code: str,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    data = crud.get_latest_static_level(db, point_code)
+    data = await async_crud.get_latest_row(db, rollups.STATIC_LEVEL, point_code)
     if not data:
         raise HTTPException(status_code=404, detail="测点无数据")
     return data
 
-@app.get("/tension-line/{point_code}", response_model=list[schemas.TensionLineDataOut])
-def read_tension_line_data(
+@app.get("/tension-line/{point_code}", response_model=list[schemas.TensionLineDataOut], dependencies=[response_cache.conditional(rollups.TENSION_LINE)])
+async def read_tension_line_data(
     point_code: str,
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(100, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_tension_line_data(db, point_code, skip, limit)
+    return await time_series_page(request, response, db, rollups.TENSION_LINE, point_code, skip, limit, cursor)
 
 @app.post("/tension-line/", response_model=schemas.TensionLineDataOut)
-def create_tension_line_data(
+async def create_tension_line_data(
     data: schemas.TensionLineDataCreate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == data.point_code).first()
-    if not point:
+    created = await async_crud.create_data(db, rollups.TENSION_LINE, data)
+    if created is None:
         raise HTTPException(status_code=404, detail="测点不存在")
-    return crud.create_tension_line_data(db, data)
+    return created
+
+@app.post("/tension-line/batch", response_model=Union[list[schemas.TensionLineDataOut], schemas.BatchResult])
+async def create_tension_line_data_batch(
+    batch: schemas.TensionLineDataBatch,
+    return_rows: bool = Query(True, description="是否返回写入的数据行，为 false 时只返回条数"),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await bulk_create(db, rollups.TENSION_LINE, batch.data, return_rows)
 
-@app.get("/tension-line/{point_code}/latest", response_model=schemas.TensionLineDataOut)
-def read_latest_tension_line(
+@app.get("/tension-line/{point_code}/latest", response_model=schemas.TensionLineDataOut, dependencies=[response_cache.conditional(rollups.TENSION_LINE)])
+async def read_latest_tension_line(
     point_code: str,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    data = crud.get_latest_tension_line(db, point_code)
+    data = await async_crud.get_latest_row(db, rollups.TENSION_LINE, point_code)
     if not data:
         raise HTTPException(status_code=404, detail="测点无数据")
     return data
 
-@app.get("/water-level/{point_code}", response_model=list[schemas.WaterLevelDataOut])
-def read_water_level_data(
+@app.get("/water-level/{point_code}", response_model=list[schemas.WaterLevelDataOut], dependencies=[response_cache.conditional(rollups.WATER_LEVEL)])
+async def read_water_level_data(
     point_code: str,
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = CURSOR_QUERY,
+    skip: int = SKIP_QUERY,
+    limit: int = Query(100, ge=1),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_water_level_data(db, point_code, skip, limit)
+    return await time_series_page(request, response, db, rollups.WATER_LEVEL, point_code, skip, limit, cursor)
 
 @app.post("/water-level/", response_model=schemas.WaterLevelDataOut)
-def create_water_level_data(
+async def create_water_level_data(
     data: schemas.WaterLevelDataCreate,
-    current_user: models.User = Depends(auth.get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == data.point_code).first()
-    if not point:
+    created = await async_crud.create_data(db, rollups.WATER_LEVEL, data)
+    if created is None:
         raise HTTPException(status_code=404, detail="测点不存在")
-    return crud.create_water_level_data(db, data)
+    return created
+
+@app.post("/water-level/batch", response_model=Union[list[schemas.WaterLevelDataOut], schemas.BatchResult])
+async def create_water_level_data_batch(
+    batch: schemas.WaterLevelDataBatch,
+    return_rows: bool = Query(True, description="是否返回写入的数据行，为 false 时只返回条数"),
+    current_user: schemas.Principal = Depends(auth.get_current_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await bulk_create(db, rollups.WATER_LEVEL, batch.data, return_rows)
 
-@app.get("/water-level/{point_code}/latest", response_model=schemas.WaterLevelDataOut)
-def read_latest_water_level(
+@app.get("/water-level/{point_code}/latest", response_model=schemas.WaterLevelDataOut, dependencies=[response_cache.conditional(rollups.WATER_LEVEL)])
+async def read_latest_water_level(
     point_code: str,
-    current_user: models.User = Depends(auth.get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    data = crud.get_latest_water_level(db, point_code)
+    data = await async_crud.get_latest_row(db, rollups.WATER_LEVEL, point_code)
     if not data:
         raise HTTPException(status_code=404, detail="测点无数据")
     return data
\ No newline at end of file
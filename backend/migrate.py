@@ -0,0 +1,18 @@
+"""
+数据库迁移：建表，补加旧数据库缺少的列和索引，回填新建的汇总表，按 TIMESCALE_HYPERTABLES 转换超表。
+部署时在启动服务之前执行一次（多个副本同时执行也安全，由迁移锁串行执行），服务设置 AUTO_MIGRATE=false。
+
+运行:
+    python migrate.py
+"""
+from sql_app import migrations
+
+if __name__ == "__main__":
+    result = migrations.migrate()
+    for column in result["columns"]:
+        print(f"已补加列: {column}")
+    for table in result["backfilled"]:
+        print(f"已按原始数据回填: {table}")
+    for table in result["hypertables"]:
+        print(f"已转换为 TimescaleDB 超表: {table}")
+    print("数据库迁移完成")
@@ -0,0 +1,16 @@
+from sql_app import database, models, rollups, latest
+
+def rebuild_summaries():
+    """按原始监测数据重建小时/天/月汇总表和最新值表（已有数据库升级后执行一次）"""
+    db = database.SessionLocal()
+    try:
+        models.Base.metadata.create_all(bind=database.engine)
+        total = rollups.rebuild(db)
+        print(f"汇总表重建完成，共处理 {total} 条数据")
+        total = latest.rebuild(db)
+        print(f"最新值表重建完成，共 {total} 条最新值")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_summaries()
@@ -0,0 +1,239 @@
+"""告警规则引擎：新数据写入时（crud.record_inserted）只对新读数判断，不再由客户端轮询时逐条查询。
+启用的规则缓存为 (来源, 测点编号) -> 规则列表的索引，每个读数的开销与该测点的规则数成正比；
+每条规则、测量类型的上一个读数和持续中的告警记在 alert_states，触发和解除记入 alert_events。
+早于上一个读数的数据（补录历史数据）不参与判断"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+from . import config, metrics, models, rollups, schemas
+
+ABOVE_MAX = "超过上限"
+BELOW_MIN = "低于下限"
+RATE = "变化过快"
+
+class RuleIndex:
+    def __init__(self, version: int, rules: List[schemas.AlertRuleOut]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.by_point: Dict[Tuple[str, str], List[schemas.AlertRuleOut]] = {}
+        for rule in rules:
+            self.by_point.setdefault((rule.source, rule.point_code), []).append(rule)
+
+    def rules_for(self, source: str, item) -> List[schemas.AlertRuleOut]:
+        """数据行适用的规则：测量数据的 point_code 形如 IP3左右岸，按所属测点 IP3 也能匹配"""
+        rules = self.by_point.get((source, item.point_code), [])
+        base = getattr(item, "base_point_code", None)
+        if base and base != item.point_code:
+            rules = rules + self.by_point.get((source, base), [])
+        return rules
+
+_lock = threading.Lock()
+_version = 0
+_index: Optional[RuleIndex] = None
+_cache_hit, _cache_miss = metrics.cache_counters("alert_rules")
+
+def invalidate():
+    """告警规则表提交修改后调用"""
+    global _version
+    with _lock:
+        _version += 1
+
+def _rule_index(db: Session) -> RuleIndex:
+    global _index
+    index = _index
+    if index is not None and index.version == _version and time.monotonic() - index.loaded_at < config.ALERT_RULE_CACHE_TTL:
+        _cache_hit.inc()
+        return index
+    _cache_miss.inc()
+    version = _version
+    rules = db.query(models.AlertRule).filter(models.AlertRule.enabled.is_(True)).all()
+    index = RuleIndex(version, [schemas.AlertRuleOut.model_validate(rule) for rule in rules])
+    _index = index
+    return index
+
+def _check(rule: schemas.AlertRuleOut, state: models.AlertState, reading_time: datetime, value: float, fired: list, cleared: list):
+    """按一个新读数更新状态，触发的告警加入 fired，解除的 (告警类型, 时间) 加入 cleared"""
+    def transition(active: bool, alert_type: str, breached: bool, recovered: bool, current: float, threshold: float) -> bool:
+        if not active and breached:
+            fired.append((alert_type, current, threshold))
+            return True
+        if active and recovered:
+            cleared.append(alert_type)
+            return False
+        return active
+
+    if rule.max_value is not None:
+        state.high_active = transition(
+            state.high_active, ABOVE_MAX, value > rule.max_value, value <= rule.max_value - rule.hysteresis, value, rule.max_value)
+    if rule.min_value is not None:
+        state.low_active = transition(
+            state.low_active, BELOW_MIN, value < rule.min_value, value >= rule.min_value + rule.hysteresis, value, rule.min_value)
+    if rule.max_rate is not None and state.last_time is not None and reading_time > state.last_time:
+        rate = abs(value - state.last_value) / ((reading_time - state.last_time).total_seconds() / 3600)
+        state.rate_active = transition(state.rate_active, RATE, rate > rule.max_rate, rate <= rule.max_rate, rate, rule.max_rate)
+    state.last_time = reading_time
+    state.last_value = value
+
+def evaluate(db: Session, source: str, items: list):
+    """对新写入的数据行判断告警，需在提交前调用"""
+    index = _rule_index(db)
+    if not index.by_point:
+        return
+    matched = []
+    for item in items:
+        rules = index.rules_for(source, item)
+        if not rules:
+            continue
+        for _, measurement_type, reading_time, value in rollups.readings_of(source, [item]):
+            if value is None or reading_time is None:
+                continue
+            for rule in rules:
+                if rule.measurement_type and rule.measurement_type != measurement_type:
+                    continue
+                matched.append((reading_time, rule, measurement_type, value))
+    if not matched:
+        return
+
+    # 一次查询取出涉及规则的全部状态，按时间顺序逐个读数判断
+    matched.sort(key=lambda m: m[0])
+    rule_ids = {rule.id for _, rule, _, _ in matched}
+    states = {
+        (state.rule_id, state.measurement_type): state
+        for state in db.query(models.AlertState).filter(models.AlertState.rule_id.in_(rule_ids))
+    }
+    new_events = []
+    # 本批新触发且尚未解除的告警，解除时直接填写 cleared_at；其余解除的是之前批次写入的告警
+    open_events: Dict[Tuple[int, str, str], dict] = {}
+    clears = []
+    for reading_time, rule, measurement_type, value in matched:
+        state = states.get((rule.id, measurement_type))
+        if state is None:
+            state = models.AlertState(rule_id=rule.id, measurement_type=measurement_type,
+                                      high_active=False, low_active=False, rate_active=False)
+            db.add(state)
+            states[(rule.id, measurement_type)] = state
+        elif state.last_time is not None and reading_time <= state.last_time:
+            continue
+        fired, cleared = [], []
+        _check(rule, state, reading_time, value, fired, cleared)
+        for alert_type in cleared:
+            event = open_events.pop((rule.id, measurement_type, alert_type), None)
+            if event is not None:
+                event["cleared_at"] = reading_time
+            else:
+                clears.append({"b_rule_id": rule.id, "b_type": measurement_type, "b_alert_type": alert_type, "b_cleared_at": reading_time})
+        for alert_type, current, threshold in fired:
+            event = {
+                "rule_id": rule.id,
+                "source": source,
+                "point_code": rule.point_code,
+                "measurement_type": measurement_type,
+                "alert_type": alert_type,
+                "value": current,
+                "threshold": threshold,
+                "time": reading_time,
+                "cleared_at": None,
+                "created_at": datetime.now(),
+            }
+            new_events.append(event)
+            open_events[(rule.id, measurement_type, alert_type)] = event
+
+    table = models.AlertEvent.__table__
+    # 先解除之前的告警再写入本批告警，解除条件不会误匹配本批新写入的行
+    if clears:
+        db.execute(
+            update(table)
+            .where(
+                table.c.rule_id == bindparam("b_rule_id"),
+                table.c.measurement_type == bindparam("b_type"),
+                table.c.alert_type == bindparam("b_alert_type"),
+                table.c.cleared_at.is_(None),
+            )
+            .values(cleared_at=bindparam("b_cleared_at")),
+            clears,
+        )
+    if new_events:
+        db.execute(insert(table), new_events)
+
+
+# POST /alerts/check：按请求传入的阈值批量判断，与持久化的规则无关
+
+Violation = Tuple[int, str, float, float, datetime]
+
+def _thresholds(configs: Sequence[schemas.AlertConfig]) -> Tuple[np.ndarray, np.ndarray]:
+    """每个配置的下限、上限数组，未设置或未启用为 NaN（任何比较都为 False）"""
+    mins = np.array([c.min_value if c.alert_enabled and c.min_value is not None else np.nan for c in configs], dtype=float)
+    maxs = np.array([c.max_value if c.alert_enabled and c.max_value is not None else np.nan for c in configs], dtype=float)
+    return mins, maxs
+
+def _compare(config_index: np.ndarray, values: np.ndarray, mins: np.ndarray, maxs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """读数与其配置的阈值整体比较，返回越限读数的下标和是否低于下限，按读数顺序、先上限后下限排列"""
+    with np.errstate(invalid="ignore"):
+        above = np.flatnonzero(values > maxs[config_index])
+        below = np.flatnonzero(values < mins[config_index])
+    indices = np.concatenate([above, below])
+    is_below = np.concatenate([np.zeros(len(above), dtype=bool), np.ones(len(below), dtype=bool)])
+    order = np.lexsort((is_below, indices))
+    return indices[order], is_below[order]
+
+def _violations(config_index, values, times, mins, maxs) -> List[Violation]:
+    indices, is_below = _compare(config_index, values, mins, maxs)
+    result = []
+    for i, below in zip(indices.tolist(), is_below.tolist()):
+        c = int(config_index[i])
+        result.append((c, BELOW_MIN if below else ABOVE_MAX, float(values[i]), float(mins[c] if below else maxs[c]), times[i]))
+    return result
+
+def check_latest(configs: Sequence[schemas.AlertConfig], latest_values: Dict[str, Tuple[float, datetime]]) -> List[Violation]:
+    """每个配置只判断测点的最新值，latest_values 为 latest.get_values 的结果；返回 (配置下标, 告警类型, 值, 阈值, 时间)"""
+    mins, maxs = _thresholds(configs)
+    config_index, values, times = [], [], []
+    for i, alert_config in enumerate(configs):
+        current = latest_values.get(alert_config.point_code) if alert_config.alert_enabled else None
+        if current is not None and current[0] is not None:
+            config_index.append(i)
+            values.append(current[0])
+            times.append(current[1])
+    return _violations(np.array(config_index, dtype=np.intp), np.array(values, dtype=float), times, mins, maxs)
+
+def window_bounds(configs: Sequence[schemas.AlertConfig]) -> Tuple[Optional[float], Optional[float]]:
+    """window 模式预先过滤读数的粗略范围：大于最小的上限或小于最大的下限的读数才可能越限，没有任何阈值时为 (None, None)"""
+    mins, maxs = _thresholds(configs)
+    above = float(np.nanmin(maxs)) if not np.isnan(maxs).all() else None
+    below = float(np.nanmax(mins)) if not np.isnan(mins).all() else None
+    return above, below
+
+def check_window(configs: Sequence[schemas.AlertConfig], point_codes: list, values: list, times: list) -> List[Violation]:
+    """每个配置判断其测点在时间范围内的全部读数（三个等长列表，顺序不限），结果按配置顺序、时间顺序排列"""
+    mins, maxs = _thresholds(configs)
+    if not point_codes:
+        return []
+    # 读数按 (测点, 时间) 排序，每个测点对应一段连续的下标
+    codes, code_of_reading = np.unique(np.array(point_codes, dtype=object), return_inverse=True)
+    order = np.lexsort((np.array(times, dtype="datetime64[us]"), code_of_reading))
+    starts = np.searchsorted(code_of_reading[order], np.arange(len(codes)))
+    counts = np.bincount(code_of_reading, minlength=len(codes))
+    code_index = {code: i for i, code in enumerate(codes.tolist())}
+
+    # 展开为 (配置, 读数) 对：同一测点的多个配置各自判断一遍该测点的读数
+    config_ids, code_ids = [], []
+    for i, alert_config in enumerate(configs):
+        j = code_index.get(alert_config.point_code)
+        if alert_config.alert_enabled and j is not None:
+            config_ids.append(i)
+            code_ids.append(j)
+    if not config_ids:
+        return []
+    config_ids = np.array(config_ids, dtype=np.intp)
+    code_ids = np.array(code_ids, dtype=np.intp)
+    lengths = counts[code_ids]
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    reading = order[np.repeat(starts[code_ids], lengths) + np.arange(lengths.sum()) - offsets]
+    config_index = np.repeat(config_ids, lengths)
+    pair_values = np.array(values, dtype=float)[reading]
+    pair_times = [times[r] for r in reading.tolist()]
+    return _violations(config_index, pair_values, pair_times, mins, maxs)
@@ -0,0 +1,250 @@
+"""crud.py 的异步版本，供 FastAPI 接口使用。
+单条查询直接用 select() 异步执行；涉及汇总表、最新值表维护的多步逻辑通过 run_sync 复用 crud.py 的同步实现，
+同样走异步驱动，不占用线程池。密码哈希属于 CPU 计算，交给 hashing.py 的进程池执行，避免阻塞事件循环。"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import crud, hashing, latest, live, models, pagination, point_cache, rollups, schemas, writer
+
+# 时序查询只取这些列，避免为每一行构造 ORM 对象
+MEASUREMENT_COLUMNS = (
+    models.Measurement.id,
+    models.Measurement.point_code,
+    models.Measurement.value,
+    models.Measurement.time,
+    models.Measurement.measurement_type,
+)
+
+# 用户
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.username == username))
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
+    if not user:
+        return False
+    verified, new_hash = await hashing.verify_and_update(password, user.hashed_password)
+    if not verified:
+        return False
+    if new_hash:
+        # bcrypt 参数已调整，登录成功时透明地换成新哈希
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.User]:
+    stmt = pagination.seek_id_asc(select(models.User), models.User, cursor, limit)
+    return list(await db.scalars(pagination.with_skip(stmt, skip, cursor)))
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
+    db_user = models.User(
+        username=user.username,
+        email=user.email,
+        hashed_password=await hashing.get_password_hash(user.password),
+        role=user.role
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user(db: AsyncSession, user_id: int, user_update: dict) -> Optional[models.User]:
+    user_update = dict(user_update)
+    if "password" in user_update:
+        user_update["hashed_password"] = await hashing.get_password_hash(user_update.pop("password"))
+    return await db.run_sync(crud.update_user, user_id, user_update)
+
+async def delete_user(db: AsyncSession, user_id: int) -> bool:
+    return await db.run_sync(crud.delete_user, user_id)
+
+# 测点
+
+async def get_points(db: AsyncSession) -> List[schemas.MonitorPointOut]:
+    return (await point_cache.get(db)).points
+
+async def get_point_by_code(db: AsyncSession, point_code: str) -> Optional[models.MonitorPoint]:
+    """直接查询数据库，新增测点前检查编号是否已存在时使用"""
+    return await db.scalar(select(models.MonitorPoint).where(models.MonitorPoint.point_code == point_code))
+
+async def get_cached_point(db: AsyncSession, point_code: str) -> Optional[schemas.MonitorPointOut]:
+    """从测点缓存按编号取测点，只读接口使用"""
+    return (await point_cache.get(db)).by_code.get(point_code)
+
+async def points_by_code(db: AsyncSession, point_codes: Iterable[Optional[str]]) -> Dict[str, schemas.MonitorPointOut]:
+    by_code = (await point_cache.get(db)).by_code
+    return {code: by_code[code] for code in set(point_codes) if code in by_code}
+
+async def create_point(db: AsyncSession, point: schemas.PointCreate) -> models.MonitorPoint:
+    return await db.run_sync(crud.create_point, point)
+
+async def update_point(db: AsyncSession, point_code: str, point_update: dict) -> Optional[models.MonitorPoint]:
+    return await db.run_sync(crud.update_point, point_code, point_update)
+
+async def delete_point(db: AsyncSession, point_code: str) -> bool:
+    return await db.run_sync(crud.delete_point, point_code)
+
+# 监测数据
+
+async def measurement_search_conditions(
+    db: AsyncSession,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    device_type: Optional[str] = None,
+    point_name: Optional[str] = None
+) -> Optional[list]:
+    """与 crud.measurement_search_conditions 相同，测点筛选在测点缓存中完成"""
+    matching_codes = None
+    if device_type or point_name:
+        matching_codes = (await point_cache.get(db)).matching_codes(device_type, point_name)
+    return crud.search_conditions(start_time, end_time, matching_codes)
+
+async def search_measurements(db: AsyncSession, conditions: list, skip: int = 0, limit: int = 200, cursor: Optional[pagination.Cursor] = None) -> list:
+    """检索结果的列元组（含 base_point_code），不构造 ORM 对象"""
+    stmt = select(*MEASUREMENT_COLUMNS, models.Measurement.base_point_code).where(*conditions)
+    stmt = pagination.seek_time_desc(stmt, models.Measurement, cursor, limit)
+    return (await db.execute(pagination.with_skip(stmt, skip, cursor))).all()
+
+async def get_measurement_columns(
+    db: AsyncSession, point_code: str, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None
+) -> list:
+    """按时间升序取测点的列元组，用于图表和降采样"""
+    stmt = select(*MEASUREMENT_COLUMNS).where(models.Measurement.point_code == point_code)
+    if start_time is not None:
+        stmt = stmt.where(models.Measurement.time >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(models.Measurement.time <= end_time)
+    return (await db.execute(stmt.order_by(models.Measurement.time))).all()
+
+async def get_measurement_before(
+    db: AsyncSession, point_code: str, time: Optional[datetime] = None, inclusive: bool = True
+) -> Optional[models.Measurement]:
+    """取测点在 time 之前（含或不含 time）最近的一条数据，time 为空时取最新一条"""
+    stmt = select(models.Measurement).where(models.Measurement.point_code == point_code)
+    if time is not None:
+        stmt = stmt.where(models.Measurement.time <= time if inclusive else models.Measurement.time < time)
+    return await db.scalar(stmt.order_by(models.Measurement.time.desc()).limit(1))
+
+async def get_measurement_values(
+    db: AsyncSession,
+    point_codes: Iterable[str],
+    start_time: datetime,
+    end_time: Optional[datetime] = None,
+    above: Optional[float] = None,
+    below: Optional[float] = None
+) -> Tuple[list, list, list]:
+    """时间范围内多个测点的读数，按列返回 (point_code 列表, value 列表, time 列表)，不排序。
+    传入 above / below 时只返回大于 above 或小于 below 的读数"""
+    model = models.Measurement
+    stmt = select(model.point_code, model.value, model.time).where(model.point_code.in_(set(point_codes)), model.time >= start_time)
+    if end_time:
+        stmt = stmt.where(model.time <= end_time)
+    bounds = []
+    if above is not None:
+        bounds.append(model.value > above)
+    if below is not None:
+        bounds.append(model.value < below)
+    if bounds:
+        stmt = stmt.where(or_(*bounds))
+    rows = (await db.execute(stmt)).all()
+    return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+async def update_measurement(db: AsyncSession, measurement_id: int, item: schemas.MeasurementUpdate) -> Optional[models.Measurement]:
+    return await db.run_sync(crud.update_measurement, measurement_id, item)
+
+async def delete_measurement(db: AsyncSession, measurement_id: int) -> bool:
+    return await db.run_sync(crud.delete_measurement, measurement_id)
+
+async def bulk_create(db: AsyncSession, source: str, items: list) -> list:
+    """批量写入，不存在的测点跳过；SQLite 下交给单写入者合并提交。提交后把写入的行推送给订阅者"""
+    if writer.enabled():
+        rows = await writer.submit(source, items)
+    else:
+        rows = await db.run_sync(crud.bulk_create, source, items)
+    if rows and live.broker.has_subscribers():
+        live.broker.publish(source, rows, await point_cache.get(db))
+    return rows
+
+async def create_data(db: AsyncSession, source: str, data):
+    """单条写入，与批量写入走同一路径，测点不存在时返回 None"""
+    rows = await bulk_create(db, source, [data])
+    return rows[0] if rows else None
+
+async def get_latest_row(db: AsyncSession, source: str, point_code: str):
+    return await db.run_sync(latest.get_row, source, point_code)
+
+async def get_latest_values(db: AsyncSession, source: str, point_codes: Iterable[str]) -> dict:
+    return await db.run_sync(latest.get_values, source, point_codes)
+
+async def get_all_latest_with_points(db: AsyncSession, source: str = rollups.MEASUREMENTS) -> list:
+    return await db.run_sync(latest.get_all_with_points, source)
+
+async def query_stats(
+    db: AsyncSession,
+    source: str,
+    point_code: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> Optional[dict]:
+    return await db.run_sync(rollups.query_stats, source, point_code, start_time, end_time)
+
+async def query_buckets(
+    db: AsyncSession,
+    source: str,
+    point_code: str,
+    granularity: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None
+) -> List[models.MeasurementRollup]:
+    return await db.run_sync(rollups.query_buckets, source, point_code, granularity, start_time, end_time)
+
+# 专用数据表（倒垂线 / 静力水准 / 引张线 / 水位）
+
+async def get_time_series_columns(
+    db: AsyncSession, source: str, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None
+) -> Tuple[List[str], list]:
+    """按时间倒序取测点的一页列元组，返回 (列名, 行)；列为 id、point_code、数值列、time，与各专用数据响应模型的字段顺序相同"""
+    model, value_columns = rollups.SOURCES[source]
+    names = ["id", "point_code"] + [column for _, column in value_columns] + ["time"]
+    stmt = select(*(getattr(model, name) for name in names)).where(model.point_code == point_code)
+    stmt = pagination.seek_time_desc(stmt, model, cursor, limit)
+    return names, (await db.execute(pagination.with_skip(stmt, skip, cursor))).all()
+
+# 告警规则与告警记录
+
+async def get_alert_rules(db: AsyncSession) -> List[models.AlertRule]:
+    return await db.run_sync(crud.get_alert_rules)
+
+async def create_alert_rule(db: AsyncSession, rule: schemas.AlertRuleCreate) -> models.AlertRule:
+    return await db.run_sync(crud.create_alert_rule, rule)
+
+async def update_alert_rule(db: AsyncSession, rule_id: int, rule_update: dict) -> Optional[models.AlertRule]:
+    return await db.run_sync(crud.update_alert_rule, rule_id, rule_update)
+
+async def delete_alert_rule(db: AsyncSession, rule_id: int) -> bool:
+    return await db.run_sync(crud.delete_alert_rule, rule_id)
+
+async def get_alert_events(
+    db: AsyncSession,
+    active: Optional[bool] = None,
+    point_code: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[pagination.Cursor] = None
+) -> List[models.AlertEvent]:
+    """告警记录按时间倒序分页"""
+    model = models.AlertEvent
+    stmt = select(model)
+    if point_code:
+        stmt = stmt.where(model.point_code == point_code)
+    if active is not None:
+        stmt = stmt.where(model.cleared_at.is_(None) if active else model.cleared_at.is_not(None))
+    if start_time:
+        stmt = stmt.where(model.time >= start_time)
+    stmt = pagination.seek_time_desc(stmt, model, cursor, limit)
+    return list(await db.scalars(pagination.with_skip(stmt, skip, cursor)))
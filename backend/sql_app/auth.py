@@ -1,17 +1,29 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from . import database, models, schemas
+from . import config, database, metrics, models, profiling, schemas
 
 SECRET_KEY = "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 最少、最多期望轮数都取配置值，已有哈希的轮数与配置不同时 needs_update 为真，登录时重新哈希
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__min_desired_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__max_desired_rounds=config.BCRYPT_ROUNDS,
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -20,6 +32,10 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def verify_and_update(plain_password: str, hashed_password: str):
+    """校验密码，哈希参数已过时时同时返回按当前参数生成的新哈希，否则为 None"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,6 +46,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+class PrincipalCache:
+    """令牌 -> 已验证用户的有界 LRU 缓存；条目在 TTL 到期或令牌过期时失效，修改或删除用户时按用户 id 清除"""
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[schemas.Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: schemas.Principal, token_exp: Optional[float]):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (expires_at, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in [t for t, (_, principal) in self._entries.items() if principal.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+principal_cache = PrincipalCache(config.AUTH_CACHE_SIZE, config.AUTH_CACHE_TTL)
+_cache_hit, _cache_miss = metrics.cache_counters("auth")
+
+def invalidate_user(user_id: int):
+    """用户被修改或删除后调用，使其已缓存的令牌重新验证"""
+    principal_cache.invalidate_user(user_id)
+
 def authenticate_user(db: Session, username: str, password: str):
     user = db.query(models.User).filter(models.User.username == username).first()
     if not user:
@@ -38,7 +102,14 @@ def authenticate_user(db: Session, username: str, password: str):
         return False
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> schemas.Principal:
+    # 命中缓存时跳过签名校验和用户查询
+    principal = principal_cache.get(token)
+    if principal is not None:
+        _cache_hit.inc()
+        profiling.note_principal(principal)
+        return principal
+    _cache_miss.inc()
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -48,22 +119,31 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
+            metrics.auth_failures.labels("invalid_token").inc()
             raise credentials_exception
         token_data = schemas.TokenData(username=username)
     except JWTError:
+        metrics.auth_failures.labels("invalid_token").inc()
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    # 异步查询，不阻塞事件循环；与接口共用同一个请求级会话
+    user = await db.scalar(select(models.User).where(models.User.username == token_data.username))
     if user is None:
+        metrics.auth_failures.labels("unknown_user").inc()
         raise credentials_exception
-    return user
+    principal = schemas.Principal.model_validate(user)
+    principal_cache.put(token, principal, payload.get("exp"))
+    profiling.note_principal(principal)
+    return principal
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: schemas.Principal = Depends(get_current_user)):
     if not current_user.is_active:
+        metrics.auth_failures.labels("inactive").inc()
         raise HTTPException(status_code=400, detail="用户未激活")
     return current_user
 
-async def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)):
+async def get_current_admin_user(current_user: schemas.Principal = Depends(get_current_active_user)):
     if current_user.role != "admin":
+        metrics.auth_failures.labels("forbidden").inc()
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="权限不足，需要管理员权限"
@@ -0,0 +1,111 @@
+"""时序接口的列式响应：按 Accept 请求头协商，由查询得到的列元组直接编码，不为每行构造对象。
+- application/vnd.columnar+json：{"point_code": ..., "ids": [...], "times": [毫秒时间戳...], "values": [...]}，
+  每列一个数组，键名为字段名加 s；
+- application/vnd.apache.arrow.stream：Arrow IPC 流，一个 RecordBatch，point_code 等写在 schema 元数据中（需要 pyarrow，
+  未安装时只接受 Arrow 的请求返回 406）。
+时间均为不带时区的墙上时间，与 JSON 格式中的时间相同：毫秒时间戳按 UTC 换算，Arrow 为不带时区的 timestamp[ms]。
+其他 Accept（包括未指定）仍返回逐行 JSON"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+from fastapi import HTTPException, Request, Response, status
+from . import fastjson
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Accept 中的 */* 和 application/* 都按逐行 JSON 处理
+_WILDCARDS = {"*/*": JSON, "application/*": JSON}
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+_ARROW = arrow_available()
+
+def negotiate(request: Request) -> str:
+    """按 Accept 的 q 值选择响应格式，q 相同时取先列出的。服务端未安装 pyarrow 时不选 Arrow，
+    此时若 Accept 中没有其他可接受的格式，返回 406 而不是悄悄改用逐行 JSON"""
+    header = request.headers.get("accept")
+    # 常见的 application/json、*/* 不需要解析
+    if not header or "vnd." not in header:
+        return JSON
+    best, best_q = JSON, -1.0
+    arrow_wanted = False
+    for part in header.split(","):
+        media, *params = [item.strip() for item in part.split(";")]
+        media = _WILDCARDS.get(media.lower(), media.lower())
+        if media not in (JSON, COLUMNAR_JSON, ARROW_STREAM):
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media == ARROW_STREAM and not _ARROW:
+            arrow_wanted = arrow_wanted or q > 0
+            continue
+        if q > best_q:
+            best, best_q = media, q
+    if best_q <= 0 and arrow_wanted:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"服务端未安装 pyarrow，不支持 {ARROW_STREAM}，可改用 {COLUMNAR_JSON} 或 {JSON}"
+        )
+    return best if best_q > 0 else JSON
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+def epoch_ms(times: Sequence) -> List[Optional[int]]:
+    """不带时区的时间按 UTC 换算为毫秒时间戳；timedelta 整除比经由 numpy datetime64 转换快一个数量级"""
+    return [None if t is None else (t - _EPOCH) // _MILLISECOND for t in times]
+
+def transpose(rows: Sequence, names: Sequence[str]) -> Dict[str, list]:
+    """查询结果的行元组 -> 字段名: 列；rows 的列顺序与 names 一致"""
+    columns = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: list(column) for name, column in zip(names, columns)}
+
+def _encode_json(columns: Dict[str, list], metadata: Dict[str, Optional[str]]) -> bytes:
+    body = dict(metadata)
+    for name, column in columns.items():
+        body[name + "s"] = epoch_ms(column) if name == "time" else column
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _encode_arrow(columns: Dict[str, list], metadata: Dict[str, Optional[str]]) -> bytes:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    arrays = []
+    for name, column in columns.items():
+        if name == "id":
+            arrays.append(pa.array(column, type=pa.int64()))
+        elif name == "time":
+            arrays.append(pa.array(epoch_ms(column), type=pa.timestamp("ms")))
+        elif name == "measurement_type":
+            # 同一测点的测量类型大多相同，字典编码后每行只占一个整数
+            arrays.append(pa.array(column, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(column, type=pa.float64()))
+    batch = pa.RecordBatch.from_arrays(arrays, names=list(columns))
+    schema = batch.schema.with_metadata({k: v for k, v in metadata.items() if v is not None})
+    sink = pa.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+    return sink.getvalue().to_pybytes()
+
+def encode(fmt: str, columns: Dict[str, list], metadata: Dict[str, Optional[str]]) -> bytes:
+    """按协商出的格式编码，columns 至少包含 id、time 两列"""
+    if fmt == ARROW_STREAM:
+        return _encode_arrow(columns, metadata)
+    return _encode_json(columns, metadata)
+
+def response(fmt: str, body: bytes, headers) -> Response:
+    return fastjson.passthrough_response(body, fmt, headers)
@@ -1,7 +1,156 @@
+from sqlalchemy import bindparam, insert, select, update
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from . import models, schemas, auth
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from . import models, schemas, auth, rollups, latest, pagination, point_cache, data_versions, alerts, metrics
 from datetime import datetime
+from types import SimpleNamespace
+
+def record_inserted(db: Session, source: str, items: list):
+    """新数据写入后同步维护汇总表、最新值表和数据版本号，并按告警规则判断新读数，需在提交前调用"""
+    db.flush()
+    rollups.apply_readings(db, source, rollups.readings_of(source, items))
+    latest.upsert(db, source, items)
+    data_versions.bump(db, source, (item.point_code for item in items))
+    alerts.evaluate(db, source, items)
+    metrics.count_rows(db, rollups.SOURCES[source][0].__tablename__, len(items))
+
+def record_modified(db: Session, source: str, readings: list):
+    """修改或删除数据后，按修改前后的读数重新计算受影响的汇总和最新值，并递增数据版本号，需在提交前调用"""
+    rollups.refresh_readings(db, source, readings)
+    latest.refresh(db, source, readings)
+    data_versions.bump(db, source, (point_code for point_code, _, _, _ in readings))
+
+def existing_point_codes(db: Session, point_codes: Iterable[str]) -> Set[str]:
+    """一次查询返回其中已存在的测点编号"""
+    codes = set(point_codes)
+    if not codes:
+        return set()
+    return {code for (code,) in db.query(models.MonitorPoint.point_code).filter(models.MonitorPoint.point_code.in_(codes))}
+
+def longest_point_prefix(point_code: str, known_codes: Set[str]) -> Optional[str]:
+    """最长前缀匹配：'IP10左右岸' 归属 'IP10' 而不是 'IP1'"""
+    for end in range(len(point_code), 0, -1):
+        if point_code[:end] in known_codes:
+            return point_code[:end]
+    return None
+
+def base_point_codes(db: Session, point_codes: Iterable[str]) -> Dict[str, Optional[str]]:
+    """数据行 point_code -> 所属测点编号，按全部候选前缀做一次索引查询"""
+    codes = set(point_codes)
+    prefixes = {code[:end] for code in codes for end in range(1, len(code) + 1)}
+    known_codes = existing_point_codes(db, prefixes)
+    return {code: longest_point_prefix(code, known_codes) for code in codes}
+
+def _set_base_point_codes(db: Session, bases: Dict[str, Optional[str]]):
+    if not bases:
+        return
+    table = models.Measurement.__table__
+    stmt = update(table).where(table.c.point_code == bindparam("b_point_code")).values(base_point_code=bindparam("b_base"))
+    db.execute(stmt, [{"b_point_code": code, "b_base": base} for code, base in bases.items()])
+
+def refresh_base_point_codes(db: Session, prefix: str):
+    """测点新增或删除后，重新计算 point_code 以该编号开头的数据行归属"""
+    db.flush()
+    column = models.Measurement.point_code
+    # 前缀范围条件可走 (point_code, time) 索引，等价于 LIKE 'prefix%'
+    codes = [code for (code,) in db.query(column).filter(column >= prefix, column < prefix + "\U0010ffff").distinct()]
+    _set_base_point_codes(db, base_point_codes(db, codes))
+
+def backfill_base_point_codes(db: Session) -> int:
+    """为尚未计算归属的历史数据补填 base_point_code，返回涉及的 point_code 个数"""
+    codes = [code for (code,) in db.query(models.Measurement.point_code).filter(
+        models.Measurement.base_point_code.is_(None)
+    ).distinct()]
+    bases = {code: base for code, base in base_point_codes(db, codes).items() if base is not None}
+    _set_base_point_codes(db, bases)
+    db.commit()
+    return len(bases)
+
+def bulk_insert(db: Session, source: str, rows: List[dict]) -> list:
+    """executemany 批量 INSERT ... RETURNING（由 SQLAlchemy 合并为多行 VALUES 分批执行），不构造 ORM 对象，返回写入后的数据行"""
+    if not rows:
+        return []
+    if source == rollups.MEASUREMENTS:
+        bases = base_point_codes(db, (row["point_code"] for row in rows))
+        rows = [{**row, "base_point_code": bases[row["point_code"]]} for row in rows]
+    table = rollups.SOURCES[source][0].__table__
+    # 按参数顺序返回，合并写入时才能按行数拆分回各个请求
+    inserted = db.execute(insert(table).returning(*table.columns, sort_by_parameter_order=True), rows).all()
+    record_inserted(db, source, inserted)
+    return inserted
+
+def bulk_create(db: Session, source: str, items: list) -> list:
+    """批量写入：一次查询校验测点，不存在的测点跳过，返回写入后的数据行"""
+    return bulk_create_many(db, [(source, items)])[0]
+
+def bulk_create_many(db: Session, batches: List[Tuple[str, list]]) -> List[list]:
+    """多个批量写入合并为一个事务：同一数据表的行合并为一次 executemany，按输入顺序返回每批写入的行"""
+    now = datetime.now()
+    known_codes = existing_point_codes(db, (item.point_code for _, items in batches for item in items))
+    rows_by_source: Dict[str, List[dict]] = {}
+    spans = []
+    for source, items in batches:
+        rows = rows_by_source.setdefault(source, [])
+        start = len(rows)
+        rows.extend({**item.model_dump(), "time": item.time or now} for item in items if item.point_code in known_codes)
+        spans.append((source, start, len(rows)))
+    inserted = {source: bulk_insert(db, source, rows) for source, rows in rows_by_source.items()}
+    db.commit()
+    return [inserted[source][start:end] for source, start, end in spans]
+
+def _upsert_key(source: str, row) -> tuple:
+    # 仪器数据表每种测量类型各占一列，measurements 表还要区分 measurement_type
+    if source == rollups.MEASUREMENTS:
+        return (row["point_code"], row.get("measurement_type") or "", row["time"])
+    return (row["point_code"], "", row["time"])
+
+def bulk_upsert(db: Session, source: str, rows: List[dict]) -> Tuple[int, int]:
+    """按 (point_code, measurement_type, time) 幂等写入：新数据批量插入，已存在且数值不同的行更新，相同的跳过。
+    同一批内重复的键以最后一行为准；返回 (插入行数, 更新行数)，需由调用方提交"""
+    rows_by_key = {_upsert_key(source, row): row for row in rows}
+    if not rows_by_key:
+        return 0, 0
+    model, value_columns = rollups.SOURCES[source]
+    table = model.__table__
+    # 按 (point_code, time) 索引取出这批数据时间范围内已有的行
+    times = [key[2] for key in rows_by_key]
+    existing = db.execute(select(table).where(
+        table.c.point_code.in_({key[0] for key in rows_by_key}),
+        table.c.time >= min(times),
+        table.c.time <= max(times),
+    )).all()
+    existing_by_key: Dict[tuple, list] = {}
+    for row in existing:
+        existing_by_key.setdefault(_upsert_key(source, row._mapping), []).append(row)
+
+    columns = [column for _, column in value_columns]
+    new_rows, changes = [], []
+    for key, row in rows_by_key.items():
+        matches = existing_by_key.get(key)
+        if not matches:
+            new_rows.append(row)
+            continue
+        changes.extend(
+            (old, row) for old in matches if any(getattr(old, column) != row.get(column) for column in columns)
+        )
+    bulk_insert(db, source, new_rows)
+    if changes:
+        stmt = update(table).where(table.c.id == bindparam("b_id")).values(
+            {column: bindparam(f"b_{column}") for column in columns}
+        )
+        db.execute(stmt, [
+            {"b_id": old.id, **{f"b_{column}": row.get(column) for column in columns}} for old, row in changes
+        ])
+        new_items = [SimpleNamespace(**{**old._mapping, **row}) for old, row in changes]
+        record_modified(
+            db, source, rollups.readings_of(source, [old for old, _ in changes]) + rollups.readings_of(source, new_items)
+        )
+    return len(new_rows), len(changes)
+
+def get_time_series_page(db: Session, model, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> list:
+    """按时间倒序取测点的一页数据，cursor 为上一页最后一行的 (time, id)"""
+    query = pagination.seek_time_desc(db.query(model).filter(model.point_code == point_code), model, cursor, limit)
+    return pagination.with_skip(query, skip, cursor).all()
 
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -12,8 +161,9 @@ def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.User]:
+    query = pagination.seek_id_asc(db.query(models.User), models.User, cursor, limit)
+    return pagination.with_skip(query, skip, cursor).all()
 
 def create_user(db: Session, user: schemas.UserCreate) -> models.User:
     hashed_password = auth.get_password_hash(user.password)
@@ -36,6 +186,7 @@ def update_user(db: Session, user_id: int, user_update: dict) -> Optional[models
                 value = auth.get_password_hash(value)
             setattr(db_user, key, value)
         db.commit()
+        auth.invalidate_user(user_id)
         db.refresh(db_user)
     return db_user
 
@@ -44,6 +195,7 @@ def delete_user(db: Session, user_id: int) -> bool:
     if db_user:
         db.delete(db_user)
         db.commit()
+        auth.invalidate_user(user_id)
         return True
     return False
 
@@ -56,39 +208,112 @@ def get_point_by_code(db: Session, point_code: str) -> Optional[models.MonitorPo
 def create_point(db: Session, point: schemas.PointCreate) -> models.MonitorPoint:
     db_point = models.MonitorPoint(**point.model_dump())
     db.add(db_point)
+    refresh_base_point_codes(db, db_point.point_code)
     db.commit()
+    point_cache.invalidate()
     db.refresh(db_point)
     return db_point
 
-def get_measurements(db: Session, point_code: str, skip: int = 0, limit: int = 100) -> List[models.Measurement]:
-    return db.query(models.Measurement).filter(models.Measurement.point_code == point_code).order_by(models.Measurement.time.desc()).offset(skip).limit(limit).all()
+def measurement_search_conditions(
+    db: Session,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    device_type: Optional[str] = None,
+    point_name: Optional[str] = None
+) -> Optional[list]:
+    """数据中心检索条件（/measurements/search 与导出共用），没有符合条件的测点时返回 None"""
+    # Measurement.point_code 格式如 'IP3左右岸'，写入时已把所属测点 'IP3' 记在 base_point_code 上
+    # 有设备类型或测点名筛选时，先取符合条件的测点编号，再按 base_point_code IN 走索引
+    matching_codes = None
+    if device_type or point_name:
+        point_query = db.query(models.MonitorPoint.point_code)
+        if device_type:
+            point_query = point_query.filter(models.MonitorPoint.device_type == device_type)
+        if point_name:
+            point_query = point_query.filter(models.MonitorPoint.point_name.like(f"%{point_name}%"))
+        matching_codes = [code for (code,) in point_query.all()]
+    return search_conditions(start_time, end_time, matching_codes)
+
+def search_conditions(
+    start_time: Optional[datetime], end_time: Optional[datetime], matching_codes: Optional[List[str]]
+) -> Optional[list]:
+    """matching_codes 为 None 表示不按测点筛选，为空列表表示没有符合条件的测点（返回 None）"""
+    conditions = []
+    if start_time:
+        conditions.append(models.Measurement.time >= start_time)
+    if end_time:
+        conditions.append(models.Measurement.time <= end_time)
+    if matching_codes is not None:
+        if not matching_codes:
+            return None
+        conditions.append(models.Measurement.base_point_code.in_(matching_codes))
+    return conditions
+
+def points_by_code(db: Session, point_codes: Iterable[Optional[str]]) -> Dict[str, models.MonitorPoint]:
+    """按测点编号一次取出测点信息，用于把数据行映射到测点"""
+    codes = {code for code in point_codes if code}
+    if not codes:
+        return {}
+    return {p.point_code: p for p in db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code.in_(codes))}
+
+def search_measurements(db: Session, conditions: list, skip: int = 0, limit: int = 200, cursor: Optional[pagination.Cursor] = None) -> List[models.Measurement]:
+    query = pagination.seek_time_desc(db.query(models.Measurement).filter(*conditions), models.Measurement, cursor, limit)
+    return pagination.with_skip(query, skip, cursor).all()
+
+def get_measurements(db: Session, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.Measurement]:
+    return get_time_series_page(db, models.Measurement, point_code, skip, limit, cursor)
 
 def create_measurement(db: Session, measurement: schemas.MeasurementCreate) -> models.Measurement:
-    db_measurement = models.Measurement(**measurement.model_dump())
+    db_measurement = models.Measurement(
+        point_code=measurement.point_code,
+        base_point_code=base_point_codes(db, [measurement.point_code])[measurement.point_code],
+        value=measurement.value,
+        time=measurement.time or datetime.now(),
+        measurement_type=measurement.measurement_type
+    )
     db.add(db_measurement)
+    record_inserted(db, rollups.MEASUREMENTS, [db_measurement])
     db.commit()
     db.refresh(db_measurement)
     return db_measurement
 
+def update_measurement(db: Session, measurement_id: int, item: schemas.MeasurementUpdate) -> Optional[models.Measurement]:
+    db_item = db.query(models.Measurement).filter(models.Measurement.id == measurement_id).first()
+    if not db_item:
+        return None
+    
+    old_readings = rollups.readings_of(rollups.MEASUREMENTS, [db_item])
+    if item.value is not None:
+        db_item.value = item.value
+    if item.time:
+        db_item.time = item.time
+    if item.measurement_type is not None:
+        db_item.measurement_type = item.measurement_type
+    
+    record_modified(
+        db, rollups.MEASUREMENTS, old_readings + rollups.readings_of(rollups.MEASUREMENTS, [db_item])
+    )
+    db.commit()
+    db.refresh(db_item)
+    return db_item
+
+def delete_measurement(db: Session, measurement_id: int) -> bool:
+    db_item = db.query(models.Measurement).filter(models.Measurement.id == measurement_id).first()
+    if not db_item:
+        return False
+    
+    old_readings = rollups.readings_of(rollups.MEASUREMENTS, [db_item])
+    db.delete(db_item)
+    record_modified(db, rollups.MEASUREMENTS, old_readings)
+    db.commit()
+    return True
+
 def get_latest_measurement(db: Session, point_code: str) -> Optional[models.Measurement]:
-    return db.query(models.Measurement).filter(models.Measurement.point_code == point_code).order_by(models.Measurement.time.desc()).first()
+    return latest.get_row(db, rollups.MEASUREMENTS, point_code)
 
 def get_all_latest_measurements(db: Session) -> List[dict]:
-    from sqlalchemy import func
-    subquery = db.query(
-        models.Measurement.point_code,
-        func.max(models.Measurement.time).label('max_time')
-    ).group_by(models.Measurement.point_code).subquery()
-    
-    latest = db.query(models.Measurement).join(
-        subquery,
-        (models.Measurement.point_code == subquery.c.point_code) &
-        (models.Measurement.time == subquery.c.max_time)
-    ).all()
-    
     result = []
-    for m in latest:
-        point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == m.point_code).first()
+    for m, point in latest.get_all_with_points(db, rollups.MEASUREMENTS):
         if point:
             result.append({
                 'point_code': m.point_code,
@@ -105,6 +330,7 @@ def update_point(db: Session, point_code: str, point_update: dict) -> Optional[m
         for key, value in point_update.items():
             setattr(db_point, key, value)
         db.commit()
+        point_cache.invalidate()
         db.refresh(db_point)
     return db_point
 
@@ -112,14 +338,14 @@ def delete_point(db: Session, point_code: str) -> bool:
     db_point = db.query(models.MonitorPoint).filter(models.MonitorPoint.point_code == point_code).first()
     if db_point:
         db.delete(db_point)
+        refresh_base_point_codes(db, point_code)
         db.commit()
+        point_cache.invalidate()
         return True
     return False
 
-def get_inverted_plumb_data(db: Session, point_code: str, skip: int = 0, limit: int = 100) -> List[models.InvertedPlumbData]:
-    return db.query(models.InvertedPlumbData).filter(
-        models.InvertedPlumbData.point_code == point_code
-    ).order_by(models.InvertedPlumbData.time.desc()).offset(skip).limit(limit).all()
+def get_inverted_plumb_data(db: Session, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.InvertedPlumbData]:
+    return get_time_series_page(db, models.InvertedPlumbData, point_code, skip, limit, cursor)
 
 def create_inverted_plumb_data(db: Session, data: schemas.InvertedPlumbDataCreate) -> models.InvertedPlumbData:
     db_data = models.InvertedPlumbData(
@@ -129,19 +355,16 @@ def create_inverted_plumb_data(db: Session, data: schemas.InvertedPlumbDataCreat
         time=data.time or datetime.now()
     )
     db.add(db_data)
+    record_inserted(db, rollups.INVERTED_PLUMB, [db_data])
     db.commit()
     db.refresh(db_data)
     return db_data
 
 def get_latest_inverted_plumb(db: Session, point_code: str) -> Optional[models.InvertedPlumbData]:
-    return db.query(models.InvertedPlumbData).filter(
-        models.InvertedPlumbData.point_code == point_code
-    ).order_by(models.InvertedPlumbData.time.desc()).first()
+    return latest.get_row(db, rollups.INVERTED_PLUMB, point_code)
 
-def get_static_level_data(db: Session, point_code: str, skip: int = 0, limit: int = 100) -> List[models.StaticLevelData]:
-    return db.query(models.StaticLevelData).filter(
-        models.StaticLevelData.point_code == point_code
-    ).order_by(models.StaticLevelData.time.desc()).offset(skip).limit(limit).all()
+def get_static_level_data(db: Session, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.StaticLevelData]:
+    return get_time_series_page(db, models.StaticLevelData, point_code, skip, limit, cursor)
 
 def create_static_level_data(db: Session, data: schemas.StaticLevelDataCreate) -> models.StaticLevelData:
     db_data = models.StaticLevelData(
@@ -150,19 +373,16 @@ def create_static_level_data(db: Session, data: schemas.StaticLevelDataCreate) -
         time=data.time or datetime.now()
     )
     db.add(db_data)
+    record_inserted(db, rollups.STATIC_LEVEL, [db_data])
     db.commit()
     db.refresh(db_data)
     return db_data
 
 def get_latest_static_level(db: Session, point_code: str) -> Optional[models.StaticLevelData]:
-    return db.query(models.StaticLevelData).filter(
-        models.StaticLevelData.point_code == point_code
-    ).order_by(models.StaticLevelData.time.desc()).first()
+    return latest.get_row(db, rollups.STATIC_LEVEL, point_code)
 
-def get_tension_line_data(db: Session, point_code: str, skip: int = 0, limit: int = 100) -> List[models.TensionLineData]:
-    return db.query(models.TensionLineData).filter(
-        models.TensionLineData.point_code == point_code
-    ).order_by(models.TensionLineData.time.desc()).offset(skip).limit(limit).all()
+def get_tension_line_data(db: Session, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.TensionLineData]:
+    return get_time_series_page(db, models.TensionLineData, point_code, skip, limit, cursor)
 
 def create_tension_line_data(db: Session, data: schemas.TensionLineDataCreate) -> models.TensionLineData:
     db_data = models.TensionLineData(
@@ -171,19 +391,16 @@ def create_tension_line_data(db: Session, data: schemas.TensionLineDataCreate) -
         time=data.time or datetime.now()
     )
     db.add(db_data)
+    record_inserted(db, rollups.TENSION_LINE, [db_data])
     db.commit()
     db.refresh(db_data)
     return db_data
 
 def get_latest_tension_line(db: Session, point_code: str) -> Optional[models.TensionLineData]:
-    return db.query(models.TensionLineData).filter(
-        models.TensionLineData.point_code == point_code
-    ).order_by(models.TensionLineData.time.desc()).first()
+    return latest.get_row(db, rollups.TENSION_LINE, point_code)
 
-def get_water_level_data(db: Session, point_code: str, skip: int = 0, limit: int = 100) -> List[models.WaterLevelData]:
-    return db.query(models.WaterLevelData).filter(
-        models.WaterLevelData.point_code == point_code
-    ).order_by(models.WaterLevelData.time.desc()).offset(skip).limit(limit).all()
+def get_water_level_data(db: Session, point_code: str, skip: int = 0, limit: int = 100, cursor: Optional[pagination.Cursor] = None) -> List[models.WaterLevelData]:
+    return get_time_series_page(db, models.WaterLevelData, point_code, skip, limit, cursor)
 
 def create_water_level_data(db: Session, data: schemas.WaterLevelDataCreate) -> models.WaterLevelData:
     db_data = models.WaterLevelData(
@@ -192,11 +409,62 @@ def create_water_level_data(db: Session, data: schemas.WaterLevelDataCreate) ->
         time=data.time or datetime.now()
     )
     db.add(db_data)
+    record_inserted(db, rollups.WATER_LEVEL, [db_data])
     db.commit()
     db.refresh(db_data)
     return db_data
 
 def get_latest_water_level(db: Session, point_code: str) -> Optional[models.WaterLevelData]:
-    return db.query(models.WaterLevelData).filter(
-        models.WaterLevelData.point_code == point_code
-    ).order_by(models.WaterLevelData.time.desc()).first()
+    return latest.get_row(db, rollups.WATER_LEVEL, point_code)
+
+# 告警规则
+
+def get_alert_rules(db: Session) -> List[models.AlertRule]:
+    return db.query(models.AlertRule).order_by(models.AlertRule.id).all()
+
+def create_alert_rule(db: Session, rule: schemas.AlertRuleCreate) -> models.AlertRule:
+    db_rule = models.AlertRule(**rule.model_dump())
+    db.add(db_rule)
+    db.commit()
+    alerts.invalidate()
+    db.refresh(db_rule)
+    return db_rule
+
+# 修改这些字段后，原有的判断状态（上一个读数、持续中的告警）不再对应新的规则
+ALERT_RULE_RESET_FIELDS = ("measurement_type", "min_value", "max_value", "max_rate", "hysteresis")
+
+def _reset_alert_rule(db: Session, rule_id: int):
+    """删除规则的判断状态，持续中的告警视为解除；之后的第一个读数按新规则重新判断"""
+    db.query(models.AlertState).filter(models.AlertState.rule_id == rule_id).delete(synchronize_session=False)
+    db.query(models.AlertEvent).filter(
+        models.AlertEvent.rule_id == rule_id,
+        models.AlertEvent.cleared_at.is_(None),
+    ).update({"cleared_at": datetime.now()}, synchronize_session=False)
+
+def update_alert_rule(db: Session, rule_id: int, rule_update: dict) -> Optional[models.AlertRule]:
+    """停用规则或修改阈值、回差、测量类型时，与删除规则一样解除持续中的告警并清除判断状态"""
+    db_rule = db.get(models.AlertRule, rule_id)
+    if db_rule:
+        reset = rule_update.get("enabled") is False and db_rule.enabled or any(
+            key in rule_update and rule_update[key] != getattr(db_rule, key) for key in ALERT_RULE_RESET_FIELDS
+        )
+        for key, value in rule_update.items():
+            setattr(db_rule, key, value)
+        if reset:
+            _reset_alert_rule(db, rule_id)
+        db.commit()
+        alerts.invalidate()
+        db.refresh(db_rule)
+    return db_rule
+
+def delete_alert_rule(db: Session, rule_id: int) -> bool:
+    """删除规则及其判断状态，已触发的告警记录保留（rule_id 置空），持续中的视为解除"""
+    db_rule = db.get(models.AlertRule, rule_id)
+    if not db_rule:
+        return False
+    _reset_alert_rule(db, rule_id)
+    db.query(models.AlertEvent).filter(models.AlertEvent.rule_id == rule_id).update({"rule_id": None}, synchronize_session=False)
+    db.delete(db_rule)
+    db.commit()
+    alerts.invalidate()
+    return True
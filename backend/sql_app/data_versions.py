@@ -0,0 +1,83 @@
+"""数据版本号：crud.record_inserted / record_modified 在写入的同一事务内递增涉及测点的版本号，接口按版本号生成 ETag。
+进程内缓存整张版本表（行数为测点数 × 来源数），本进程提交写入后立即失效，其他进程的写入最多 DATA_VERSION_TTL 秒后可见"""
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import config, database, metrics, models
+
+# Session.info 中的标记：本事务递增过版本号，提交后使进程内缓存失效
+_DIRTY = "data_versions_dirty"
+
+Version = Tuple[int, Optional[datetime]]
+
+def bump(db: Session, source: str, point_codes: Iterable[str]):
+    """递增各测点的版本号，需在提交前调用"""
+    codes = {code for code in point_codes if code}
+    if not codes:
+        return
+    now = datetime.utcnow()
+    table = models.DataVersion.__table__
+    stmt = database.upsert_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source", "point_code"],
+        set_={"version": table.c.version + 1, "updated_at": stmt.excluded.updated_at},
+    )
+    db.execute(stmt, [{"source": source, "point_code": code, "version": 1, "updated_at": now} for code in sorted(codes)])
+    db.info[_DIRTY] = True
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    if session.info.pop(_DIRTY, False):
+        invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(_DIRTY, None)
+
+class _Snapshot:
+    def __init__(self, rows):
+        self.loaded_at = time.monotonic()
+        self.by_point: Dict[Tuple[str, str], Version] = {}
+        self.by_source: Dict[str, Version] = {}
+        for source, point_code, version, updated_at in rows:
+            self.by_point[(source, point_code)] = (version, updated_at)
+            # 来源的版本取各测点版本号之和，任一测点写入都会改变
+            total, latest = self.by_source.get(source, (0, None))
+            self.by_source[source] = (total + version, updated_at if latest is None or updated_at > latest else latest)
+
+_lock = threading.Lock()
+_generation = 0
+_snapshot: Optional[_Snapshot] = None
+_snapshot_generation = -1
+_cache_hit, _cache_miss = metrics.cache_counters("data_versions")
+
+def invalidate():
+    global _generation
+    with _lock:
+        _generation += 1
+
+async def get(db: AsyncSession, source: str, point_code: Optional[str] = None) -> Version:
+    """返回 (版本号, 最后写入时间)，point_code 为空时返回整个来源的版本；从未写入时为 (0, None)"""
+    global _snapshot, _snapshot_generation
+    snapshot = _snapshot
+    if (
+        snapshot is None
+        or _snapshot_generation != _generation
+        or time.monotonic() - snapshot.loaded_at >= config.DATA_VERSION_TTL
+    ):
+        # 先记下代数再查询，加载期间本进程的提交会让这个快照立即过期
+        _cache_miss.inc()
+        generation = _generation
+        table = models.DataVersion
+        rows = (await db.execute(select(table.source, table.point_code, table.version, table.updated_at))).all()
+        snapshot = _Snapshot(rows)
+        _snapshot, _snapshot_generation = snapshot, generation
+    else:
+        _cache_hit.inc()
+    if point_code is None:
+        return snapshot.by_source.get(source, (0, None))
+    return snapshot.by_point.get((source, point_code), (0, None))
@@ -1,19 +1,97 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
+from . import config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./water_platform.db"
+# 同步驱动 -> 对应的异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def async_url(url: str) -> str:
+    """把同步连接串换成接口使用的异步驱动，已经是异步驱动时原样返回"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+def engine_options(url: str) -> dict:
+    """按数据库类型生成 create_engine 参数，连接池参数取自配置"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        # SQLite 内存库和 aiosqlite 不使用连接池（aiosqlite 的连接绑定创建它的事件循环，默认 NullPool），池参数不适用
+        options = {"connect_args": {"check_same_thread": False}}
+        if parsed.database in (None, "", ":memory:") or parsed.get_dialect().is_async:
+            return options
+    else:
+        options = {}
+    options.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+    return options
+
+def sqlite_pragmas() -> list:
+    """每个新 SQLite 连接执行的 PRAGMA；journal_mode=WAL 写入数据库文件，其余只对当前连接有效"""
+    return [
+        "journal_mode=WAL",
+        f"synchronous={config.SQLITE_SYNCHRONOUS}",
+        f"mmap_size={config.SQLITE_MMAP_SIZE}",
+        f"cache_size={config.SQLITE_CACHE_SIZE}",
+        "temp_store=MEMORY",
+        f"busy_timeout={config.SQLITE_BUSY_TIMEOUT}",
+    ]
+
+def apply_sqlite_pragmas(engine):
+    """SQLite 引擎在建立连接时执行调优 PRAGMA，其他数据库不处理"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas():
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+# 接口使用的异步驱动连接同一个数据库
+ASYNC_DATABASE_URL = config.ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URL)
+
+# 同步引擎：建表、迁移和 init_db.py / import_excel.py 等脚本使用
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+apply_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎：FastAPI 接口使用，查询等待期间不占用事件循环
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+apply_sqlite_pragmas(async_engine.sync_engine)
+# 提交后不过期对象，接口在提交后仍可直接序列化返回的 ORM 对象
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def upsert_insert(db, model):
+    """返回带 on_conflict_do_update 的 insert 语句，按当前连接的数据库方言选择实现"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
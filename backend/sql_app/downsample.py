@@ -0,0 +1,69 @@
+"""时序降采样：在时间/数值列上做向量化计算，只返回需要保留的行下标"""
+from typing import Optional, Sequence
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets，保留首尾点，中间每个桶选出三角形面积最大的点"""
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        # 没有中间桶，只保留首尾（threshold 为 1 时只保留首点）
+        return np.array([0, n - 1][:max(threshold, 0)], dtype=np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    # 首尾之外的点均分成 threshold - 2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        area = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def min_max_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """按下标等分成 n_buckets 个桶，每个桶保留首/尾/最小/最大四个点"""
+    n = len(y)
+    if n_buckets < 1 or n_buckets * 4 >= n:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    bucket_ids = np.repeat(np.arange(n_buckets), ends - starts)
+    # 先按桶、再按数值排序，每个桶排序后的第一个位置即为桶内最小/最大值
+    min_order = np.lexsort((y, bucket_ids))
+    max_order = np.lexsort((-y, bucket_ids))
+    return np.unique(np.concatenate([starts, ends - 1, min_order[starts], max_order[starts]]))
+
+def downsample_rows(rows: Sequence, max_points: Optional[int], method: str = "lttb") -> Sequence:
+    """对按时间升序的查询结果（需包含 time、value 列）做降采样，返回不超过 max_points 行。
+    指定 max_points 时空值（None/NaN）行一律不返回，与是否实际降采样无关；不指定时原样返回"""
+    if not max_points:
+        return rows
+
+    values = np.array([r.value for r in rows], dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(values))
+    if len(valid) <= max_points:
+        return rows if len(valid) == len(rows) else [rows[i] for i in valid]
+
+    times = np.array([rows[i].time for i in valid], dtype="datetime64[ms]").astype(np.float64)
+    # minmax 每桶最多 4 个点，max_points 不足一个桶时改用 LTTB
+    if method == "minmax" and max_points >= 4:
+        picked = min_max_indices(values[valid], max_points // 4)
+    else:
+        picked = lttb_indices(times, values[valid], max_points)
+    return [rows[i] for i in valid[picked]]
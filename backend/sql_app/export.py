@@ -0,0 +1,147 @@
+"""监测数据流式导出：服务端游标分批读取，逐批编码为 CSV / NDJSON / Parquet，内存占用与行数无关"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+from . import crud, database, models
+
+EXPORT_COLUMNS = ["id", "point_code", "point_name", "device_type", "measurement_type", "value", "time"]
+
+# 每批从数据库游标读取并编码的行数
+EXPORT_BATCH_SIZE = 5000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def iter_batches(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    device_type: Optional[str] = None,
+    point_name: Optional[str] = None,
+) -> Iterator[List[tuple]]:
+    """按时间升序分批产出导出行，会话由生成器自己持有，响应发送完毕后关闭"""
+    db = database.SessionLocal()
+    try:
+        conditions = crud.measurement_search_conditions(db, start_time, end_time, device_type, point_name)
+        if conditions is None:
+            return
+        points = {p.point_code: p for p in db.query(models.MonitorPoint).all()}
+
+        query = db.query(
+            models.Measurement.id,
+            models.Measurement.point_code,
+            models.Measurement.base_point_code,
+            models.Measurement.measurement_type,
+            models.Measurement.value,
+            models.Measurement.time,
+        ).filter(*conditions).order_by(models.Measurement.time).yield_per(EXPORT_BATCH_SIZE)
+
+        batch = []
+        for row in query:
+            point = points.get(row.base_point_code)
+            batch.append((
+                row.id,
+                row.point_code,
+                point.point_name if point else row.point_code,
+                point.device_type if point else None,
+                row.measurement_type,
+                row.value,
+                row.time,
+            ))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+def iter_csv(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    # 带 BOM，便于 Excel 直接打开中文内容
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        writer.writerows(
+            (*row[:6], row[6].isoformat() if row[6] else "") for row in batch
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_ndjson(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        lines = []
+        for row in batch:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record["time"] = row[6].isoformat() if row[6] else None
+            lines.append(json.dumps(record, ensure_ascii=False))
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """Parquet 写入目标：只暂存上一个 row group 的字节，取走后即清空"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_parquet(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """每批写成一个 row group，写完即把字节发给客户端"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("point_code", pa.string()),
+        ("point_name", pa.string()),
+        ("device_type", pa.string()),
+        ("measurement_type", pa.string()),
+        ("value", pa.float64()),
+        ("time", pa.timestamp("us")),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        columns = list(zip(*batch))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+ENCODERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+    "parquet": iter_parquet,
+}
@@ -0,0 +1,36 @@
+"""列表接口的快速 JSON 编码：查询得到的列元组直接编码为响应体，不为每行构造 Pydantic 模型，
+路由直接返回 Response，也跳过 FastAPI 按 response_model 的再次校验（response_model 仍用于接口文档）。
+有 orjson 时使用 orjson，否则退回标准库 json；输出与按 response_model 序列化的结果一致（字段顺序、ISO 时间格式）"""
+import json
+from datetime import datetime
+from typing import Iterable, Sequence
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MEDIA_TYPE = "application/json"
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法编码为 JSON: {type(value).__name__}")
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+def dump_rows(fields: Sequence[str], rows: Iterable[Sequence]) -> bytes:
+    """每行的值按 fields 的顺序排列，编码为对象数组；fields 取响应模型的字段顺序"""
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+def passthrough_response(body: bytes, media_type: str, headers) -> Response:
+    """已编码的响应体直接作为 Response 返回（逐行 JSON 和列式格式共用）。
+    headers 传入路由注入的 Response 的响应头（ETag、分页游标等），直接返回 Response 时 FastAPI 不会合并它们"""
+    return Response(content=body, media_type=media_type, headers=dict(headers))
+
+def response(body: bytes, headers) -> Response:
+    return passthrough_response(body, MEDIA_TYPE, headers)
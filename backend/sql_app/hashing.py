@@ -0,0 +1,86 @@
+"""密码哈希进程池：bcrypt 是纯 CPU 计算，放到独立的进程池执行，登录高峰不会占满接口线程池和事件循环。
+进程数即并发上限，排队请求超过上限时直接返回 429，并记录每次排队等待的时间"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
+from . import auth, config, metrics
+
+def _timed(fn, *args):
+    """在工作进程中执行，同时返回开始执行的时间，用于计算排队时间"""
+    return time.time(), fn(*args)
+
+class HashPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        # 工作进程异常退出后进程池不可再用，下次提交时重建
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="登录请求过多，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        submitted = time.time()
+        try:
+            executor = self._get_executor()
+            try:
+                started, result = await asyncio.wrap_future(executor.submit(_timed, fn, *args))
+            except BrokenProcessPool:
+                self._reset(executor)
+                started, result = await asyncio.wrap_future(self._get_executor().submit(_timed, fn, *args))
+        finally:
+            self.in_flight -= 1
+        queue_time = max(0.0, started - submitted)
+        self.completed += 1
+        self.queue_time_total += queue_time
+        self.queue_time_max = max(self.queue_time_max, queue_time)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_time_avg_ms": self.queue_time_total / self.completed * 1000 if self.completed else 0.0,
+            "queue_time_max_ms": self.queue_time_max * 1000,
+        }
+
+hash_pool = HashPool(config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_MAX_QUEUE)
+
+metrics.FunctionMetric("password_hash_in_flight", "正在计算或排队的密码哈希数", "gauge", lambda: hash_pool.in_flight)
+metrics.FunctionMetric("password_hash_completed", "完成的密码哈希数", "counter", lambda: hash_pool.completed)
+metrics.FunctionMetric("password_hash_rejected", "排队已满返回 429 的次数", "counter", lambda: hash_pool.rejected)
+
+async def verify_and_update(plain_password: str, hashed_password: str):
+    return await hash_pool.run(auth.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await hash_pool.run(auth.get_password_hash, password)
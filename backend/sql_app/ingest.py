@@ -0,0 +1,151 @@
+"""流式数据导入：从请求体逐行解析 NDJSON / CSV，按固定行数分块写入，内存占用与上传大小无关"""
+import csv
+import json
+from typing import AsyncIterator, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import async_crud, config, crud, rollups, schemas
+
+# 来源数据表 -> 单行数据校验模型
+INGEST_SCHEMAS = {
+    rollups.MEASUREMENTS: schemas.MeasurementCreate,
+    rollups.INVERTED_PLUMB: schemas.InvertedPlumbDataCreate,
+    rollups.STATIC_LEVEL: schemas.StaticLevelDataCreate,
+    rollups.TENSION_LINE: schemas.TensionLineDataCreate,
+    rollups.WATER_LEVEL: schemas.WaterLevelDataCreate,
+}
+
+# 响应中最多列出的被拒绝行数，超出部分只计数
+MAX_REPORTED_REJECTIONS = 100
+
+async def iter_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """把请求体字节流切分成行，只缓存未结束的最后一行（按收到的块保存，结束时一次拼接）。
+    超过 max_line_bytes 的行不再缓存，读到行尾后返回 None"""
+    pending: List[bytes] = []
+    pending_bytes = 0
+    too_long = False
+    line_no = 0
+    async for chunk in stream:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            line_no += 1
+            if too_long or pending_bytes + end - start > max_line_bytes:
+                yield line_no, None
+            else:
+                pending.append(chunk[start:end])
+                yield line_no, b"".join(pending).rstrip(b"\r")
+            pending, pending_bytes, too_long = [], 0, False
+            start = end + 1
+        if start < len(chunk) and not too_long:
+            pending_bytes += len(chunk) - start
+            if pending_bytes > max_line_bytes:
+                pending, too_long = [], True
+            else:
+                pending.append(chunk[start:])
+    if pending or too_long:
+        line_no += 1
+        yield line_no, None if too_long else b"".join(pending).rstrip(b"\r")
+
+def parse_ndjson(text: str) -> dict:
+    record = json.loads(text)
+    if not isinstance(record, dict):
+        raise ValueError("每行必须是 JSON 对象")
+    return record
+
+def parse_csv(text: str, header: List[str]) -> dict:
+    values = next(csv.reader([text]))
+    if len(values) != len(header):
+        raise ValueError(f"列数为 {len(values)}，表头为 {len(header)} 列")
+    # 空单元格视为未填写
+    return {name: value for name, value in zip(header, values) if value != ""}
+
+def split_known(records: List[Tuple[int, object]], known_codes: Set[str]) -> Tuple[list, List[dict]]:
+    """按测点是否存在拆分一块已校验的数据，返回可写入的数据和被拒绝的行"""
+    accepted, rejected = [], []
+    for line_no, record in records:
+        if record.point_code in known_codes:
+            accepted.append(record)
+        else:
+            rejected.append({"line": line_no, "error": f"测点不存在: {record.point_code}"})
+    return accepted, rejected
+
+def detect_format(fmt: Optional[str], content_type: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    if content_type and "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+def validate_line(source: str, fmt: str, raw: bytes, header: Optional[List[str]]):
+    """解析并校验一行数据，失败时抛出 ValueError"""
+    try:
+        text = raw.decode("utf-8-sig")
+        record = parse_csv(text, header) if fmt == "csv" else parse_ndjson(text)
+        return INGEST_SCHEMAS[source].model_validate(record)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()))
+    except csv.Error as e:
+        raise ValueError(str(e))
+
+async def ingest_stream(
+    stream: AsyncIterator[bytes], db: AsyncSession, source: str, fmt: str, chunk_size: int
+) -> schemas.IngestReport:
+    """边读边写：每累计 chunk_size 条有效数据写入一次，等写入提交后再继续读取"""
+    report = schemas.IngestReport(format=fmt, table=source)
+    header = None
+    pending = []
+    chunk_rejected = 0
+
+    def reject(line_no: int, error: str):
+        report.rejected += 1
+        if len(report.rejected_lines) < MAX_REPORTED_REJECTIONS:
+            report.rejected_lines.append(schemas.RejectedLine(line=line_no, error=error))
+
+    async def flush(last_line: int):
+        nonlocal pending, chunk_rejected
+        known_codes = await db.run_sync(crud.existing_point_codes, (record.point_code for _, record in pending))
+        accepted, rejected = split_known(pending, known_codes)
+        # 与批量写入接口走同一路径，SQLite 下由单写入者合并提交
+        inserted = len(await async_crud.bulk_create(db, source, accepted)) if accepted else 0
+        for item in rejected:
+            reject(item["line"], item["error"])
+        report.inserted += inserted
+        report.chunks.append(schemas.IngestChunk(
+            chunk=len(report.chunks) + 1,
+            last_line=last_line,
+            inserted=inserted,
+            rejected=chunk_rejected + len(rejected),
+        ))
+        pending, chunk_rejected = [], 0
+
+    async for line_no, raw in iter_lines(stream, config.INGEST_MAX_LINE_BYTES):
+        report.lines = line_no
+        if raw is None:
+            reject(line_no, f"行长度超过 {config.INGEST_MAX_LINE_BYTES} 字节")
+            if fmt == "csv" and header is None:
+                break
+            chunk_rejected += 1
+            continue
+        if not raw.strip():
+            continue
+        if fmt == "csv" and header is None:
+            try:
+                header = [name.strip() for name in next(csv.reader([raw.decode("utf-8-sig")]))]
+            except (ValueError, csv.Error) as e:
+                reject(line_no, f"表头无法解析: {e}")
+                break
+            continue
+        try:
+            pending.append((line_no, validate_line(source, fmt, raw, header)))
+        except ValueError as e:
+            reject(line_no, str(e))
+            chunk_rejected += 1
+        if len(pending) >= chunk_size:
+            await flush(line_no)
+
+    if pending or chunk_rejected:
+        await flush(report.lines)
+    return report
@@ -0,0 +1,139 @@
+"""测点最新值表维护：写入时 upsert，最新值查询只需一次索引读取"""
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from . import models
+from .database import upsert_insert
+from .rollups import MEASUREMENTS, SOURCES
+
+def _key_type(source: str, measurement_type: Optional[str]) -> str:
+    # 只有 measurements 按测量类型分别记录，专用数据表按整行记录
+    return (measurement_type or "") if source == MEASUREMENTS else ""
+
+def upsert(db: Session, source: str, items: Iterable):
+    """新写入的数据行（需已 flush 取得 id）更新到最新值表，只有时间不早于现有记录时才覆盖"""
+    _, value_columns = SOURCES[source]
+    value_column = value_columns[0][1]
+    newest = {}
+    for item in items:
+        if item.time is None:
+            continue
+        key = (item.point_code, _key_type(source, getattr(item, "measurement_type", None)))
+        current = newest.get(key)
+        if current is None or item.time >= current.time:
+            newest[key] = item
+
+    rows = [
+        {
+            "source": source,
+            "point_code": point_code,
+            "measurement_type": measurement_type,
+            "row_id": item.id,
+            "time": item.time,
+            "value": getattr(item, value_column),
+        }
+        for (point_code, measurement_type), item in newest.items()
+    ]
+    if not rows:
+        return
+    table = models.PointLatest
+    stmt = upsert_insert(db, table.__table__)
+    new = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source", "point_code", "measurement_type"],
+        set_={"row_id": new.row_id, "time": new.time, "value": new.value},
+        where=new.time >= table.time,
+    )
+    db.execute(stmt, rows)
+
+def refresh(db: Session, source: str, readings: Iterable[Tuple]):
+    """修改或删除数据后，从原始数据表重新取受影响测点的最新一行"""
+    db.flush()
+    model, value_columns = SOURCES[source]
+    value_column = value_columns[0][1]
+    table = models.PointLatest
+    keys = {(reading[0], _key_type(source, reading[1])) for reading in readings}
+    for point_code, measurement_type in keys:
+        db.query(table).filter(
+            table.source == source,
+            table.point_code == point_code,
+            table.measurement_type == measurement_type,
+        ).delete(synchronize_session=False)
+
+        query = db.query(model).filter(model.point_code == point_code)
+        if source == MEASUREMENTS:
+            query = query.filter(func.coalesce(model.measurement_type, "") == measurement_type)
+        newest = query.order_by(model.time.desc()).first()
+        if newest is not None:
+            db.add(models.PointLatest(
+                source=source,
+                point_code=point_code,
+                measurement_type=measurement_type,
+                row_id=newest.id,
+                time=newest.time,
+                value=getattr(newest, value_column),
+            ))
+
+def newest_rows(db: Session, source: str) -> list:
+    """一次分组读取来源数据表中每个测点（measurements 另按测量类型）时间最晚的一行，时间相同时取 id 最大的"""
+    model, value_columns = SOURCES[source]
+    columns = [model.id, model.point_code, model.time, getattr(model, value_columns[0][1])]
+    partition = [model.point_code]
+    if source == MEASUREMENTS:
+        columns.append(model.measurement_type)
+        partition.append(func.coalesce(model.measurement_type, ""))
+    rank = func.row_number().over(partition_by=partition, order_by=(model.time.desc(), model.id.desc())).label("rank")
+    ranked = select(*columns, rank).where(model.time.isnot(None)).subquery()
+    return db.execute(select(*[column for column in ranked.c if column.key != "rank"]).where(ranked.c.rank == 1)).all()
+
+def rebuild(db: Session) -> int:
+    """清空并按原始数据重建最新值表，每个来源一次分组读取；用于已有数据库的回填，返回写入的最新值条数"""
+    db.query(models.PointLatest).delete(synchronize_session=False)
+    total = 0
+    for source in SOURCES:
+        rows = newest_rows(db, source)
+        upsert(db, source, rows)
+        total += len(rows)
+    db.commit()
+    return total
+
+def get_row(db: Session, source: str, point_code: str):
+    """取测点在来源数据表中的最新一行（measurements 取各测量类型中最新的一条）"""
+    model, _ = SOURCES[source]
+    table = models.PointLatest
+    rows = db.query(model).join(table, table.row_id == model.id).filter(
+        table.source == source,
+        table.point_code == point_code,
+    ).all()
+    return max(rows, key=lambda row: (row.time, row.id), default=None)
+
+def get_values(db: Session, source: str, point_codes: Iterable[str]) -> dict:
+    """一次查询取多个测点的最新值：point_code -> (value, time)，measurements 取各测量类型中最新的一条，没有数据的测点不在结果中"""
+    codes = set(point_codes)
+    if not codes:
+        return {}
+    table = models.PointLatest
+    rows = db.execute(select(table.point_code, table.value, table.time, table.row_id).where(
+        table.source == source,
+        table.point_code.in_(codes),
+    ))
+    newest = {}
+    for point_code, value, time, row_id in rows:
+        current = newest.get(point_code)
+        if current is None or (time, row_id) > current[:2]:
+            newest[point_code] = (time, row_id, value)
+    return {code: (value, time) for code, (time, _, value) in newest.items()}
+
+def get_all_with_points(db: Session, source: str = MEASUREMENTS) -> List[Tuple[models.PointLatest, Optional[models.MonitorPoint]]]:
+    """一次查询取出全部测点最新值及测点信息，每个测点编号只保留最新的一条"""
+    table = models.PointLatest
+    rows = db.query(table, models.MonitorPoint).outerjoin(
+        models.MonitorPoint, models.MonitorPoint.point_code == table.point_code
+    ).filter(table.source == source).all()
+
+    newest = {}
+    for latest, point in rows:
+        current = newest.get(latest.point_code)
+        if current is None or (latest.time, latest.row_id) > (current[0].time, current[0].row_id):
+            newest[latest.point_code] = (latest, point)
+    return list(newest.values())
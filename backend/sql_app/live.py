@@ -0,0 +1,96 @@
+"""新数据推送：进程内发布/订阅。新增数据提交后（async_crud.bulk_create）发布写入的行，
+/ws/measurements 的每个连接按来源、测点编号、设备类型订阅，只收到匹配的数据。
+每个订阅者一个有界队列，队列满（客户端读得太慢）时断开该订阅者，不拖慢写入和其他订阅者。
+多进程部署时只能收到同一进程写入的数据"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+from . import config, metrics
+from .point_cache import PointSnapshot
+
+class Subscription:
+    def __init__(self, sources: Iterable[str], point_codes: Iterable[str], device_types: Iterable[str], max_queue: int):
+        self.sources: Set[str] = set(sources)
+        self.point_codes: Set[str] = set(point_codes)
+        self.device_types: Set[str] = set(device_types)
+        self.dropped = False
+        self._loop = asyncio.get_running_loop()
+        self._queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(max_queue)
+
+    def matches(self, source: str, event: dict) -> bool:
+        if self.sources and source not in self.sources:
+            return False
+        # 测量数据的 point_code 形如 IP3左右岸，按所属测点 IP3 订阅也能收到
+        if self.point_codes and event["point_code"] not in self.point_codes and event.get("base_point_code") not in self.point_codes:
+            return False
+        return not self.device_types or event["device_type"] in self.device_types
+
+    def _deliver(self, message: str):
+        if self.dropped:
+            return
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # 慢消费者：丢弃积压的消息，放入 None 通知连接关闭
+            self.dropped = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    def deliver(self, message: str):
+        """可以从任意线程或事件循环调用，消息交给订阅者所在的事件循环入队"""
+        self._loop.call_soon_threadsafe(self._deliver, message)
+
+    async def get(self) -> Optional[str]:
+        """下一条消息；返回 None 表示因积压过多被断开"""
+        return await self._queue.get()
+
+class Broker:
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self.published = 0
+        self.dropped = 0
+        self._subscriptions: List[Subscription] = []
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, sources: Iterable[str] = (), point_codes: Iterable[str] = (), device_types: Iterable[str] = ()) -> Subscription:
+        subscription = Subscription(sources, point_codes, device_types, self.max_queue)
+        self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription.dropped:
+            self.dropped += 1
+        self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+
+    def publish(self, source: str, rows: list, snapshot: PointSnapshot):
+        """发布一批已提交的数据行，每个订阅者收到一条消息 {"source": ..., "data": [...]}，只含匹配的行"""
+        subscriptions = self._subscriptions
+        if not subscriptions or not rows:
+            return
+        events = [_event(row, snapshot) for row in rows]
+        for subscription in subscriptions:
+            data = [event for event in events if subscription.matches(source, event)]
+            if data:
+                subscription.deliver(json.dumps({"source": source, "data": data}, ensure_ascii=False, default=_json_default))
+        self.published += len(rows)
+
+def _event(row, snapshot: PointSnapshot) -> dict:
+    event = dict(row._mapping)
+    point = snapshot.by_code.get(event.get("base_point_code") or event["point_code"])
+    event["device_type"] = point.device_type if point else None
+    return event
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+broker = Broker(config.LIVE_QUEUE_SIZE)
+
+metrics.FunctionMetric("live_subscribers", "实时推送的连接数", "gauge", lambda: len(broker._subscriptions))
+metrics.FunctionMetric("live_published_rows", "已推送的数据行数", "counter", lambda: broker.published)
+metrics.FunctionMetric("live_dropped_subscribers", "因积压过多被断开的连接数", "counter", lambda: broker.dropped)
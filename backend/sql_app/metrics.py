@@ -0,0 +1,298 @@
+"""Prometheus 文本格式的运行指标，GET /metrics 输出。
+请求数和延迟直方图按路由模板（如 /measurements/{point_code}）统计，另有各数据表写入行数、认证失败、缓存命中和连接池占用等。
+记录时不加锁：每个标签组合的计数器在第一次使用时创建并缓存，之后只是一次 GIL 下的累加；
+同一个计数器实际只在一个线程（事件循环或单写入者线程）中更新。
+各进程分别统计，多 worker 部署时需分别抓取。
+接口与业务 API 在同一端口上，访问限制见 check_access（METRICS_ENABLED / METRICS_ALLOW_IPS / METRICS_TOKEN）"""
+import hmac
+import ipaddress
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import anyio.to_thread
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import config, database
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 与 Prometheus 客户端默认值一致（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    text = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels)
+    return "{" + text + "}" if text else ""
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def labels(self, *values):
+        """按标签值取（首次时创建）计数器；热路径上可预先取好并保存"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[Sample]:
+        result = []
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            result.extend((self.name + suffix, labels + extra, value) for suffix, extra, value in child.samples())
+        return result
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self):
+        return [("", (), self.value)]
+
+class _CounterValue(_Value):
+    __slots__ = ()
+
+    def samples(self):
+        return [("_total", (), self.value)]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 各区间（非累计）的计数，最后一个为 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        result = []
+        total = 0
+        for bound, count in zip(self.bounds + (math.inf,), list(self.counts)):
+            total += count
+            result.append(("_bucket", (("le", _format_value(bound)),), total))
+        result.append(("_sum", (), self.sum))
+        result.append(("_count", (), total))
+        return result
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+class FunctionMetric(Metric):
+    """抓取时才调用函数取值，用于已有的统计（进程池、推送、写入队列等），不在热路径上记录。
+    函数返回数值，或 {标签值元组: 数值}"""
+
+    def __init__(self, name: str, documentation: str, kind: str, function: Callable, labelnames: Sequence[str] = ()):
+        self.kind = kind
+        self.function = function
+        super().__init__(name, documentation, labelnames)
+
+    def samples(self) -> List[Sample]:
+        name = self.name + "_total" if self.kind == "counter" else self.name
+        value = self.function()
+        if not isinstance(value, dict):
+            return [(name, (), value)]
+        return [(name, tuple(zip(self.labelnames, values)), v) for values, v in value.items()]
+
+registry: List[Metric] = []
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        try:
+            samples = metric.samples()
+        except Exception:
+            # 单个指标取值失败不影响其他指标
+            continue
+        # 文本格式 0.0.4 中计数器的 HELP / TYPE 使用带 _total 的样本名
+        family = metric.name + "_total" if metric.kind == "counter" else metric.name
+        lines.append(f"# HELP {family} {metric.documentation}")
+        lines.append(f"# TYPE {family} {metric.kind}")
+        lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+def parse_networks(value: str) -> list:
+    """逗号分隔的 IP 或网段，如 "127.0.0.1,10.0.0.0/8"；格式错误时启动即报错，不悄悄放开访问"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+ALLOWED_NETWORKS = parse_networks(config.METRICS_ALLOW_IPS)
+
+def client_allowed(host: Optional[str]) -> bool:
+    try:
+        address = ipaddress.ip_address(host or "")
+    except ValueError:
+        return False
+    # IPv4 映射的 IPv6 地址（::ffff:127.0.0.1）按 IPv4 判断
+    address = getattr(address, "ipv4_mapped", None) or address
+    return any(address in network for network in ALLOWED_NETWORKS)
+
+def token_valid(authorization: Optional[str]) -> bool:
+    scheme, _, token = (authorization or "").partition(" ")
+    if not config.METRICS_TOKEN or scheme.lower() != "bearer":
+        return False
+    return hmac.compare_digest(token.strip().encode("utf-8"), config.METRICS_TOKEN.encode("utf-8"))
+
+def check_access(request: Request):
+    """/metrics 的依赖：关闭时 404，来源地址不在允许列表且没有正确的令牌时 403"""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    host = request.client.host if request.client else None
+    if not client_allowed(host) and not token_valid(request.headers.get("authorization")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="不允许访问运行指标")
+
+# ---- HTTP 请求 ----
+http_requests = Counter("http_requests", "HTTP 请求数", ["method", "route", "status"])
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP 请求处理时间（秒）", ["method", "route"])
+http_requests_in_progress = Gauge("http_requests_in_progress", "正在处理的 HTTP 请求数").labels()
+
+# 未匹配任何路由的请求（404 等）归为一类，避免按原始路径产生无限多的标签
+UNMATCHED_ROUTE = "<unmatched>"
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """按路由模板统计请求数和处理时间；路由在内层匹配后写入 scope["route"]"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_progress.dec()
+            method, route = scope["method"], route_template(scope)
+            http_requests.labels(method, route, str(status_code)).inc()
+            http_request_duration.labels(method, route).observe(elapsed)
+
+# ---- 数据写入 ----
+rows_written = Counter("ingest_rows", "已提交写入的数据行数", ["table"])
+
+# Session.info 中暂存本事务写入的行数，提交后才计入，回滚（如单写入者整批失败后逐个重写）不计
+_PENDING_ROWS = "metrics_rows"
+
+def count_rows(db: Session, table: str, count: int):
+    pending = db.info.setdefault(_PENDING_ROWS, {})
+    pending[table] = pending.get(table, 0) + count
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    pending = session.info.pop(_PENDING_ROWS, None)
+    if pending:
+        for table, count in pending.items():
+            rows_written.labels(table).inc(count)
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(_PENDING_ROWS, None)
+
+# ---- 认证与缓存 ----
+auth_failures = Counter("auth_failures", "认证失败次数", ["reason"])
+cache_requests = Counter("cache_requests", "进程内缓存的查找次数", ["cache", "result"])
+
+def cache_counters(cache: str):
+    """返回 (命中, 未命中) 两个计数器，供缓存模块在导入时取好"""
+    return cache_requests.labels(cache, "hit"), cache_requests.labels(cache, "miss")
+
+# ---- 连接池与线程池 ----
+db_connections_checked_out = Gauge("db_connections_checked_out", "已从连接池取出、正在使用的数据库连接数", ["engine"])
+
+def instrument_pool(pool, engine: str):
+    """按连接池的 checkout / checkin 事件计数，NullPool（aiosqlite）同样适用"""
+    gauge = db_connections_checked_out.labels(engine)
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        gauge.inc()
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        gauge.dec()
+
+instrument_pool(database.engine.pool, "sync")
+instrument_pool(database.async_engine.sync_engine.pool, "async")
+
+def _pool_sizes() -> dict:
+    pools = {"sync": database.engine.pool, "async": database.async_engine.sync_engine.pool}
+    return {(name,): pool.size() for name, pool in pools.items() if hasattr(pool, "size")}
+
+FunctionMetric("db_pool_size", "连接池常驻连接数（NullPool 不统计）", "gauge", _pool_sizes, ["engine"])
+
+def _threadpool_stats():
+    # 须在事件循环中调用（/metrics 为 async 接口）；同步接口和 run_in_threadpool 共用这个线程池
+    return anyio.to_thread.current_default_thread_limiter().statistics()
+
+FunctionMetric("threadpool_threads_busy", "接口线程池中正在执行的任务数", "gauge", lambda: _threadpool_stats().borrowed_tokens)
+FunctionMetric("threadpool_threads_max", "接口线程池的线程数上限", "gauge", lambda: _threadpool_stats().total_tokens)
+FunctionMetric("threadpool_queue_depth", "等待接口线程池空闲线程的任务数", "gauge", lambda: _threadpool_stats().tasks_waiting)
@@ -0,0 +1,86 @@
+"""数据库迁移：建表，给旧数据库补加新增的列和索引（新补加的 measurements.base_point_code 立即回填），
+新建的汇总表和最新值表按已有原始数据回填，按配置把时序数据表转换为 TimescaleDB 超表。
+部署时由 `python migrate.py`（或 init_db.py）执行一次；AUTO_MIGRATE 开启时服务启动时也会执行。
+多个 worker 或副本同时迁移时由迁移锁串行执行：后拿到锁的进程看到的已是最新结构，不再做任何修改"""
+import contextlib
+import os
+import zlib
+from typing import Dict, List, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from . import config, crud, database, latest, models, rollups
+
+# PostgreSQL advisory lock 的键，同一数据库上的所有进程使用同一个值
+LOCK_KEY = zlib.crc32(b"water_platform.migrations")
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """SQLite：锁住数据库文件旁的 .migrate.lock，进程退出时操作系统自动释放，不会留下失效的锁"""
+    with open(path, "a+b") as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            # Windows：msvcrt.locking 锁不到时每秒重试一次，10 次后抛出 OSError
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+@contextlib.contextmanager
+def migration_lock(engine: Engine):
+    """迁移期间持有的跨进程锁：PostgreSQL 用会话级 advisory lock，SQLite 文件库用文件锁，内存库不需要"""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+                conn.commit()
+        return
+    path = engine.url.database if engine.dialect.name == "sqlite" else None
+    if not path or path == ":memory:":
+        yield
+        return
+    with _file_lock(os.path.abspath(path) + ".migrate.lock"):
+        yield
+
+# 由原始数据推导的表 -> 回填函数（清空后重建并提交）；只在迁移新建该表时执行
+_BACKFILLS = {
+    models.MeasurementRollup.__tablename__: rollups.rebuild,
+    models.PointLatest.__tablename__: latest.rebuild,
+}
+
+def migrate(engine: Optional[Engine] = None) -> Dict[str, List[str]]:
+    """执行全部迁移，返回本次补加的列、回填的汇总表和转换的超表；engine 默认为 database.engine（调用时读取，便于脚本替换）"""
+    engine = engine or database.engine
+    with migration_lock(engine):
+        # 升级旧数据库时新建的汇总表是空的，须在同一把锁内按已有原始数据回填，否则统计、图表和最新值查不到数据
+        inspector = inspect(engine)
+        created = [table for table in _BACKFILLS if not inspector.has_table(table)]
+        models.Base.metadata.create_all(bind=engine)
+        columns = models.create_missing_columns(engine)
+        db = database.SessionLocal(bind=engine)
+        try:
+            if "measurements.base_point_code" in columns:
+                crud.backfill_base_point_codes(db)
+            for table in created:
+                _BACKFILLS[table](db)
+        finally:
+            db.close()
+        models.create_missing_indexes(engine)
+        hypertables = []
+        if config.TIMESCALE_HYPERTABLES:
+            hypertables = models.create_hypertables(engine, config.TIMESCALE_CHUNK_INTERVAL)
+    return {"columns": columns, "backfilled": created, "hypertables": hypertables}
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, UniqueConstraint, Index, inspect, text
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
+from typing import List
 
 class User(Base):
     __tablename__ = "users"
@@ -36,9 +37,15 @@ class MonitorPoint(Base):
 class Measurement(Base):
     """监测数据表：存储时序数据，用于 ECharts 展示（保留向后兼容）"""
     __tablename__ = "measurements"
+    __table_args__ = (
+        Index("ix_measurements_point_code_time", "point_code", "time"),
+        Index("ix_measurements_time", "time"),
+        Index("ix_measurements_base_point_code_time", "base_point_code", "time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     point_code = Column(String, ForeignKey("monitor_points.point_code"))
+    base_point_code = Column(String, nullable=True, comment="所属测点编号（point_code 的最长测点前缀，如 IP3左右岸 -> IP3）")
     value = Column(Float, comment="监测值")
     time = Column(DateTime, default=datetime.now, comment="监测时间")
     measurement_type = Column(String, comment="测量类型（左右岸/上下游/沉降等）")
@@ -48,9 +55,10 @@ class Measurement(Base):
 class InvertedPlumbData(Base):
     """倒垂线数据表"""
     __tablename__ = "inverted_plumb_data"
+    __table_args__ = (Index("ix_inverted_plumb_data_point_code_time", "point_code", "time"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    point_code = Column(String, ForeignKey("monitor_points.point_code"), index=True, comment="测点编号")
+    point_code = Column(String, ForeignKey("monitor_points.point_code"), comment="测点编号")
     left_right_value = Column(Float, comment="左右岸值")
     up_down_value = Column(Float, comment="上下游值")
     time = Column(DateTime, default=datetime.now, comment="监测时间")
@@ -60,9 +68,10 @@ class InvertedPlumbData(Base):
 class StaticLevelData(Base):
     """静力水准数据表"""
     __tablename__ = "static_level_data"
+    __table_args__ = (Index("ix_static_level_data_point_code_time", "point_code", "time"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    point_code = Column(String, ForeignKey("monitor_points.point_code"), index=True, comment="测点编号")
+    point_code = Column(String, ForeignKey("monitor_points.point_code"), comment="测点编号")
     value = Column(Float, comment="沉降值")
     time = Column(DateTime, default=datetime.now, comment="监测时间")
     
@@ -71,9 +80,10 @@ class StaticLevelData(Base):
 class TensionLineData(Base):
     """引张线数据表"""
     __tablename__ = "tension_line_data"
+    __table_args__ = (Index("ix_tension_line_data_point_code_time", "point_code", "time"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    point_code = Column(String, ForeignKey("monitor_points.point_code"), index=True, comment="测点编号")
+    point_code = Column(String, ForeignKey("monitor_points.point_code"), comment="测点编号")
     value = Column(Float, comment="位移值")
     time = Column(DateTime, default=datetime.now, comment="监测时间")
     
@@ -82,10 +92,162 @@ class TensionLineData(Base):
 class WaterLevelData(Base):
     """水位数据表"""
     __tablename__ = "water_level_data"
+    __table_args__ = (Index("ix_water_level_data_point_code_time", "point_code", "time"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    point_code = Column(String, ForeignKey("monitor_points.point_code"), index=True, comment="测点编号")
+    point_code = Column(String, ForeignKey("monitor_points.point_code"), comment="测点编号")
     value = Column(Float, comment="水位值")
     time = Column(DateTime, default=datetime.now, comment="监测时间")
     
-    point = relationship("MonitorPoint", back_populates="water_level_data")
\ No newline at end of file
+    point = relationship("MonitorPoint", back_populates="water_level_data")
+
+class MeasurementRollup(Base):
+    """时序汇总表：按小时/天/月预聚合，写入时增量维护"""
+    __tablename__ = "measurement_rollups"
+    __table_args__ = (
+        UniqueConstraint("source", "point_code", "granularity", "bucket_start", "measurement_type", name="uq_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False, comment="来源数据表：measurements/inverted_plumb/static_level/tension_line/water_level")
+    point_code = Column(String, nullable=False, comment="测点编号")
+    granularity = Column(String, nullable=False, comment="汇总粒度：hour/day/month")
+    bucket_start = Column(DateTime, nullable=False, comment="时间桶起点")
+    measurement_type = Column(String, nullable=False, default="", comment="测量类型，无类型时为空串")
+    count = Column(Integer, nullable=False, default=0, comment="数据条数")
+    sum_value = Column(Float, nullable=False, default=0.0, comment="数值之和")
+    min_value = Column(Float, comment="最小值")
+    max_value = Column(Float, comment="最大值")
+    first_time = Column(DateTime, comment="桶内最早时间")
+    first_value = Column(Float, comment="桶内最早值")
+    last_time = Column(DateTime, comment="桶内最晚时间")
+    last_value = Column(Float, comment="桶内最晚值")
+
+class PointLatest(Base):
+    """最新值表：每个测点（及测量类型）的最新一条数据，写入时同步更新"""
+    __tablename__ = "point_latest"
+    __table_args__ = (
+        UniqueConstraint("source", "point_code", "measurement_type", name="uq_point_latest"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False, comment="来源数据表：measurements/inverted_plumb/static_level/tension_line/water_level")
+    point_code = Column(String, nullable=False, comment="测点编号")
+    measurement_type = Column(String, nullable=False, default="", comment="测量类型，仅 measurements 区分，其余为空串")
+    row_id = Column(Integer, nullable=False, comment="来源数据表中最新一行的 id")
+    time = Column(DateTime, nullable=False, comment="最新监测时间")
+    value = Column(Float, comment="最新监测值（倒垂线为左右岸值）")
+
+class DataVersion(Base):
+    """数据版本表：每个来源、测点一行，任何写入都在同一事务内递增版本号，用于接口响应的 ETag"""
+    __tablename__ = "data_versions"
+    __table_args__ = (
+        UniqueConstraint("source", "point_code", name="uq_data_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False, comment="来源数据表，取值同 measurement_rollups.source")
+    point_code = Column(String, nullable=False, comment="测点编号（数据行的 point_code）")
+    version = Column(Integer, nullable=False, default=1, comment="版本号，每次写入加一")
+    updated_at = Column(DateTime, nullable=False, comment="最后写入时间（UTC）")
+
+class AlertRule(Base):
+    """告警规则表：写入新数据时按规则增量判断，触发的告警记入 alert_events"""
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=True, comment="规则名称")
+    source = Column(String, nullable=False, default="measurements", comment="来源数据表，取值同 measurement_rollups.source")
+    point_code = Column(String, nullable=False, index=True, comment="测点编号（测量数据按所属测点匹配）")
+    measurement_type = Column(String, nullable=True, comment="测量类型，为空时对该测点的所有测量类型生效")
+    min_value = Column(Float, nullable=True, comment="下限，低于时告警")
+    max_value = Column(Float, nullable=True, comment="上限，超过时告警")
+    max_rate = Column(Float, nullable=True, comment="变化速率上限（每小时变化量的绝对值），超过时告警")
+    hysteresis = Column(Float, nullable=False, default=0, comment="回差：超限告警在数值回到阈值内侧这么多后才解除")
+    enabled = Column(Boolean, nullable=False, default=True, comment="是否启用")
+    created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+
+class AlertState(Base):
+    """告警规则的判断状态：每条规则、测量类型一行，记录上一个读数和正在持续的告警"""
+    __tablename__ = "alert_states"
+    __table_args__ = (
+        UniqueConstraint("rule_id", "measurement_type", name="uq_alert_state"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, ForeignKey("alert_rules.id"), nullable=False)
+    measurement_type = Column(String, nullable=False, default="", comment="测量类型，无类型时为空串")
+    last_time = Column(DateTime, nullable=True, comment="上一个读数的时间")
+    last_value = Column(Float, nullable=True, comment="上一个读数的值")
+    high_active = Column(Boolean, nullable=False, default=False, comment="超过上限告警持续中")
+    low_active = Column(Boolean, nullable=False, default=False, comment="低于下限告警持续中")
+    rate_active = Column(Boolean, nullable=False, default=False, comment="变化过快告警持续中")
+
+class AlertEvent(Base):
+    """告警记录表：规则触发时写入，解除时填写 cleared_at"""
+    __tablename__ = "alert_events"
+    __table_args__ = (
+        Index("ix_alert_events_time", "time"),
+        Index("ix_alert_events_point_code_time", "point_code", "time"),
+        Index("ix_alert_events_rule_open", "rule_id", "measurement_type", "alert_type", "cleared_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    rule_id = Column(Integer, nullable=True, comment="触发的规则 ID，规则删除后为空")
+    source = Column(String, nullable=False, comment="来源数据表")
+    point_code = Column(String, nullable=False, comment="规则的测点编号")
+    measurement_type = Column(String, nullable=False, default="", comment="测量类型，无类型时为空串")
+    alert_type = Column(String, nullable=False, comment="告警类型：超过上限/低于下限/变化过快")
+    value = Column(Float, comment="触发时的监测值（变化过快时为每小时变化量）")
+    threshold = Column(Float, comment="触发的阈值")
+    time = Column(DateTime, nullable=False, comment="触发读数的监测时间")
+    cleared_at = Column(DateTime, nullable=True, comment="解除读数的监测时间，持续中的告警为空")
+    created_at = Column(DateTime, default=datetime.now, comment="记录时间")
+
+def create_missing_columns(bind) -> List[str]:
+    """create_all 不会给已存在的表补加列，升级旧数据库时补加可为空的新列，返回补加的 表.列 名称"""
+    inspector = inspect(bind)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def create_missing_indexes(bind):
+    """create_all 不会给已存在的表补建索引，升级旧数据库时逐个补建"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+# 按 time 分区的时序数据表
+TIME_SERIES_MODELS = (Measurement, InvertedPlumbData, StaticLevelData, TensionLineData, WaterLevelData)
+
+def create_hypertables(bind, chunk_interval: str = "7 days") -> List[str]:
+    """PostgreSQL + TimescaleDB：把时序数据表转换为按 time 分区的超表，已是超表的跳过，返回本次转换的表名。
+    超表的主键必须包含分区列，转换前把主键由 (id) 改为 (id, time)；已有数据随之迁移到分块中"""
+    if bind.dialect.name != "postgresql":
+        return []
+    converted = []
+    with bind.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+        existing = set(conn.execute(text("SELECT hypertable_name FROM timescaledb_information.hypertables")).scalars())
+        for model in TIME_SERIES_MODELS:
+            table = model.__tablename__
+            if table in existing:
+                continue
+            conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_pkey"))
+            conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, time)"))
+            conn.execute(
+                text(f"SELECT create_hypertable('{table}', 'time', chunk_time_interval => CAST(:interval AS INTERVAL), migrate_data => TRUE)"),
+                {"interval": chunk_interval},
+            )
+            converted.append(table)
+    return converted
@@ -0,0 +1,61 @@
+"""游标分页：游标是 (time, id) 的不透明编码，按 WHERE (time, id) < (?, ?) 在复合索引上定位，翻到多深每页代价都相同"""
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+
+# 下一页游标通过响应头返回，响应体保持数组格式不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Cursor = Tuple[Optional[datetime], int]
+
+def encode_cursor(time: Optional[datetime], row_id: int) -> str:
+    raw = json.dumps([time.isoformat() if time else None, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+# 数据库整数主键的范围，超出的 id 在绑定参数时才会出错
+_MAX_ID = 2 ** 63 - 1
+# 游标只有两个元素，嵌套层数很深的 JSON 一定是伪造的，先按长度拒绝，避免解析时递归过深
+_MAX_TOKEN_LENGTH = 256
+
+def decode_cursor(token: str) -> Cursor:
+    """解析游标，格式不正确（包括被篡改的游标）时抛出 ValueError"""
+    error = ValueError(f"无效的分页游标: {token[:_MAX_TOKEN_LENGTH]}")
+    if len(token) > _MAX_TOKEN_LENGTH:
+        raise error
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        time, row_id = json.loads(raw)
+        time = datetime.fromisoformat(time) if time is not None else None
+    except (TypeError, ValueError, UnicodeDecodeError, RecursionError) as e:
+        raise error from e
+    # encode_cursor 只生成不带时区的时间和整数 id
+    if (time is not None and time.tzinfo is not None) or type(row_id) is not int or not -_MAX_ID <= row_id <= _MAX_ID:
+        raise error
+    return time, row_id
+
+def seek_time_desc(query, model, cursor: Optional[Cursor], limit: int):
+    """按 (time, id) 倒序取一页，cursor 为上一页最后一行"""
+    if cursor is not None:
+        query = query.filter(tuple_(model.time, model.id) < tuple_(*cursor))
+    return query.order_by(model.time.desc(), model.id.desc()).limit(limit)
+
+def seek_id_asc(query, model, cursor: Optional[Cursor], limit: int):
+    """按 id 正序取一页（无时间列的表，如用户表）"""
+    if cursor is not None:
+        query = query.filter(model.id > cursor[1])
+    return query.order_by(model.id).limit(limit)
+
+def with_skip(query, skip: int, cursor: Optional[Cursor]):
+    # 兼容旧的 skip 参数，传入游标时忽略
+    if skip and cursor is None:
+        query = query.offset(skip)
+    return query
+
+def next_cursor(rows: List, limit: int) -> Optional[str]:
+    """取满一页时以最后一行生成下一页游标，否则说明已到末页"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, "time", None), last.id)
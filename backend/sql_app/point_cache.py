@@ -0,0 +1,66 @@
+"""测点信息的进程内读穿缓存：测点很少变化却几乎被每个接口查询。
+整表加载为一个快照，按 point_code 和 device_type 建索引，并预先序列化 /points/ 的响应体和 ETag；
+crud 中新增、修改、删除测点提交后递增版本号，下次读取时重新加载。
+多进程部署时各进程分别缓存，其他进程的修改最多在 POINT_CACHE_TTL 秒后生效"""
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import config, metrics, models, schemas
+
+class PointSnapshot:
+    def __init__(self, version: int, points: List[schemas.MonitorPointOut]):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.points = points
+        self.by_code: Dict[str, schemas.MonitorPointOut] = {p.point_code: p for p in points}
+        self.by_device_type: Dict[Optional[str], List[schemas.MonitorPointOut]] = {}
+        for p in points:
+            self.by_device_type.setdefault(p.device_type, []).append(p)
+        # 与 FastAPI 默认 JSON 输出格式一致；ETag 取内容摘要，多进程之间也一致
+        self.body = json.dumps([p.model_dump() for p in points], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+
+    def matching_codes(self, device_type: Optional[str] = None, point_name: Optional[str] = None) -> List[str]:
+        """按设备类型和测点名（包含匹配，不区分大小写，同 SQLite LIKE '%name%'）筛选测点编号"""
+        points = self.by_device_type.get(device_type, []) if device_type else self.points
+        if point_name:
+            name = point_name.lower()
+            points = [p for p in points if p.point_name and name in p.point_name.lower()]
+        return [p.point_code for p in points]
+
+_lock = threading.Lock()
+_version = 0
+_snapshot: Optional[PointSnapshot] = None
+_cache_hit, _cache_miss = metrics.cache_counters("points")
+
+def invalidate():
+    """测点表提交修改后调用"""
+    global _version
+    with _lock:
+        _version += 1
+
+def _is_fresh(snapshot: Optional[PointSnapshot]) -> bool:
+    return (
+        snapshot is not None
+        and snapshot.version == _version
+        and time.monotonic() - snapshot.loaded_at < config.POINT_CACHE_TTL
+    )
+
+async def get(db: AsyncSession) -> PointSnapshot:
+    """返回当前快照，过期或已失效时从数据库重新加载"""
+    global _snapshot
+    snapshot = _snapshot
+    if _is_fresh(snapshot):
+        _cache_hit.inc()
+        return snapshot
+    _cache_miss.inc()
+    # 先记下版本号再查询，加载期间发生的修改会让这个快照立即过期
+    version = _version
+    rows = await db.scalars(select(models.MonitorPoint).order_by(models.MonitorPoint.id))
+    snapshot = PointSnapshot(version, [schemas.MonitorPointOut.model_validate(p) for p in rows])
+    _snapshot = snapshot
+    return snapshot
@@ -0,0 +1,267 @@
+"""按请求的性能剖析：记录请求执行的 SQL 条数、数据库耗时、响应序列化耗时和最慢的几条语句，
+同一形状的语句在一个请求内重复执行多次时标记为 N+1（通常是循环里逐条查询）。
+序列化耗时包括 FastAPI 按 response_model 的序列化，以及直接返回 Response 的路由在 serializing() 中的编码。
+结果写入 Server-Timing 响应头，并保存在进程内的环形缓冲区，管理员通过 GET /debug/requests 查看。
+按 PROFILE_SAMPLE_RATE 抽样；请求带 X-Profile: 1 时，认证为管理员（或 PROFILE_ALLOW_FORCE 开启）才记录并返回 Server-Timing，
+匿名请求不能借此获取数据库耗时或挤掉缓冲区中的记录。未被抽中的请求每条语句只多一次 ContextVar 读取。
+SQLite 单写入者线程（writer.py）中执行的写入不计入发起写入的请求"""
+import heapq
+import random
+import re
+import threading
+import time
+import types
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+import fastapi
+import fastapi.routing
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from . import config
+
+FORCE_HEADER = b"x-profile"
+# 每个请求保留的最慢语句条数，以及记录的语句最大长度
+SLOWEST_STATEMENTS = 5
+MAX_STATEMENT_CHARS = 500
+# 不记录的路径：查看剖析结果的接口自身
+SKIPPED_PREFIXES = ("/debug/",)
+
+# IN 列表展开后的占位符个数随参数变化（SQLite ?、asyncpg $n、psycopg2 %(name)s），归一化后才是同一形状
+_PLACEHOLDER = r"(?:\?|\$\d+|%\(\w+\)s)"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_NUMBERED = re.compile(r"\$\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """语句形状：参数化的语句文本，去掉空白差异和 IN 列表长度"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    return _NUMBERED.sub("$n", _IN_LIST.sub("(...)", shape))
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, query: str):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.status: Optional[int] = None
+        self.total_time = 0.0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.statements = 0
+        # 由 X-Profile 请求头强制剖析（未被抽中），只有认证为管理员时才输出结果
+        self.forced = False
+        self.admin = False
+        # 语句形状 -> [执行次数, 总耗时]
+        self.shapes: Dict[str, list] = {}
+        # 最慢语句的小顶堆 (耗时, 序号, 语句)
+        self._slowest: List[tuple] = []
+
+    def add_statement(self, statement: str, seconds: float, executemany: bool):
+        self.statements += 1
+        self.db_time += seconds
+        shape = statement_shape(statement)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            stats = self.shapes[shape] = [0, 0.0]
+        # executemany 本身就是批量执行，不参与 N+1 计数
+        if not executemany:
+            stats[0] += 1
+        stats[1] += seconds
+        item = (seconds, self.statements, shape[:MAX_STATEMENT_CHARS])
+        if len(self._slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self._slowest, item)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def n_plus_one(self) -> List[dict]:
+        return sorted(
+            (
+                {"statement": shape[:MAX_STATEMENT_CHARS], "count": count, "total_ms": total * 1000}
+                for shape, (count, total) in self.shapes.items()
+                if count >= config.PROFILE_N_PLUS_ONE
+            ),
+            key=lambda item: -item["count"],
+        )
+
+    def server_timing(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        parts = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.statements} queries"',
+            f"serialize;dur={self.serialize_time * 1000:.1f}",
+            f"total;dur={elapsed * 1000:.1f}",
+        ]
+        repeated = self.n_plus_one()
+        if repeated:
+            parts.append(f'n-plus-one;desc="{len(repeated)} repeated statements"')
+        return ", ".join(parts)
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": self.status,
+            "started_at": self.started_at,
+            "total_ms": self.total_time * 1000,
+            "db_ms": self.db_time * 1000,
+            "serialize_ms": self.serialize_time * 1000,
+            "statements": self.statements,
+            "slowest": [
+                {"statement": statement, "duration_ms": seconds * 1000}
+                for seconds, _, statement in sorted(self._slowest, reverse=True)
+            ],
+            "n_plus_one": self.n_plus_one(),
+        }
+
+class RecentProfiles:
+    """最近被记录的请求，超出容量时丢弃最早的"""
+
+    def __init__(self, size: int):
+        self._items: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._items.append(profile)
+
+    def list(self, limit: int, n_plus_one_only: bool = False) -> List[dict]:
+        with self._lock:
+            items = list(reversed(self._items))
+        result = []
+        for profile in items:
+            data = profile.to_dict()
+            if n_plus_one_only and not data["n_plus_one"]:
+                continue
+            result.append(data)
+            if len(result) >= limit:
+                break
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+recent = RecentProfiles(config.PROFILE_BUFFER_SIZE)
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+# 同步引擎和异步引擎（sync_engine）都会触发 Engine 级事件；异步驱动的语句在请求所在的上下文中执行，ContextVar 可见
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = conn.info.get("profile_started")
+    if profile is None or not started:
+        return
+    profile.add_statement(statement, time.perf_counter() - started.pop(), executemany)
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # 语句出错时没有 after_cursor_execute，丢弃对应的开始时间
+    started = context.connection.info.get("profile_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+@contextmanager
+def serializing():
+    """直接返回 Response 的路由（列式响应、fastjson 编码）不经过 serialize_response，在编码处用它计时。
+    编码放到线程池执行时同样有效：run_in_threadpool 会把当前上下文（ContextVar）复制到工作线程"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_time += time.perf_counter() - started
+
+def _uses_global(function, name: str) -> bool:
+    """function（包括其中定义的内部函数）是否按模块全局名引用 name"""
+    codes = [function.__code__]
+    while codes:
+        code = codes.pop()
+        if name in code.co_names:
+            return True
+        codes.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    return False
+
+# 按 response_model 校验和编码在 FastAPI 的 serialize_response 中完成，FastAPI 没有对应的钩子，只能替换这个模块函数
+# （requirements.txt 固定了 FastAPI 版本）。升级后函数不存在或请求处理不再按全局名调用它时导入即报错，
+# 不让 serialize 耗时静默地一直为 0
+_serialize_response = getattr(fastapi.routing, "serialize_response", None)
+if not callable(_serialize_response) or not _uses_global(fastapi.routing.get_request_handler, "serialize_response"):
+    raise RuntimeError(
+        f"FastAPI {fastapi.__version__} 的请求处理不再调用 fastapi.routing.serialize_response，profiling.py 需要随之修改"
+    )
+
+async def _timed_serialize_response(*args, **kwargs):
+    profile = _current.get()
+    if profile is None:
+        return await _serialize_response(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+        return await _serialize_response(*args, **kwargs)
+    finally:
+        profile.serialize_time += time.perf_counter() - started
+
+fastapi.routing.serialize_response = _timed_serialize_response
+
+def _sampled(scope) -> Optional[str]:
+    """返回 "sampled"（按比例抽中）、"forced"（只带 X-Profile: 1）或 None"""
+    if scope["path"].startswith(SKIPPED_PREFIXES):
+        return None
+    rate = config.PROFILE_SAMPLE_RATE
+    if rate >= 1 or (rate > 0 and random.random() < rate):
+        return "sampled"
+    if (FORCE_HEADER, b"1") in scope.get("headers", []):
+        return "forced"
+    return None
+
+def note_principal(principal):
+    """认证依赖得到用户后调用：强制剖析的请求据此判断是否输出结果"""
+    profile = _current.get()
+    if profile is not None:
+        profile.admin = principal.is_active and principal.role == "admin"
+
+def _visible(profile: RequestProfile) -> bool:
+    return not profile.forced or profile.admin or config.PROFILE_ALLOW_FORCE
+
+class ProfilingMiddleware:
+    """为抽中的请求建立 RequestProfile，响应头加 Server-Timing，结束后存入 recent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = scope["type"] == "http" and _sampled(scope)
+        if not mode:
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"))
+        profile.forced = mode == "forced"
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                # 响应开始时认证依赖已执行完毕
+                if _visible(profile):
+                    MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            profile.total_time = time.perf_counter() - profile.started
+            if _visible(profile):
+                recent.add(profile)
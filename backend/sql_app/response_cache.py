@@ -0,0 +1,175 @@
+"""时序查询接口的条件请求与响应缓存。
+ETag 由请求路径和规范化的查询参数、数据版本号（data_versions）和测点快照的 ETag 计算，不读取数据本身：
+客户端带 If-None-Match 重新验证且数据未变时直接返回 304；内容变化前的相同请求由内存 LRU 返回已序列化的响应体。
+校验放在路由依赖里而不是 ASGI 中间件里，因为版本号取决于路由匹配出的 point_code 和数据来源；
+ResponseCacheMiddleware 只负责把路由第一次生成的 200 响应体存入 LRU"""
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import auth, columnar, config, data_versions, database, metrics, point_cache, schemas
+
+# request.state 上的属性名：本次响应需要存入缓存时记录 (key, etag)
+_STATE_KEY = "response_cache"
+# 不随响应体一起缓存的响应头，由 Response 重新生成
+_SKIPPED_HEADERS = {b"content-length", b"date", b"server"}
+
+Headers = List[Tuple[bytes, bytes]]
+
+_cache_hit, _cache_miss = metrics.cache_counters("response")
+
+class ResponseCache:
+    """按总字节数限制的 LRU：key -> (etag, 响应体, 响应头)，ETag 不同即视为过期"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, bytes, Headers]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, etag: str) -> Optional[Tuple[bytes, Headers]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                _cache_miss.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            _cache_hit.inc()
+            return entry[1], entry[2]
+
+    def put(self, key: str, etag: str, body: bytes, headers: Headers):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (etag, body, headers)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+response_cache = ResponseCache(config.RESPONSE_CACHE_MAX_BYTES)
+metrics.FunctionMetric("response_cache_bytes", "响应体缓存占用的字节数", "gauge", lambda: response_cache.size)
+
+class CachedResponse(Exception):
+    """依赖中命中缓存时抛出，由 cached_response_handler 直接返回缓存的响应体，跳过路由函数"""
+
+    def __init__(self, body: bytes, headers: Headers):
+        self.body = body
+        self.headers = headers
+
+async def cached_response_handler(request: Request, exc: CachedResponse) -> Response:
+    response = Response(content=exc.body)
+    response.raw_headers.extend(exc.headers)
+    return response
+
+def cache_key(request: Request) -> str:
+    """路径加排序后的查询参数，参数顺序不同的相同请求共用一个缓存项；按 Accept 协商出列式格式时另加格式"""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}"
+    fmt = columnar.negotiate(request)
+    return key if fmt == columnar.JSON else f"{key}|{fmt}"
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """请求头 If-None-Match 是否包含当前 ETag（忽略弱校验前缀 W/）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+def not_modified_since(request: Request, updated_at: Optional[datetime]) -> bool:
+    """If-Modified-Since 只在没有 If-None-Match 时生效；精度为秒"""
+    header = request.headers.get("if-modified-since")
+    if not header or updated_at is None or "if-none-match" in request.headers:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+async def _validate(request: Request, response: Response, db: AsyncSession, source: str, point_code: Optional[str]):
+    version, updated_at = await data_versions.get(db, source, point_code)
+    snapshot = await point_cache.get(db)
+    key = cache_key(request)
+    digest = hashlib.sha1(f"{key}|{source}|{version}|{snapshot.etag}".encode("utf-8")).hexdigest()
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+    if etag_matches(request, etag) or not_modified_since(request, updated_at):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if response_cache.max_bytes > 0:
+        cached = response_cache.get(key, etag)
+        if cached is not None:
+            raise CachedResponse(*cached)
+        setattr(request.state, _STATE_KEY, (key, etag))
+    response.headers.update(headers)
+
+def conditional(source: str, per_point: bool = True):
+    """时序查询接口的路由依赖：dependencies=[response_cache.conditional(rollups.MEASUREMENTS)]。
+    先完成认证再校验，未登录的请求不会得到 304；per_point=False 时按整个来源的版本号校验"""
+    if per_point:
+        async def dependency(
+            request: Request,
+            response: Response,
+            point_code: str,
+            current_user: schemas.Principal = Depends(auth.get_current_active_user),
+            db: AsyncSession = Depends(database.get_async_db),
+        ):
+            await _validate(request, response, db, source, point_code)
+    else:
+        async def dependency(
+            request: Request,
+            response: Response,
+            current_user: schemas.Principal = Depends(auth.get_current_active_user),
+            db: AsyncSession = Depends(database.get_async_db),
+        ):
+            await _validate(request, response, db, source, None)
+    return Depends(dependency)
+
+class ResponseCacheMiddleware:
+    """把 conditional 依赖标记过的 200 响应体存入 response_cache"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or response_cache.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        # 与路由中的 request.state 是同一个字典
+        state = scope.setdefault("state", {})
+        started = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                started.update(message)
+            elif message["type"] == "http.response.body" and state.get(_STATE_KEY) and started.get("status") == 200:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    key, etag = state[_STATE_KEY]
+                    headers = [(k, v) for k, v in started.get("headers", []) if k.lower() not in _SKIPPED_HEADERS]
+                    response_cache.put(key, etag, b"".join(chunks), headers)
+            await send(message)
+
+        await self.app(scope, receive, capture)
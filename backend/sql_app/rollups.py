@@ -0,0 +1,279 @@
+"""时序汇总表维护：写入时按小时/天/月增量更新，统计查询优先使用最粗的汇总粒度"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from . import models
+from .database import upsert_insert
+
+# 由细到粗
+GRANULARITIES = ("hour", "day", "month")
+
+MEASUREMENTS = "measurements"
+INVERTED_PLUMB = "inverted_plumb"
+STATIC_LEVEL = "static_level"
+TENSION_LINE = "tension_line"
+WATER_LEVEL = "water_level"
+
+# 来源 -> (数据表模型, [(测量类型, 数值列)])，测量类型为 None 时取数据行自身的 measurement_type
+SOURCES = {
+    MEASUREMENTS: (models.Measurement, [(None, "value")]),
+    INVERTED_PLUMB: (models.InvertedPlumbData, [("左右岸", "left_right_value"), ("上下游", "up_down_value")]),
+    STATIC_LEVEL: (models.StaticLevelData, [("沉降", "value")]),
+    TENSION_LINE: (models.TensionLineData, [("位移", "value")]),
+    WATER_LEVEL: (models.WaterLevelData, [("水位", "value")]),
+}
+
+# (point_code, measurement_type, time, value)
+Reading = Tuple[str, str, datetime, Optional[float]]
+
+def bucket_start(time: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return time.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return time.replace(hour=0, minute=0, second=0, microsecond=0)
+    return time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def bucket_end(start: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return start + timedelta(hours=1)
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+def readings_of(source: str, items: Iterable) -> List[Reading]:
+    """把数据行（ORM 对象或带同名属性的对象）展开为汇总用的读数"""
+    _, value_columns = SOURCES[source]
+    readings = []
+    for item in items:
+        for measurement_type, column in value_columns:
+            if measurement_type is None:
+                measurement_type = getattr(item, "measurement_type", None)
+            readings.append((item.point_code, measurement_type or "", item.time, getattr(item, column)))
+    return readings
+
+def _aggregate(source: str, readings: Iterable[Reading]) -> dict:
+    buckets = {}
+    for point_code, measurement_type, time, value in readings:
+        if value is None or time is None:
+            continue
+        for granularity in GRANULARITIES:
+            key = (source, point_code, granularity, bucket_start(time, granularity), measurement_type or "")
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [1, value, value, value, time, value, time, value]
+                continue
+            bucket[0] += 1
+            bucket[1] += value
+            bucket[2] = min(bucket[2], value)
+            bucket[3] = max(bucket[3], value)
+            if time < bucket[4]:
+                bucket[4], bucket[5] = time, value
+            if time >= bucket[6]:
+                bucket[6], bucket[7] = time, value
+    return buckets
+
+def _upsert(db: Session, buckets: dict):
+    rows = [
+        {
+            "source": key[0],
+            "point_code": key[1],
+            "granularity": key[2],
+            "bucket_start": key[3],
+            "measurement_type": key[4],
+            "count": b[0],
+            "sum_value": b[1],
+            "min_value": b[2],
+            "max_value": b[3],
+            "first_time": b[4],
+            "first_value": b[5],
+            "last_time": b[6],
+            "last_value": b[7],
+        }
+        for key, b in buckets.items()
+    ]
+    table = models.MeasurementRollup
+    stmt = upsert_insert(db, table.__table__)
+    new = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source", "point_code", "granularity", "bucket_start", "measurement_type"],
+        set_={
+            "count": table.count + new.count,
+            "sum_value": table.sum_value + new.sum_value,
+            "min_value": case((new.min_value < table.min_value, new.min_value), else_=table.min_value),
+            "max_value": case((new.max_value > table.max_value, new.max_value), else_=table.max_value),
+            "first_time": case((new.first_time < table.first_time, new.first_time), else_=table.first_time),
+            "first_value": case((new.first_time < table.first_time, new.first_value), else_=table.first_value),
+            "last_time": case((new.last_time >= table.last_time, new.last_time), else_=table.last_time),
+            "last_value": case((new.last_time >= table.last_time, new.last_value), else_=table.last_value),
+        },
+    )
+    db.execute(stmt, rows)
+
+def apply_readings(db: Session, source: str, readings: Iterable[Reading]):
+    """新写入的读数累加进各粒度汇总，需与数据写入在同一事务内调用"""
+    buckets = _aggregate(source, readings)
+    if buckets:
+        _upsert(db, buckets)
+
+def _raw_filter(source: str, column: str, point_code: str, measurement_type: Optional[str]):
+    model, _ = SOURCES[source]
+    conditions = [model.point_code == point_code, getattr(model, column).isnot(None)]
+    if source == MEASUREMENTS and measurement_type is not None:
+        conditions.append(func.coalesce(model.measurement_type, "") == measurement_type)
+    return conditions
+
+def _value_columns(source: str, measurement_type: Optional[str]) -> List[str]:
+    _, value_columns = SOURCES[source]
+    return [column for mtype, column in value_columns if mtype is None or measurement_type is None or mtype == measurement_type]
+
+def refresh_readings(db: Session, source: str, readings: Iterable[Reading]):
+    """修改或删除数据后，按原始数据重新计算受影响的时间桶（最值与首尾值无法增量扣减）"""
+    db.flush()
+    model, _ = SOURCES[source]
+    affected = set()
+    for point_code, measurement_type, time, _value in readings:
+        if time is None:
+            continue
+        affected.add((point_code, measurement_type or "", bucket_start(time, GRANULARITIES[-1])))
+
+    for point_code, measurement_type, month_start in affected:
+        month_end = bucket_end(month_start, GRANULARITIES[-1])
+        table = models.MeasurementRollup
+        db.query(table).filter(
+            table.source == source,
+            table.point_code == point_code,
+            table.measurement_type == measurement_type,
+            table.bucket_start >= month_start,
+            table.bucket_start < month_end,
+        ).delete(synchronize_session=False)
+
+        for column in _value_columns(source, measurement_type):
+            rows = db.query(model.time, getattr(model, column)).filter(
+                *_raw_filter(source, column, point_code, measurement_type),
+                model.time >= month_start,
+                model.time < month_end,
+            ).all()
+            apply_readings(db, source, [(point_code, measurement_type, t, v) for t, v in rows])
+
+def rebuild(db: Session, chunk_size: int = 10000) -> int:
+    """清空并按原始数据重建全部汇总，用于已有数据库的回填"""
+    db.query(models.MeasurementRollup).delete(synchronize_session=False)
+    total = 0
+    for source, (model, value_columns) in SOURCES.items():
+        columns = [model.point_code, model.time] + [getattr(model, column) for _, column in value_columns]
+        if source == MEASUREMENTS:
+            columns.append(model.measurement_type)
+        pending = []
+        for item in db.query(*columns).yield_per(chunk_size):
+            pending.append(item)
+            if len(pending) >= chunk_size:
+                apply_readings(db, source, readings_of(source, pending))
+                total += len(pending)
+                pending = []
+        apply_readings(db, source, readings_of(source, pending))
+        total += len(pending)
+    db.commit()
+    return total
+
+def naive_utc(time: Optional[datetime]) -> Optional[datetime]:
+    """库中的时间不带时区（按 UTC 理解），带时区的查询参数先换算为 UTC 再去掉时区，否则无法与之比较"""
+    if time is None or time.tzinfo is None:
+        return time
+    return time.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _ceil(time: datetime, granularity: str) -> datetime:
+    start = bucket_start(time, granularity)
+    return start if start == time else bucket_end(start, granularity)
+
+def _cover(start: datetime, end: datetime, level: int) -> List[Tuple[Optional[str], datetime, datetime]]:
+    """把 [start, end) 拆成尽量粗的整桶区间，两端剩余部分落到原始数据上"""
+    if start >= end:
+        return []
+    if level < 0:
+        return [(None, start, end)]
+    granularity = GRANULARITIES[level]
+    first, last = _ceil(start, granularity), bucket_start(end, granularity)
+    if first >= last:
+        return _cover(start, end, level - 1)
+    return _cover(start, first, level - 1) + [(granularity, first, last)] + _cover(last, end, level - 1)
+
+def query_stats(
+    db: Session,
+    source: str,
+    point_code: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    measurement_type: Optional[str] = None,
+) -> Optional[dict]:
+    """统计 [start_time, end_time] 内的数据，返回 count/sum/min/max/earliest_time/latest_time，无数据时返回 None"""
+    table = models.MeasurementRollup
+    start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+    if start_time is None and end_time is None:
+        pieces = [(GRANULARITIES[-1], None, None)]
+    else:
+        start = start_time or datetime.min
+        # 接口的结束时间是闭区间
+        end = (end_time or datetime.max - timedelta(days=31)) + timedelta(microseconds=1)
+        pieces = _cover(start, end, len(GRANULARITIES) - 1)
+
+    parts = []
+    for granularity, lo, hi in pieces:
+        if granularity is not None:
+            query = db.query(
+                func.sum(table.count), func.sum(table.sum_value), func.min(table.min_value),
+                func.max(table.max_value), func.min(table.first_time), func.max(table.last_time),
+            ).filter(table.source == source, table.point_code == point_code, table.granularity == granularity)
+            if measurement_type is not None:
+                query = query.filter(table.measurement_type == measurement_type)
+            if lo is not None:
+                query = query.filter(table.bucket_start >= lo, table.bucket_start < hi)
+            parts.append(query.first())
+            continue
+
+        model, _ = SOURCES[source]
+        for column in _value_columns(source, measurement_type):
+            value = getattr(model, column)
+            parts.append(db.query(
+                func.count(value), func.sum(value), func.min(value),
+                func.max(value), func.min(model.time), func.max(model.time),
+            ).filter(
+                *_raw_filter(source, column, point_code, measurement_type),
+                model.time >= lo,
+                model.time < hi,
+            ).first())
+
+    parts = [p for p in parts if p and p[0]]
+    if not parts:
+        return None
+    return {
+        "count": sum(p[0] for p in parts),
+        "sum": sum(p[1] for p in parts),
+        "min": min(p[2] for p in parts),
+        "max": max(p[3] for p in parts),
+        "earliest_time": min(p[4] for p in parts),
+        "latest_time": max(p[5] for p in parts),
+    }
+
+def query_buckets(
+    db: Session,
+    source: str,
+    point_code: str,
+    granularity: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[models.MeasurementRollup]:
+    table = models.MeasurementRollup
+    start_time, end_time = naive_utc(start_time), naive_utc(end_time)
+    query = db.query(table).filter(
+        table.source == source,
+        table.point_code == point_code,
+        table.granularity == granularity,
+    )
+    if start_time is not None:
+        query = query.filter(table.bucket_start >= bucket_start(start_time, granularity))
+    if end_time is not None:
+        query = query.filter(table.bucket_start <= end_time)
+    return query.order_by(table.bucket_start, table.measurement_type).all()
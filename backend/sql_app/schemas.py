@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, field_validator
 import datetime
 from typing import List, Optional
 
@@ -48,6 +48,51 @@ class TokenData(BaseModel):
     username: Optional[str] = None
     role: Optional[str] = None
 
+class Principal(BaseModel):
+    """已验证的当前用户，由 auth.get_current_user 返回并按令牌缓存"""
+    id: int
+    username: str
+    email: str
+    role: str
+    is_active: bool
+    created_at: datetime.datetime
+    class Config:
+        from_attributes = True
+
+class HashPoolStats(BaseModel):
+    """密码哈希进程池的运行统计"""
+    workers: int
+    max_queue: int
+    in_flight: int
+    completed: int
+    rejected: int
+    queue_time_avg_ms: float
+    queue_time_max_ms: float
+
+class StatementStat(BaseModel):
+    """一个请求内重复执行的同一形状语句"""
+    statement: str
+    count: int
+    total_ms: float
+
+class SlowStatement(BaseModel):
+    statement: str
+    duration_ms: float
+
+class RequestProfileOut(BaseModel):
+    """一次被记录请求的 SQL 与耗时统计"""
+    method: str
+    path: str
+    query: str
+    status: Optional[int] = None
+    started_at: datetime.datetime
+    total_ms: float
+    db_ms: float
+    serialize_ms: float
+    statements: int
+    slowest: List[SlowStatement]
+    n_plus_one: List[StatementStat]
+
 class MeasurementCreate(BaseModel):
     point_code: str
     value: float
@@ -95,9 +140,44 @@ class MeasurementStats(BaseModel):
     latest_time: Optional[datetime.datetime] = None
     earliest_time: Optional[datetime.datetime] = None
 
+class MeasurementRollupOut(BaseModel):
+    point_code: str
+    measurement_type: Optional[str] = None
+    granularity: str
+    bucket_start: datetime.datetime
+    count: int
+    avg_value: float
+    min_value: float
+    max_value: float
+    first_value: float
+    last_value: float
+
 class MeasurementBatch(BaseModel):
     measurements: List[MeasurementCreate]
 
+class BatchResult(BaseModel):
+    inserted: int
+    skipped: int
+
+class IngestChunk(BaseModel):
+    chunk: int
+    last_line: int
+    inserted: int
+    rejected: int
+
+class RejectedLine(BaseModel):
+    line: int
+    error: str
+
+class IngestReport(BaseModel):
+    format: str
+    table: str
+    lines: int = 0
+    inserted: int = 0
+    rejected: int = 0
+    chunks: List[IngestChunk] = []
+    rejected_lines: List[RejectedLine] = []
+
 class MeasurementLatest(BaseModel):
     point_code: str
     point_name: str
@@ -118,6 +198,58 @@ class AlertInfo(BaseModel):
     threshold: float
     time: datetime.datetime
 
+SOURCE_PATTERN = "^(measurements|inverted_plumb|static_level|tension_line|water_level)$"
+
+class AlertRuleCreate(BaseModel):
+    """告警规则：上下限按回差解除，max_rate 为每小时变化量绝对值的上限"""
+    name: Optional[str] = None
+    source: str = Field("measurements", pattern=SOURCE_PATTERN)
+    point_code: str
+    measurement_type: Optional[str] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    max_rate: Optional[float] = Field(None, gt=0)
+    hysteresis: float = Field(0, ge=0)
+    enabled: bool = True
+
+class AlertRuleUpdate(BaseModel):
+    name: Optional[str] = None
+    measurement_type: Optional[str] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    max_rate: Optional[float] = Field(None, gt=0)
+    # 未传时不更新；不允许显式传 null
+    hysteresis: Optional[float] = Field(None, ge=0)
+    enabled: Optional[bool] = None
+
+    @field_validator("hysteresis", "enabled")
+    @classmethod
+    def not_null(cls, value):
+        # 默认值不经过校验，只有显式传 null 时才会到这里
+        if value is None:
+            raise ValueError("不能为 null")
+        return value
+
+class AlertRuleOut(AlertRuleCreate):
+    id: int
+    created_at: Optional[datetime.datetime] = None
+    class Config:
+        from_attributes = True
+
+class AlertEventOut(BaseModel):
+    id: int
+    rule_id: Optional[int] = None
+    source: str
+    point_code: str
+    measurement_type: Optional[str] = None
+    alert_type: str
+    value: Optional[float] = None
+    threshold: Optional[float] = None
+    time: datetime.datetime
+    cleared_at: Optional[datetime.datetime] = None
+    class Config:
+        from_attributes = True
+
 class MeasurementCompare(BaseModel):
     point_code: str
     point_name: str
@@ -133,6 +265,9 @@ class InvertedPlumbDataCreate(BaseModel):
     up_down_value: float
     time: Optional[datetime.datetime] = None
 
+class InvertedPlumbDataBatch(BaseModel):
+    data: List[InvertedPlumbDataCreate]
+
 class InvertedPlumbDataOut(BaseModel):
     id: int
     point_code: str
@@ -147,6 +282,9 @@ class StaticLevelDataCreate(BaseModel):
     value: float
     time: Optional[datetime.datetime] = None
 
+class StaticLevelDataBatch(BaseModel):
+    data: List[StaticLevelDataCreate]
+
 class StaticLevelDataOut(BaseModel):
     id: int
     point_code: str
@@ -160,6 +298,9 @@ class TensionLineDataCreate(BaseModel):
     value: float
     time: Optional[datetime.datetime] = None
 
+class TensionLineDataBatch(BaseModel):
+    data: List[TensionLineDataCreate]
+
 class TensionLineDataOut(BaseModel):
     id: int
     point_code: str
@@ -173,6 +314,9 @@ class WaterLevelDataCreate(BaseModel):
     value: float
     time: Optional[datetime.datetime] = None
 
+class WaterLevelDataBatch(BaseModel):
+    data: List[WaterLevelDataCreate]
+
 class WaterLevelDataOut(BaseModel):
     id: int
     point_code: str
@@ -0,0 +1,98 @@
+"""SQLite 单写入者：新增数据排队交给一个后台线程，每隔几毫秒把排队的写入合并为一个事务提交（group commit）。
+SQLite 同一时刻只允许一个写事务，各请求分别写入只会互相等锁甚至报 database is locked；
+合并后同一数据表的行一次 executemany 写入、每批只提交一次，WAL 模式下读连接不受写入阻塞"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+from . import config, crud, database, metrics
+
+class WriteQueue:
+    def __init__(self, interval: float, max_rows: int):
+        self.interval = interval
+        self.max_rows = max_rows
+        self._queue: "queue.Queue[Tuple[str, list, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, source: str, items: list) -> Future:
+        """排队写入一批数据，所在批次提交后 Future 得到写入的行（不存在的测点跳过）"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((source, items, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            rows = len(jobs[0][1])
+            # 第一条写入到达后再等待 interval，收集这段时间内排队的写入
+            deadline = time.monotonic() + self.interval
+            while rows < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                rows += len(job[1])
+            # 等待的请求已取消（如客户端断开）的写入不再执行；其余标记为执行中，之后不能再被取消，
+            # 否则 set_result 会抛出 InvalidStateError
+            jobs = [job for job in jobs if job[2].set_running_or_notify_cancel()]
+            if not jobs:
+                continue
+            try:
+                self._write(jobs)
+            except Exception as e:
+                # 异常都交给等待的请求，写入线程不能退出，否则之后的写入永远等不到结果
+                for _, _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _write(self, jobs: List[Tuple[str, list, Future]]):
+        try:
+            results = self._commit(jobs)
+        except Exception as e:
+            if len(jobs) == 1:
+                jobs[0][2].set_exception(e)
+                return
+            # 整批失败时逐个重写，一个请求的坏数据不影响同批的其他请求
+            for job in jobs:
+                self._write([job])
+            return
+        for (_, _, future), rows in zip(jobs, results):
+            future.set_result(rows)
+
+    def _commit(self, jobs: List[Tuple[str, list, Future]]) -> List[list]:
+        db = database.SessionLocal()
+        try:
+            return crud.bulk_create_many(db, [(source, items) for source, items, _ in jobs])
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+_write_queue = WriteQueue(config.SQLITE_WRITE_INTERVAL_MS / 1000, config.SQLITE_WRITE_MAX_ROWS)
+
+metrics.FunctionMetric("sqlite_write_queue_depth", "排队等待单写入者提交的写入批数", "gauge", lambda: _write_queue._queue.qsize())
+
+def enabled() -> bool:
+    """只有 SQLite 需要单写入者，PostgreSQL 各请求直接写入"""
+    return config.SQLITE_WRITE_QUEUE and database.engine.dialect.name == "sqlite"
+
+async def submit(source: str, items: list) -> list:
+    """排队写入并等待所在批次提交，返回写入的行"""
+    return await asyncio.wrap_future(_write_queue.submit(source, items))
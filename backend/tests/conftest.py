@@ -0,0 +1,46 @@
+"""测试使用临时目录中的 SQLite 数据库，须在导入 sql_app 之前设置环境变量"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+_tmp = tempfile.mkdtemp(prefix="water-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PROFILE_SAMPLE_RATE", "0")
+
+from sql_app import database, migrations  # noqa: E402
+
+# TestClient 不在 with 块中使用时不触发启动事件，迁移在这里执行
+migrations.migrate()
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    import main
+    return TestClient(main.app)
+
+@pytest.fixture(scope="session")
+def admin_headers():
+    from datetime import timedelta
+    from sql_app import auth, crud, schemas
+    session = database.SessionLocal()
+    try:
+        if not crud.get_user_by_username(session, username="admin"):
+            crud.create_user(session, schemas.UserCreate(username="admin", email="admin@example.com", password="admin123", role="admin"))
+    finally:
+        session.close()
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': 'admin'}, timedelta(hours=1))}"}
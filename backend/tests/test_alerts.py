@@ -0,0 +1,214 @@
+"""告警：回差状态机的触发、保持和解除，以及批量检测（NumPy）与逐条判断的结果一致"""
+import itertools
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from sql_app import alerts, crud, models, rollups, schemas
+
+T0 = datetime(2024, 6, 1)
+
+def rule(**fields) -> schemas.AlertRuleOut:
+    return schemas.AlertRuleOut(id=1, point_code="P", **fields)
+
+def run(rule_out, readings):
+    """依次判断 (小时数, 值)，返回每步触发的告警类型和解除的告警类型"""
+    state = models.AlertState(rule_id=1, measurement_type="", high_active=False, low_active=False, rate_active=False)
+    steps = []
+    for hours, value in readings:
+        fired, cleared = [], []
+        alerts._check(rule_out, state, T0 + timedelta(hours=hours), value, fired, cleared)
+        steps.append(([alert_type for alert_type, _, _ in fired], cleared))
+    return steps
+
+def test_upper_limit_fire_hold_clear():
+    steps = run(rule(max_value=10, hysteresis=1), [(0, 9), (1, 10), (2, 10.5), (3, 12), (4, 9.5), (5, 9.01), (6, 9), (7, 9.5), (8, 10.1)])
+    assert steps == [
+        ([], []),                       # 阈值以内
+        ([], []),                       # 等于上限不算超限
+        ([alerts.ABOVE_MAX], []),       # 触发
+        ([], []),                       # 保持，不重复触发
+        ([], []),                       # 回到阈值内但未超过回差，保持
+        ([], []),
+        ([], [alerts.ABOVE_MAX]),       # 回到 上限 - 回差 时解除
+        ([], []),
+        ([alerts.ABOVE_MAX], []),       # 再次超限重新触发
+    ]
+
+def test_lower_limit_fire_hold_clear():
+    steps = run(rule(min_value=0, hysteresis=0.5), [(0, 0), (1, -0.1), (2, -5), (3, 0.4), (4, 0.5), (5, -1)])
+    assert steps == [([], []), ([alerts.BELOW_MIN], []), ([], []), ([], []), ([], [alerts.BELOW_MIN]), ([alerts.BELOW_MIN], [])]
+
+def test_zero_hysteresis_clears_at_threshold():
+    steps = run(rule(max_value=10), [(0, 11), (1, 10), (2, 11)])
+    assert steps == [([alerts.ABOVE_MAX], []), ([], [alerts.ABOVE_MAX]), ([alerts.ABOVE_MAX], [])]
+
+def test_both_limits_are_independent():
+    steps = run(rule(min_value=0, max_value=10, hysteresis=1), [(0, 11), (1, -1), (2, 5), (3, -1)])
+    assert steps == [
+        ([alerts.ABOVE_MAX], []),
+        ([alerts.BELOW_MIN], [alerts.ABOVE_MAX]),
+        ([], [alerts.BELOW_MIN]),
+        ([alerts.BELOW_MIN], []),
+    ]
+
+def test_rate_of_change():
+    # 每小时变化超过 2 时告警，按相邻读数的时间间隔换算
+    steps = run(rule(max_rate=2), [(0, 0), (1, 1), (2, 4), (3, 5), (5, 9), (6, 9)])
+    assert steps == [([], []), ([], []), ([alerts.RATE], []), ([], [alerts.RATE]), ([], []), ([], [])]
+
+def test_rate_ignores_first_reading_and_same_time():
+    steps = run(rule(max_rate=1), [(0, 100), (0, 0)])
+    assert steps == [([], []), ([], [])]
+
+_point_codes = itertools.count(1)
+
+@pytest.fixture
+def alert_point(db):
+    code = f"ALERT{next(_point_codes)}"
+    crud.create_point(db, schemas.PointCreate(point_code=code, point_name=code, device_type="倒垂线", longitude=0, latitude=0, height=0))
+    rule_row = crud.create_alert_rule(db, schemas.AlertRuleCreate(point_code=code, measurement_type="左右岸", max_value=10, hysteresis=1))
+    yield code, rule_row.id
+    crud.delete_alert_rule(db, rule_row.id)
+
+def write(db, code, readings):
+    crud.bulk_create(db, rollups.MEASUREMENTS, [
+        schemas.MeasurementCreate(point_code=code, value=value, time=T0 + timedelta(hours=hours), measurement_type=measurement_type)
+        for hours, value, measurement_type in readings
+    ])
+
+def events(db, rule_id):
+    table = models.AlertEvent
+    return [
+        (event.alert_type, event.time, event.cleared_at)
+        for event in db.query(table).filter(table.rule_id == rule_id).order_by(table.time, table.id)
+    ]
+
+def test_events_across_batches(db, alert_point):
+    code, rule_id = alert_point
+    # 同一批内触发并解除，cleared_at 直接写入；另一种测量类型不受规则约束
+    write(db, code, [(0, 5, "左右岸"), (1, 11, "左右岸"), (2, 10.5, "左右岸"), (3, 8, "左右岸"), (4, 50, "上下游")])
+    assert events(db, rule_id) == [(alerts.ABOVE_MAX, T0 + timedelta(hours=1), T0 + timedelta(hours=3))]
+    # 本批触发，下一批才解除
+    write(db, code, [(5, 12, "左右岸")])
+    write(db, code, [(6, 9.5, "左右岸")])
+    assert events(db, rule_id)[-1] == (alerts.ABOVE_MAX, T0 + timedelta(hours=5), None)
+    # 补录早于上一个读数的历史数据不参与判断
+    write(db, code, [(4.5, 100, "左右岸")])
+    assert len(events(db, rule_id)) == 2
+    write(db, code, [(7, 9, "左右岸")])
+    assert events(db, rule_id)[-1] == (alerts.ABOVE_MAX, T0 + timedelta(hours=5), T0 + timedelta(hours=7))
+    # 读数的顺序不限，按时间顺序判断
+    write(db, code, [(10, 8, "左右岸"), (9, 20, "左右岸"), (8, 15, "左右岸")])
+    assert events(db, rule_id)[-1] == (alerts.ABOVE_MAX, T0 + timedelta(hours=8), T0 + timedelta(hours=10))
+
+def states(db, rule_id):
+    return db.query(models.AlertState).filter(models.AlertState.rule_id == rule_id).count()
+
+def test_disable_rule_clears_open_events(db, alert_point):
+    code, rule_id = alert_point
+    write(db, code, [(0, 12, "左右岸")])
+    assert events(db, rule_id)[-1][2] is None
+    # 只改名称不影响持续中的告警
+    crud.update_alert_rule(db, rule_id, {"name": "上限"})
+    assert events(db, rule_id)[-1][2] is None and states(db, rule_id) == 1
+
+    crud.update_alert_rule(db, rule_id, {"enabled": False})
+    assert events(db, rule_id)[-1][2] is not None
+    assert states(db, rule_id) == 0
+    # 重新启用后按新的第一个读数判断，仍超限时重新触发
+    crud.update_alert_rule(db, rule_id, {"enabled": True})
+    write(db, code, [(1, 12, "左右岸")])
+    assert [(alert_type, time, cleared_at is None) for alert_type, time, cleared_at in events(db, rule_id)][-1] == (
+        alerts.ABOVE_MAX, T0 + timedelta(hours=1), True
+    )
+
+def test_changing_limits_resets_state(db, alert_point):
+    code, rule_id = alert_point
+    write(db, code, [(0, 12, "左右岸")])
+    # 值不变的字段不算修改
+    crud.update_alert_rule(db, rule_id, {"max_value": 10, "hysteresis": 1})
+    assert events(db, rule_id)[-1][2] is None
+    crud.update_alert_rule(db, rule_id, {"max_value": 20})
+    assert events(db, rule_id)[-1][2] is not None
+    assert states(db, rule_id) == 0
+    # 按新的上限判断，不会因旧的告警状态而解除或保持
+    write(db, code, [(1, 15, "左右岸"), (2, 21, "左右岸")])
+    assert events(db, rule_id)[-1] == (alerts.ABOVE_MAX, T0 + timedelta(hours=2), None)
+
+def test_update_rejects_explicit_null():
+    assert schemas.AlertRuleUpdate(max_value=None).model_dump(exclude_unset=True) == {"max_value": None}
+    assert schemas.AlertRuleUpdate().model_dump(exclude_unset=True) == {}
+    for field in ("hysteresis", "enabled"):
+        with pytest.raises(ValueError):
+            schemas.AlertRuleUpdate(**{field: None})
+
+# ---- 批量检测与逐条判断 ----
+
+def scalar_check(alert_config, index, value, time):
+    result = []
+    if alert_config.max_value is not None and value > alert_config.max_value:
+        result.append((index, alerts.ABOVE_MAX, value, alert_config.max_value, time))
+    if alert_config.min_value is not None and value < alert_config.min_value:
+        result.append((index, alerts.BELOW_MIN, value, alert_config.min_value, time))
+    return result
+
+def scalar_latest(configs, latest_values):
+    result = []
+    for i, alert_config in enumerate(configs):
+        current = latest_values.get(alert_config.point_code)
+        if alert_config.alert_enabled and current is not None and current[0] is not None:
+            result.extend(scalar_check(alert_config, i, current[0], current[1]))
+    return result
+
+def scalar_window(configs, point_codes, values, times):
+    readings = sorted(zip(times, range(len(times)), point_codes, values))
+    result = []
+    for i, alert_config in enumerate(configs):
+        if not alert_config.alert_enabled:
+            continue
+        for time, _, code, value in readings:
+            if code == alert_config.point_code:
+                result.extend(scalar_check(alert_config, i, value, time))
+    return result
+
+def random_configs(rng, codes, count):
+    configs = []
+    for _ in range(count):
+        low = rng.choice([None, round(rng.uniform(-10, 0), 1)])
+        high = rng.choice([None, round(rng.uniform(0, 10), 1)])
+        configs.append(schemas.AlertConfig(point_code=rng.choice(codes), min_value=low, max_value=high, alert_enabled=rng.random() > 0.2))
+    return configs
+
+@pytest.mark.parametrize("seed", range(20))
+def test_check_latest_matches_scalar(seed):
+    rng = random.Random(seed)
+    codes = [f"P{i}" for i in range(rng.randint(1, 30))]
+    configs = random_configs(rng, codes + ["MISSING"], rng.randint(0, 60))
+    latest_values = {
+        code: (rng.choice([None, round(rng.uniform(-15, 15), 1), 0.0, 10.0, -10.0]), T0 + timedelta(minutes=i))
+        for i, code in enumerate(codes)
+    }
+    assert alerts.check_latest(configs, latest_values) == scalar_latest(configs, latest_values)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_check_window_matches_scalar(seed):
+    rng = random.Random(seed)
+    codes = [f"P{i}" for i in range(rng.randint(1, 10))]
+    configs = random_configs(rng, codes + ["MISSING"], rng.randint(0, 30))
+    count = rng.randint(0, 300)
+    point_codes = [rng.choice(codes) for _ in range(count)]
+    values = [round(rng.uniform(-15, 15), 1) for _ in range(count)]
+    # 时间互不相同，逐条判断的排序才与批量检测一致
+    times = [T0 + timedelta(minutes=i) for i in rng.sample(range(10 * count + 1), count)]
+    assert alerts.check_window(configs, point_codes, values, times) == scalar_window(configs, point_codes, values, times)
+
+def test_window_bounds():
+    configs = [
+        schemas.AlertConfig(point_code="A", min_value=-5, max_value=8),
+        schemas.AlertConfig(point_code="B", min_value=-2),
+        schemas.AlertConfig(point_code="C", max_value=3, alert_enabled=False),
+    ]
+    assert alerts.window_bounds(configs) == (8.0, -2.0)
+    assert alerts.window_bounds([schemas.AlertConfig(point_code="A")]) == (None, None)
@@ -0,0 +1,77 @@
+"""Accept 协商：未安装 pyarrow 时只接受 Arrow 的请求返回 406，其余请求照常协商"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from sql_app import columnar, crud, database, rollups, schemas
+
+def request(accept):
+    headers = [] if accept is None else [(b"accept", accept.encode("latin-1"))]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+@pytest.fixture
+def no_arrow(monkeypatch):
+    monkeypatch.setattr(columnar, "_ARROW", False)
+
+@pytest.fixture(scope="module")
+def arrow_point():
+    with database.SessionLocal() as db:
+        crud.create_point(db, schemas.PointCreate(point_code="ARW1", point_name="ARW1", device_type="倒垂线", longitude=0, latitude=0, height=0))
+        crud.bulk_create(db, rollups.MEASUREMENTS, [
+            schemas.MeasurementCreate(point_code="ARW1", value=i, time=datetime(2024, 7, 1) + timedelta(hours=i), measurement_type="左右岸")
+            for i in range(5)
+        ])
+    return "ARW1"
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, columnar.JSON),
+    ("*/*", columnar.JSON),
+    ("text/html", columnar.JSON),
+    (columnar.COLUMNAR_JSON, columnar.COLUMNAR_JSON),
+    (f"{columnar.ARROW_STREAM}, {columnar.COLUMNAR_JSON};q=0.5", columnar.ARROW_STREAM),
+    (f"{columnar.JSON};q=0.2, {columnar.COLUMNAR_JSON};q=0.9", columnar.COLUMNAR_JSON),
+])
+def test_negotiate(accept, expected):
+    assert columnar.negotiate(request(accept)) == expected
+
+@pytest.mark.parametrize("accept, expected", [
+    (f"{columnar.ARROW_STREAM}, {columnar.COLUMNAR_JSON};q=0.5", columnar.COLUMNAR_JSON),
+    (f"{columnar.ARROW_STREAM}, */*;q=0.1", columnar.JSON),
+    (f"{columnar.ARROW_STREAM};q=0, {columnar.COLUMNAR_JSON}", columnar.COLUMNAR_JSON),
+])
+def test_negotiate_without_arrow_falls_back_to_acceptable(no_arrow, accept, expected):
+    assert columnar.negotiate(request(accept)) == expected
+
+@pytest.mark.parametrize("accept", [
+    columnar.ARROW_STREAM,
+    f"{columnar.ARROW_STREAM};q=0.8",
+    f"{columnar.ARROW_STREAM}, {columnar.JSON};q=0",
+])
+def test_negotiate_without_arrow_only_arrow_is_406(no_arrow, accept):
+    with pytest.raises(HTTPException) as raised:
+        columnar.negotiate(request(accept))
+    assert raised.value.status_code == 406
+
+@pytest.mark.parametrize("path", ["/measurements/ARW1", "/measurements/ARW1/range?start_time=2024-07-01T00:00:00&end_time=2024-07-02T00:00:00"])
+def test_arrow_request_without_pyarrow_returns_406(client, admin_headers, arrow_point, no_arrow, path):
+    response = client.get(path, headers={**admin_headers, "Accept": columnar.ARROW_STREAM})
+    assert response.status_code == 406
+    assert "pyarrow" in response.json()["detail"]
+
+    fallback = client.get(path, headers={**admin_headers, "Accept": f"{columnar.ARROW_STREAM}, {columnar.COLUMNAR_JSON};q=0.5"})
+    assert fallback.status_code == 200
+    assert fallback.headers["content-type"] == columnar.COLUMNAR_JSON
+    assert fallback.json()["values"] == [0, 1, 2, 3, 4]
+
+def test_arrow_response_with_pyarrow(client, admin_headers, arrow_point):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    response = client.get("/measurements/ARW1", headers={**admin_headers, "Accept": columnar.ARROW_STREAM})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == columnar.ARROW_STREAM
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.column("value").to_pylist() == [0, 1, 2, 3, 4]
+    assert table.schema.metadata[b"point_code"] == b"ARW1"
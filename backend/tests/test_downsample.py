@@ -0,0 +1,40 @@
+"""降采样：返回行数不超过 max_points，空值行的处理与是否实际降采样无关"""
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+
+from sql_app.downsample import DOWNSAMPLE_METHODS, downsample_rows
+
+Row = namedtuple("Row", "time value")
+T0 = datetime(2024, 7, 1)
+
+def rows(values) -> list:
+    return [Row(T0 + timedelta(minutes=i), value) for i, value in enumerate(values)]
+
+@pytest.mark.parametrize("method", DOWNSAMPLE_METHODS)
+@pytest.mark.parametrize("max_points", [1, 2, 3, 4, 5, 7, 8, 50])
+def test_never_exceeds_max_points(method, max_points):
+    data = rows([math.sin(i / 5) * 10 for i in range(200)])
+    result = downsample_rows(data, max_points, method)
+    assert 0 < len(result) <= max_points
+    # 保留的是原始行，按时间升序
+    assert all(row in data for row in result)
+    assert [row.time for row in result] == sorted(row.time for row in result)
+
+@pytest.mark.parametrize("max_points", [2, 3])
+def test_small_max_points_keeps_first_and_last(max_points):
+    data = rows(range(100))
+    for method in DOWNSAMPLE_METHODS:
+        result = downsample_rows(data, max_points, method)
+        assert result[0] == data[0] and result[-1] == data[-1]
+
+@pytest.mark.parametrize("method", DOWNSAMPLE_METHODS)
+def test_nulls_dropped_whether_or_not_downsampled(method):
+    data = rows([1, None, 2, float("nan"), 3])
+    # 有效行数不超过 max_points 时不降采样，空值行同样不返回
+    assert downsample_rows(data, 10, method) == [data[0], data[2], data[4]]
+    assert all(row.value is not None and not math.isnan(row.value) for row in downsample_rows(data * 20, 8, method))
+    # 不指定 max_points 时原样返回
+    assert downsample_rows(data, None, method) is data
@@ -0,0 +1,47 @@
+"""Excel 导入：仪器数据同时写入 measurements 表，重复导入不产生重复数据"""
+from datetime import datetime, timedelta
+
+import openpyxl
+
+from sql_app import database, models
+import import_excel
+
+def write_workbook(path, rows: int):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "倒垂线"
+    ws.append(["序号", "观测时间", "IP901左右岸", "IP901上下游"])
+    for i in range(rows):
+        ws.append([i + 1, datetime(2024, 3, 1) + timedelta(days=i), i * 0.1, None if i % 5 == 0 else i * 0.2])
+    wb.save(path)
+
+def count(model, **filters) -> int:
+    with database.SessionLocal() as db:
+        return db.query(model).filter_by(**filters).count()
+
+def test_import_feeds_measurements(tmp_path):
+    path = str(tmp_path / "倒垂线.xlsx")
+    write_workbook(path, 20)
+    import_excel.import_workbooks([path], workers=1, chunk_size=7)
+    assert count(models.InvertedPlumbData, point_code="IP901") == 20
+    assert count(models.Measurement, point_code="IP901", measurement_type="左右岸") == 20
+    # 每 5 行有一行缺上下游读数
+    assert count(models.Measurement, point_code="IP901", measurement_type="上下游") == 16
+    with database.SessionLocal() as db:
+        bases = {row.base_point_code for row in db.query(models.Measurement).filter_by(point_code="IP901")}
+    assert bases == {"IP901"}
+
+    # 重复导入不产生重复数据
+    import_excel.import_workbooks([path], workers=1, chunk_size=7)
+    assert count(models.InvertedPlumbData, point_code="IP901") == 20
+    assert count(models.Measurement, point_code="IP901") == 36
+
+def test_imported_data_visible_through_measurement_endpoints(tmp_path, client, admin_headers):
+    path = str(tmp_path / "倒垂线.xlsx")
+    write_workbook(path, 20)
+    import_excel.import_workbooks([path], workers=1, chunk_size=7)
+    stats = client.get("/measurements/IP901/stats", headers=admin_headers)
+    assert stats.status_code == 200
+    assert stats.json()["count"] == 36
+    history = client.get("/measurements/IP901", params={"limit": 100}, headers=admin_headers)
+    assert len(history.json()) == 36
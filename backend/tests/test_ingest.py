@@ -0,0 +1,61 @@
+"""流式导入：按块到达的请求体切分成行，超长的行整行拒绝且不缓存"""
+import asyncio
+import random
+
+import pytest
+
+from sql_app import config, crud, ingest, schemas
+
+def split(data: bytes, sizes) -> list:
+    chunks, start = [], 0
+    for size in sizes:
+        chunks.append(data[start:start + size])
+        start += size
+    return chunks + [data[start:]] if start < len(data) else chunks
+
+def lines(chunks, max_line_bytes=1000) -> list:
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [item async for item in ingest.iter_lines(stream(), max_line_bytes)]
+    return asyncio.run(collect())
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunking_does_not_change_lines(seed):
+    rng = random.Random(seed)
+    data = b"".join(rng.choice([b"a", b"bc", b"\n", b"\r\n", b"xyz"]) for _ in range(rng.randint(0, 200)))
+    expected = [line.rstrip(b"\r") for line in data.split(b"\n")]
+    if expected and expected[-1] == b"":
+        expected.pop()
+    chunks = split(data, [rng.randint(0, 7) for _ in range(100)])
+    assert lines(chunks) == list(enumerate(expected, 1))
+
+def test_long_lines_are_dropped():
+    data = b"ok\n" + b"x" * 25 + b"\nabcdefghij\n" + b"y" * 11
+    # 超长的行无论在一个块内还是跨多个块都返回 None，之后的行不受影响
+    for sizes in ([len(data)], [1] * len(data), [5, 30, 2]):
+        assert lines(split(data, sizes), max_line_bytes=10) == [(1, b"ok"), (2, None), (3, b"abcdefghij"), (4, None)]
+
+@pytest.fixture
+def ingest_point(db):
+    crud.create_point(db, schemas.PointCreate(point_code="ING1", point_name="ING1", device_type="倒垂线", longitude=0, latitude=0, height=0))
+    return "ING1"
+
+def test_long_line_rejected_by_endpoint(client, admin_headers, ingest_point, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_MAX_LINE_BYTES", 200)
+    row = '{"point_code": "ING1", "value": %d, "time": "2024-09-01T0%d:00:00", "measurement_type": "左右岸"}'
+    body = "\n".join([row % (1, 1), '{"point_code": "' + "P" * 300 + '"}', row % (2, 2)])
+    response = client.post("/ingest/stream", content=body.encode(), headers=admin_headers)
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["lines"], report["inserted"], report["rejected"]) == (3, 2, 1)
+    assert report["rejected_lines"] == [{"line": 2, "error": "行长度超过 200 字节"}]
+    assert report["chunks"][0]["rejected"] == 1
+
+def test_long_csv_header_stops_import(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_MAX_LINE_BYTES", 20)
+    body = "point_code,value,time,measurement_type\nING1,1,2024-09-01T00:00:00,左右岸\n"
+    report = client.post("/ingest/stream", params={"format": "csv"}, content=body.encode(), headers=admin_headers).json()
+    assert (report["lines"], report["inserted"], report["rejected"]) == (1, 0, 1)
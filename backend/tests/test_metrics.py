@@ -0,0 +1,58 @@
+"""/metrics 访问限制：默认只允许本机，其他来源需在允许列表中或带 METRICS_TOKEN"""
+import pytest
+
+from sql_app import config, metrics
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(config, "METRICS_TOKEN", "scrape-secret")
+    return "scrape-secret"
+
+@pytest.mark.parametrize("host, expected", [
+    ("127.0.0.1", True),
+    ("::1", True),
+    ("::ffff:127.0.0.1", True),
+    ("10.0.0.5", False),
+    ("203.0.113.9", False),
+    ("testclient", False),
+    ("", False),
+    (None, False),
+])
+def test_default_allow_list(host, expected):
+    assert metrics.client_allowed(host) is expected
+
+def test_allow_list_networks(monkeypatch):
+    monkeypatch.setattr(metrics, "ALLOWED_NETWORKS", metrics.parse_networks(" 10.0.0.0/8, 192.168.1.7 ,"))
+    assert metrics.client_allowed("10.200.3.4")
+    assert metrics.client_allowed("192.168.1.7")
+    assert not metrics.client_allowed("192.168.1.8")
+    assert not metrics.client_allowed("127.0.0.1")
+
+def test_invalid_allow_list_fails_loudly():
+    with pytest.raises(ValueError):
+        metrics.parse_networks("127.0.0.1,localhost")
+
+def test_remote_client_is_forbidden(client):
+    # TestClient 的来源地址为 "testclient"，不在允许列表中；伪造的 X-Forwarded-For 不起作用
+    response = client.get("/metrics", headers={"X-Forwarded-For": "127.0.0.1"})
+    assert response.status_code == 403
+    assert "http_requests_total" not in response.text
+
+def test_user_token_is_not_a_metrics_token(client, admin_headers, token):
+    assert client.get("/metrics", headers=admin_headers).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/metrics", headers={"Authorization": f"Basic {token}"}).status_code == 403
+
+def test_token_grants_access(client, token):
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_requests_total counter" in response.text
+
+def test_allowed_client_address(client, monkeypatch):
+    monkeypatch.setattr(metrics, "client_allowed", lambda host: host == "testclient")
+    assert client.get("/metrics").status_code == 200
+
+def test_disabled(client, token, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_ENABLED", False)
+    assert client.get("/metrics", headers={"Authorization": f"Bearer {token}"}).status_code == 404
@@ -0,0 +1,121 @@
+"""数据库迁移：导入 main 不再修改数据库结构，多个进程同时迁移由迁移锁串行执行，升级时新建的汇总表和最新值表按原始数据回填"""
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from conftest import BACKEND
+from sql_app import latest, migrations, models, rollups
+
+def run_python(code: str, db_path: str, **env) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=BACKEND,
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", **env},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+
+def finish(process: subprocess.Popen) -> str:
+    output = process.communicate(timeout=120)[0].decode("utf-8", "replace")
+    assert process.returncode == 0, output
+    return output
+
+def tables(db_path: str) -> set:
+    with sqlite3.connect(db_path) as conn:
+        return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def columns(db_path: str, table: str) -> list:
+    with sqlite3.connect(db_path) as conn:
+        return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def test_importing_main_does_not_migrate(tmp_path):
+    db_path = str(tmp_path / "import.db")
+    finish(run_python("import main", db_path))
+    assert not tables(db_path) & {"measurements", "monitor_points", "users"}
+
+def test_startup_migrates_when_enabled(tmp_path):
+    db_path = str(tmp_path / "startup.db")
+    code = "from fastapi.testclient import TestClient\nimport main\nwith TestClient(main.app): pass"
+    finish(run_python(code, db_path, AUTO_MIGRATE="false"))
+    assert "measurements" not in tables(db_path)
+    finish(run_python(code, db_path, AUTO_MIGRATE="true"))
+    assert "measurements" in tables(db_path)
+
+def test_concurrent_migrations(tmp_path):
+    db_path = str(tmp_path / "concurrent.db")
+    migrate = "from sql_app import migrations; print(migrations.migrate())"
+    # 新数据库：多个进程同时建表
+    for output in map(finish, [run_python(migrate, db_path) for _ in range(6)]):
+        assert "Traceback" not in output
+    assert {"measurements", "measurement_rollups", "alert_events"} <= tables(db_path)
+
+    # 旧数据库缺少 base_point_code：只有一个进程补加该列并回填，其余进程看到的已是最新结构
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO monitor_points (point_code, point_name, device_type, longitude, latitude, height) VALUES ('IP1', 'IP1', '倒垂线', 0, 0, 0)")
+        conn.execute("INSERT INTO measurements (point_code, value, time, measurement_type) VALUES ('IP1左右岸', 1.0, '2024-01-01 00:00:00.000000', '左右岸')")
+        conn.execute("DROP INDEX ix_measurements_base_point_code_time")
+        conn.execute("ALTER TABLE measurements DROP COLUMN base_point_code")
+    outputs = [finish(process) for process in [run_python(migrate, db_path) for _ in range(6)]]
+    assert sum("measurements.base_point_code" in output for output in outputs) == 1
+    assert columns(db_path, "measurements").count("base_point_code") == 1
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT base_point_code FROM measurements").fetchall() == [("IP1",)]
+        assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'ix_measurements_base_point_code_time'").fetchone()
+
+def old_database(tmp_path, dropped: str):
+    """已有数据的旧数据库：先按当前结构建表并写入原始数据，再删掉升级时才新增的表"""
+    db_path = str(tmp_path / "upgrade.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    migrations.migrate(engine)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO monitor_points (point_code, point_name, device_type, longitude, latitude, height) VALUES ('IP1', 'IP1', '倒垂线', 0, 0, 0)")
+        conn.executemany(
+            "INSERT INTO measurements (point_code, value, time, measurement_type) VALUES (?, ?, ?, ?)",
+            [("IP1左右岸", i * 0.5, f"2024-01-{1 + i % 28:02d} {i % 24:02d}:00:00.000000", "左右岸") for i in range(100)]
+            + [("IP1上下游", -i, f"2024-02-01 {i:02d}:00:00.000000", "上下游") for i in range(10)],
+        )
+        conn.executemany(
+            "INSERT INTO inverted_plumb_data (point_code, left_right_value, up_down_value, time) VALUES (?, ?, ?, ?)",
+            [("IP1", i, -i, f"2024-03-01 {i:02d}:00:00.000000") for i in range(5)],
+        )
+        conn.execute(f"DROP TABLE {dropped}")
+    return engine
+
+def test_upgrade_backfills_rollups(tmp_path):
+    engine = old_database(tmp_path, "measurement_rollups")
+    result = migrations.migrate(engine)
+    assert result["backfilled"] == ["measurement_rollups"]
+    with Session(engine) as db:
+        stats = rollups.query_stats(db, rollups.MEASUREMENTS, "IP1左右岸")
+        assert (stats["count"], stats["min"], stats["max"]) == (100, 0.0, 49.5)
+        ranged = rollups.query_stats(db, rollups.MEASUREMENTS, "IP1上下游", datetime(2024, 2, 1, 3), datetime(2024, 2, 1, 5))
+        assert (ranged["count"], ranged["min"], ranged["max"]) == (3, -5, -3)
+        assert rollups.query_stats(db, rollups.INVERTED_PLUMB, "IP1")["count"] == 10
+    # 汇总表已存在时不再重建
+    assert migrations.migrate(engine)["backfilled"] == []
+
+def test_upgrade_backfills_point_latest(tmp_path):
+    engine = old_database(tmp_path, "point_latest")
+    with sqlite3.connect(engine.url.database) as conn:
+        # 同一时刻的两行取 id 较大的一行
+        conn.execute("INSERT INTO inverted_plumb_data (point_code, left_right_value, up_down_value, time) VALUES ('IP1', 40, -40, '2024-03-01 04:00:00.000000')")
+    result = migrations.migrate(engine)
+    assert result["backfilled"] == ["point_latest"]
+    with Session(engine) as db:
+        rows = {(row.source, row.measurement_type): (row.time, row.value) for row in db.query(models.PointLatest)}
+        assert rows == {
+            (rollups.MEASUREMENTS, "左右岸"): (datetime(2024, 1, 28, 11), 41.5),
+            (rollups.MEASUREMENTS, "上下游"): (datetime(2024, 2, 1, 9), -9),
+            (rollups.INVERTED_PLUMB, ""): (datetime(2024, 3, 1, 4), 40),
+        }
+        assert latest.get_values(db, rollups.MEASUREMENTS, ["IP1左右岸", "IP1上下游"]) == {
+            "IP1左右岸": (41.5, datetime(2024, 1, 28, 11)),
+            "IP1上下游": (-9, datetime(2024, 2, 1, 9)),
+        }
+        assert latest.get_row(db, rollups.INVERTED_PLUMB, "IP1").left_right_value == 40
+    assert migrations.migrate(engine)["backfilled"] == []
@@ -0,0 +1,94 @@
+"""游标分页：按 X-Next-Cursor 逐页读取既不漏行也不重复，无效游标返回 400"""
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from sql_app import crud, database, pagination, rollups, schemas
+
+START = datetime(2024, 5, 1)
+
+def token(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+GARBAGE = [
+    "not-a-cursor!",
+    "%%%",
+    token("not json"),
+    token("{}"),
+    token("[]"),
+    token('["2024-01-01T00:00:00"]'),
+    token('["2024-01-01T00:00:00", 1, 2]'),
+    token('["yesterday", 1]'),
+    token('[1, 1]'),
+    token('[true, 1]'),
+    token('["2024-01-01T00:00:00", "abc"]'),
+    token('["2024-01-01T00:00:00", 1.5]'),
+    token('["2024-01-01T00:00:00", true]'),
+    token('["2024-01-01T00:00:00", 1e400]'),
+    token('["2024-01-01T00:00:00", 100000000000000000000000000000]'),
+    token('["2024-01-01T00:00:00+08:00", 1]'),
+    token("[" * 5000 + "]" * 5000),
+    base64.urlsafe_b64encode(b"\xff\xfe\xfd").decode("ascii"),
+]
+
+@pytest.fixture(scope="module")
+def duplicate_times():
+    """同一测点 23 条数据，每 5 条共用一个时刻；measurements 表和倒垂线数据表各一份"""
+    with database.SessionLocal() as db:
+        for code in ("PAGE1", "IP950"):
+            crud.create_point(db, schemas.PointCreate(point_code=code, point_name=code, device_type="倒垂线", longitude=0, latitude=0, height=0))
+        crud.bulk_create(db, rollups.MEASUREMENTS, [
+            schemas.MeasurementCreate(point_code="PAGE1", value=i, time=START + timedelta(hours=i // 5), measurement_type="左右岸")
+            for i in range(23)
+        ])
+        crud.bulk_create(db, rollups.INVERTED_PLUMB, [
+            schemas.InvertedPlumbDataCreate(point_code="IP950", left_right_value=i, up_down_value=-i, time=START + timedelta(hours=i // 5))
+            for i in range(23)
+        ])
+    return 23
+
+# 按时间倒序分页的接口：(路径, 查询参数)
+TIME_PAGED = [
+    ("/measurements/search", {"point_name": "PAGE1"}),
+    ("/inverted-plumb/IP950", {}),
+]
+
+def read_all(client, headers, path: str, query: dict, limit: int) -> list:
+    rows, cursor = [], None
+    for _ in range(100):
+        params = {**query, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= limit
+        rows.extend(page)
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return rows
+    raise AssertionError("分页没有结束")
+
+@pytest.mark.parametrize("path, query", TIME_PAGED)
+@pytest.mark.parametrize("limit", [1, 2, 4, 5, 7, 23, 100])
+def test_pages_have_no_gaps_or_duplicates(client, admin_headers, duplicate_times, path, query, limit):
+    rows = read_all(client, admin_headers, path, query, limit)
+    everything = client.get(path, params={**query, "limit": 1000}, headers=admin_headers).json()
+    assert len(everything) == duplicate_times
+    assert len({row["id"] for row in rows}) == len(rows)
+    assert [row["id"] for row in rows] == [row["id"] for row in everything]
+    # 按 (time, id) 倒序
+    keys = [(row["time"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+@pytest.mark.parametrize("cursor", GARBAGE, ids=range(len(GARBAGE)))
+@pytest.mark.parametrize("path", ["/measurements/search", "/inverted-plumb/IP950", "/static-level/TC1-1", "/alerts", "/auth/users"])
+def test_invalid_cursor_is_rejected(client, admin_headers, duplicate_times, path, cursor):
+    response = client.get(path, params={"cursor": cursor}, headers=admin_headers)
+    assert response.status_code == 400, response.text
+
+def test_cursor_round_trip():
+    time = datetime(2024, 5, 1, 8, 30, 15, 123456)
+    assert pagination.decode_cursor(pagination.encode_cursor(time, 42)) == (time, 42)
+    assert pagination.decode_cursor(pagination.encode_cursor(None, 7)) == (None, 7)
@@ -0,0 +1,85 @@
+"""请求剖析：直接返回 Response 的路由也记录序列化耗时；X-Profile 强制剖析只对管理员生效"""
+from datetime import datetime, timedelta
+
+import fastapi.routing
+import pytest
+
+from sql_app import auth, columnar, crud, database, profiling, rollups, schemas
+
+@pytest.fixture(scope="module")
+def profiled_point():
+    with database.SessionLocal() as db:
+        for code in ("PROF1", "IP960"):
+            crud.create_point(db, schemas.PointCreate(point_code=code, point_name=code, device_type="倒垂线", longitude=0, latitude=0, height=0))
+        start = datetime(2024, 7, 1)
+        crud.bulk_create(db, rollups.MEASUREMENTS, [
+            schemas.MeasurementCreate(point_code="PROF1", value=i, time=start + timedelta(minutes=i), measurement_type="左右岸")
+            for i in range(3000)
+        ])
+        crud.bulk_create(db, rollups.INVERTED_PLUMB, [
+            schemas.InvertedPlumbDataCreate(point_code="IP960", left_right_value=i, up_down_value=-i, time=start + timedelta(minutes=i))
+            for i in range(3000)
+        ])
+
+def profile_of(client, headers, path: str, params: dict, accept: str = columnar.JSON) -> dict:
+    profiling.recent.clear()
+    response = client.get(path, params=params, headers={**headers, "X-Profile": "1", "Accept": accept})
+    assert response.status_code == 200, response.text
+    assert "serialize;dur=" in response.headers["Server-Timing"]
+    return client.get("/debug/requests", params={"limit": 1}, headers=headers).json()[0]
+
+RANGE = {"start_time": "2024-07-01T00:00:00", "end_time": "2024-07-03T00:00:00"}
+
+@pytest.mark.parametrize("path, params, accept", [
+    ("/measurements/PROF1", {}, columnar.JSON),
+    ("/measurements/PROF1", {}, columnar.COLUMNAR_JSON),
+    ("/measurements/PROF1/range", RANGE, columnar.JSON),
+    ("/measurements/PROF1/range", RANGE, columnar.COLUMNAR_JSON),
+    ("/measurements/search", {"point_name": "PROF1", "limit": 3000}, columnar.JSON),
+    ("/inverted-plumb/IP960", {"limit": 3000}, columnar.JSON),
+    ("/inverted-plumb/IP960", {"limit": 3000}, columnar.COLUMNAR_JSON),
+])
+def test_direct_response_routes_record_serialize_time(client, admin_headers, profiled_point, path, params, accept):
+    profile = profile_of(client, admin_headers, path, params, accept)
+    assert profile["path"] == path
+    assert profile["serialize_ms"] > 0
+
+def test_response_model_routes_still_timed(client, admin_headers, profiled_point):
+    profile = profile_of(client, admin_headers, "/measurements/PROF1/stats", {})
+    assert profile["serialize_ms"] > 0
+
+def test_serialize_response_patch_is_installed():
+    assert fastapi.routing.serialize_response is profiling._timed_serialize_response
+    assert profiling._uses_global(fastapi.routing.get_request_handler, "serialize_response")
+    assert not profiling._uses_global(fastapi.routing.get_request_handler, "no_such_function")
+
+@pytest.fixture(scope="module")
+def viewer_headers():
+    with database.SessionLocal() as db:
+        crud.create_user(db, schemas.UserCreate(username="prof_viewer", email="prof_viewer@example.com", password="viewer123"))
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': 'prof_viewer'}, timedelta(hours=1))}"}
+
+@pytest.mark.parametrize("path, headers", [
+    ("/", {}),
+    ("/measurements/PROF1/stats", {}),
+    ("/measurements/PROF1/stats", {"Authorization": "Bearer not-a-token"}),
+])
+def test_anonymous_forced_request_is_not_profiled(client, admin_headers, profiled_point, path, headers):
+    profiling.recent.clear()
+    response = client.get(path, headers={**headers, "X-Profile": "1"})
+    assert "Server-Timing" not in response.headers
+    assert client.get("/debug/requests", headers=admin_headers).json() == []
+
+def test_non_admin_forced_request_is_not_profiled(client, admin_headers, viewer_headers, profiled_point):
+    profiling.recent.clear()
+    response = client.get("/measurements/PROF1/stats", headers={**viewer_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+    assert client.get("/debug/requests", headers=admin_headers).json() == []
+
+def test_allow_force_honours_anonymous_header(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(profiling.config, "PROFILE_ALLOW_FORCE", True)
+    profiling.recent.clear()
+    response = client.get("/", headers={"X-Profile": "1"})
+    assert "total;dur=" in response.headers["Server-Timing"]
+    assert [item["path"] for item in client.get("/debug/requests", headers=admin_headers).json()] == ["/"]
@@ -0,0 +1,238 @@
+"""查询计划回归：调用 main.py / crud.py 中的每个接口和函数，对其发出的每条查询执行 EXPLAIN QUERY PLAN，
+不允许出现全表扫描（SCAN 真实数据表且未使用索引）或临时排序（USE TEMP B-TREE）"""
+import asyncio
+import inspect
+import re
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import event
+
+import main
+from sql_app import async_crud, columnar, crud, data_versions, database, models, pagination, point_cache, rollups, schemas
+
+# 整表读取属于设计如此的小表（测点列表、用户列表）
+ALLOWED_FULL_SCANS = {"monitor_points", "users", "data_versions", "alert_rules"}
+
+SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+
+T1, T2 = datetime(2024, 1, 3, 5, 30), datetime(2024, 2, 17, 11, 0)
+CURSOR = pagination.encode_cursor(T2, 100)
+
+def problems_in(plan_rows) -> list:
+    problems = []
+    for row in plan_rows:
+        detail = row[-1]
+        if "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+            continue
+        match = SCAN_RE.match(detail)
+        # 只关心真实数据表，子查询物化结果（如 GROUP BY 每测点一行）的扫描不算
+        table = match.group(1) if match else None
+        if table in models.Base.metadata.tables and table not in ALLOWED_FULL_SCANS and "INDEX" not in match.group(2):
+            problems.append(detail)
+    return problems
+
+def request(accept: str = None) -> Request:
+    """路由函数需要的 Request，accept 为空时按默认的逐行 JSON 返回"""
+    headers = [(b"accept", accept.encode())] if accept else []
+    return Request({"type": "http", "headers": headers})
+
+@pytest.fixture(scope="module")
+def seeded():
+    """本模块专用的测点、数据、告警规则和用户（编号带 QP 前缀，不影响其他测试的数据）"""
+    with database.SessionLocal() as db:
+        admin = crud.get_user_by_username(db, "admin") or crud.create_user(db, schemas.UserCreate(
+            username="admin", email="admin@example.com", password="admin123", role="admin"
+        ))
+        viewer = crud.create_user(db, schemas.UserCreate(username="qp_viewer", email="qp_viewer@example.com", password="viewer123"))
+        for code, device_type in [("QPIP1", "倒垂线"), ("QPSL1", "静力水准"), ("QPTL1", "引张线"), ("QPWL1", "水位")]:
+            crud.create_point(db, schemas.PointCreate(
+                point_code=code, point_name=code, device_type=device_type, longitude=120.0, latitude=30.0, height=100.0
+            ))
+        # 写入数据时按告警规则判断，水位规则会产生告警记录
+        crud.create_alert_rule(db, schemas.AlertRuleCreate(point_code="QPWL1", source="water_level", max_value=100.0, max_rate=1.0))
+        rule = crud.create_alert_rule(db, schemas.AlertRuleCreate(point_code="QPSL1", source="static_level", min_value=0.0))
+        start = datetime(2024, 1, 1)
+        measurements = []
+        for i in range(200):
+            time = start + timedelta(hours=7 * i)
+            measurements.append(crud.create_measurement(db, schemas.MeasurementCreate(point_code="QPIP1", value=i * 0.1, time=time, measurement_type="左右岸")).id)
+            crud.create_inverted_plumb_data(db, schemas.InvertedPlumbDataCreate(point_code="QPIP1", left_right_value=i, up_down_value=-i, time=time))
+            crud.create_static_level_data(db, schemas.StaticLevelDataCreate(point_code="QPSL1", value=i, time=time))
+            crud.create_tension_line_data(db, schemas.TensionLineDataCreate(point_code="QPTL1", value=i, time=time))
+            crud.create_water_level_data(db, schemas.WaterLevelDataCreate(point_code="QPWL1", value=i, time=time))
+        db.refresh(admin)
+        db.expunge(admin)
+        return SimpleNamespace(admin=admin, viewer_id=viewer.id, rule_id=rule.id, measurement_ids=measurements[2:4])
+
+@pytest.fixture(scope="module")
+def captured():
+    """记录接口（异步引擎）和脚本（同步引擎）发出的查询语句"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, parameters))
+
+    engines = (database.engine, database.async_engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", capture)
+
+def invalidating(cache, call):
+    """进程内缓存命中时不查询数据库，先使其失效以检查加载它的查询"""
+    def wrapped(db, ctx):
+        cache.invalidate()
+        return call(db, ctx)
+    return wrapped
+
+# (标签, call)：call 接收异步会话和 seeded，返回接口协程或 run_sync 的结果
+ROUTES = [
+    ("GET /points/", invalidating(point_cache, lambda db, ctx: main.read_points(request(), current_user=ctx.admin, db=db))),
+    ("data_versions.get", invalidating(data_versions, lambda db, ctx: data_versions.get(db, rollups.MEASUREMENTS, "QPIP1"))),
+    ("GET /measurements/search", lambda db, ctx: main.search_measurements(
+        Response(), start_time=T1, end_time=T2, device_type="倒垂线", point_name="QPIP",
+        cursor=None, skip=0, limit=200, current_user=ctx.admin, db=db)),
+    ("GET /measurements/search (no filter)", lambda db, ctx: main.search_measurements(
+        Response(), start_time=None, end_time=None, device_type=None, point_name=None,
+        cursor=None, skip=0, limit=200, current_user=ctx.admin, db=db)),
+    ("GET /measurements/search (cursor)", lambda db, ctx: main.search_measurements(
+        Response(), start_time=None, end_time=T2, device_type=None, point_name="QPIP",
+        cursor=CURSOR, skip=0, limit=50, current_user=ctx.admin, db=db)),
+    ("GET /measurements/latest", lambda db, ctx: main.get_all_latest_measurements(current_user=ctx.admin, db=db)),
+    ("POST /measurements/batch", lambda db, ctx: main.create_measurements_batch(
+        schemas.MeasurementBatch(measurements=[schemas.MeasurementCreate(point_code="QPIP1", value=1.0, time=T1)]),
+        return_rows=True, current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code}", lambda db, ctx: main.read_measurements(
+        "QPIP1", request(), Response(), max_points=50, bucket="lttb", current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code} (columnar)", lambda db, ctx: main.read_measurements(
+        "QPIP1", request(columnar.COLUMNAR_JSON), Response(), max_points=50, bucket="lttb", current_user=ctx.admin, db=db)),
+    ("POST /measurements/", lambda db, ctx: main.create_measurement(
+        schemas.MeasurementCreate(point_code="QPIP1", value=2.0, time=T2), current_user=ctx.admin, db=db)),
+    ("GET /points/{code}", invalidating(point_cache, lambda db, ctx: main.read_point_detail("QPIP1", current_user=ctx.admin, db=db))),
+    ("GET /measurements/{code}/stats", lambda db, ctx: main.get_measurement_stats(
+        "QPIP1", start_time=None, end_time=None, current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code}/stats (range)", lambda db, ctx: main.get_measurement_stats(
+        "QPIP1", start_time=T1, end_time=T2, current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code}/rollups", lambda db, ctx: main.get_measurement_rollups(
+        "QPIP1", granularity="day", start_time=T1, end_time=T2, current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code}/range", lambda db, ctx: main.get_measurements_by_range(
+        "QPIP1", request(), Response(), start_time=T1, end_time=T2, max_points=None, bucket="lttb", current_user=ctx.admin, db=db)),
+    ("PUT /measurements/{id}", lambda db, ctx: main.update_measurement(
+        ctx.measurement_ids[0], schemas.MeasurementUpdate(value=5.0, time=T2), current_user=ctx.admin, db=db)),
+    ("DELETE /measurements/{id}", lambda db, ctx: main.delete_measurement(ctx.measurement_ids[1], current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code}/latest", lambda db, ctx: main.get_latest_measurement("QPIP1", current_user=ctx.admin, db=db)),
+    ("POST /alerts/check", lambda db, ctx: main.check_alerts(
+        [schemas.AlertConfig(point_code="QPIP1", min_value=0.0, max_value=1.0)], mode="latest", start_time=None, end_time=None, db=db)),
+    ("POST /alerts/check (window)", lambda db, ctx: main.check_alerts(
+        [schemas.AlertConfig(point_code="QPIP1", min_value=0.0, max_value=1.0)], mode="window", start_time=T1, end_time=T2, db=db)),
+    ("GET /alerts", lambda db, ctx: main.read_alert_events(
+        Response(), active=None, point_code=None, start_time=None, cursor=None, skip=0, limit=100, current_user=ctx.admin, db=db)),
+    ("GET /alerts (active, point)", lambda db, ctx: main.read_alert_events(
+        Response(), active=True, point_code="QPWL1", start_time=T1, cursor=CURSOR, skip=0, limit=100, current_user=ctx.admin, db=db)),
+    ("GET /alerts/rules", lambda db, ctx: main.read_alert_rules(current_user=ctx.admin, db=db)),
+    ("POST /alerts/rules", lambda db, ctx: main.create_alert_rule(
+        schemas.AlertRuleCreate(point_code="QPTL1", source="tension_line", min_value=0.0), current_user=ctx.admin, db=db)),
+    ("PUT /alerts/rules/{id}", lambda db, ctx: main.update_alert_rule(
+        ctx.rule_id, schemas.AlertRuleUpdate(max_value=500.0), current_user=ctx.admin, db=db)),
+    ("DELETE /alerts/rules/{id}", lambda db, ctx: main.delete_alert_rule(ctx.rule_id, current_user=ctx.admin, db=db)),
+    ("GET /measurements/{code}/compare", lambda db, ctx: main.compare_measurements(
+        "QPIP1", current_time=T2, previous_time=T1, current_user=ctx.admin, db=db)),
+    ("POST /auth/login", lambda db, ctx: main.login(schemas.UserLogin(username="admin", password="admin123"), db=db)),
+    ("GET /auth/users", lambda db, ctx: main.read_users(Response(), cursor=None, skip=0, limit=100, current_user=ctx.admin, db=db)),
+    ("GET /auth/users (cursor)", lambda db, ctx: main.read_users(
+        Response(), cursor=pagination.encode_cursor(None, 1), skip=0, limit=100, current_user=ctx.admin, db=db)),
+    ("POST /auth/users", lambda db, ctx: main.create_user(schemas.UserCreate(
+        username="qp_viewer2", email="qp_viewer2@example.com", password="viewer123"), current_user=ctx.admin, db=db)),
+    ("PUT /auth/users/{id}", lambda db, ctx: main.update_user(ctx.viewer_id, {"role": "user"}, current_user=ctx.admin, db=db)),
+    ("DELETE /auth/users/{id}", lambda db, ctx: main.delete_user(ctx.viewer_id, current_user=ctx.admin, db=db)),
+    ("POST /points/", lambda db, ctx: main.create_point(schemas.PointCreate(
+        point_code="QPIP2", point_name="QPIP2", device_type="倒垂线", longitude=120.0, latitude=30.0, height=100.0), current_user=ctx.admin, db=db)),
+    ("PUT /points/{code}", lambda db, ctx: main.update_point(
+        "QPIP2", schemas.PointUpdate(point_name="QPIP2-new"), current_user=ctx.admin, db=db)),
+    ("DELETE /points/{code}", lambda db, ctx: main.delete_point("QPIP2", current_user=ctx.admin, db=db)),
+]
+
+INSTRUMENTS = [
+    ("inverted-plumb", "QPIP1", main.create_inverted_plumb_data, main.create_inverted_plumb_data_batch, schemas.InvertedPlumbDataBatch,
+     main.read_inverted_plumb_data, main.read_latest_inverted_plumb,
+     schemas.InvertedPlumbDataCreate(point_code="QPIP1", left_right_value=1.0, up_down_value=2.0)),
+    ("static-level", "QPSL1", main.create_static_level_data, main.create_static_level_data_batch, schemas.StaticLevelDataBatch,
+     main.read_static_level_data, main.read_latest_static_level,
+     schemas.StaticLevelDataCreate(point_code="QPSL1", value=1.0)),
+    ("tension-line", "QPTL1", main.create_tension_line_data, main.create_tension_line_data_batch, schemas.TensionLineDataBatch,
+     main.read_tension_line_data, main.read_latest_tension_line,
+     schemas.TensionLineDataCreate(point_code="QPTL1", value=1.0)),
+    ("water-level", "QPWL1", main.create_water_level_data, main.create_water_level_data_batch, schemas.WaterLevelDataBatch,
+     main.read_water_level_data, main.read_latest_water_level,
+     schemas.WaterLevelDataCreate(point_code="QPWL1", value=1.0)),
+]
+
+def instrument_routes(prefix, code, create, create_batch, batch_schema, reader, latest, payload) -> list:
+    return [
+        (f"GET /{prefix}/{{code}}", lambda db, ctx: reader(
+            code, request(), Response(), cursor=None, skip=0, limit=100, current_user=ctx.admin, db=db)),
+        (f"GET /{prefix}/{{code}} (cursor)", lambda db, ctx: reader(
+            code, request(), Response(), cursor=CURSOR, skip=0, limit=100, current_user=ctx.admin, db=db)),
+        (f"GET /{prefix}/{{code}} (columnar, cursor)", lambda db, ctx: reader(
+            code, request(columnar.ARROW_STREAM), Response(), cursor=CURSOR, skip=0, limit=100, current_user=ctx.admin, db=db)),
+        (f"POST /{prefix}/", lambda db, ctx: create(payload, current_user=ctx.admin, db=db)),
+        (f"POST /{prefix}/batch", lambda db, ctx: create_batch(
+            batch_schema(data=[payload, payload]), return_rows=False, current_user=ctx.admin, db=db)),
+        (f"GET /{prefix}/{{code}}/latest", lambda db, ctx: latest(code, current_user=ctx.admin, db=db)),
+    ]
+
+# 同步 crud 函数（脚本使用）通过 run_sync 在同一套会话上检查
+CRUD_FUNCTIONS = [
+    ("crud.get_user / get_user_by_*", lambda db, ctx: db.run_sync(lambda s: (
+        crud.get_user(s, ctx.admin.id), crud.get_user_by_username(s, "admin"), crud.get_user_by_email(s, "admin@example.com")))),
+    ("crud.get_points / get_point_by_code", lambda db, ctx: db.run_sync(lambda s: (
+        crud.get_points(s), crud.get_point_by_code(s, "QPIP1")))),
+    ("crud.get_measurements", lambda db, ctx: db.run_sync(
+        crud.get_measurements, "QPIP1", limit=100, cursor=(datetime(2024, 2, 1), 50))),
+    ("crud.get_latest_measurement", lambda db, ctx: db.run_sync(crud.get_latest_measurement, "QPIP1")),
+    ("crud.get_all_latest_measurements", lambda db, ctx: db.run_sync(crud.get_all_latest_measurements)),
+    ("crud.bulk_upsert", lambda db, ctx: db.run_sync(crud.bulk_upsert, rollups.INVERTED_PLUMB, [
+        {"point_code": "QPIP1", "left_right_value": 1.0, "up_down_value": 2.0, "time": datetime(2024, 1, 1, hour)}
+        for hour in range(3)
+    ])),
+    ("async_crud.get_user_by_username", lambda db, ctx: async_crud.get_user_by_username(db, "admin")),
+]
+
+CASES = ROUTES + [case for instrument in INSTRUMENTS for case in instrument_routes(*instrument)] + CRUD_FUNCTIONS
+
+async def call_with_session(call, ctx):
+    async with database.AsyncSessionLocal() as db:
+        try:
+            result = call(db, ctx)
+            if inspect.isawaitable(result):
+                await result
+        except HTTPException:
+            pass
+
+@pytest.mark.parametrize("label, call", CASES, ids=[label for label, _ in CASES])
+def test_no_full_scan_or_temp_sort(db, seeded, captured, label, call):
+    captured.clear()
+    asyncio.run(call_with_session(call, seeded))
+    statements = list(captured)
+    captured.clear()
+    assert statements, f"{label} 没有发出任何查询"
+
+    failures = []
+    for statement, parameters in statements:
+        plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        problems = problems_in(plan)
+        if problems:
+            failures.append(" ".join(statement.split()) + "\n   -> " + "\n   -> ".join(problems))
+    assert not failures, "\n".join(failures)
+
+def test_detects_full_scan_and_temp_sort(db):
+    plan = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN SELECT * FROM measurements WHERE value > 1 ORDER BY value").fetchall()
+    problems = problems_in(plan)
+    assert any(problem.startswith("SCAN measurements") for problem in problems)
+    assert any("USE TEMP B-TREE" in problem for problem in problems)
@@ -0,0 +1,110 @@
+"""条件请求与响应缓存：ETag 随数据版本变化，未变化时 304，响应体缓存按字节数淘汰"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from sql_app import columnar, crud, database, rollups, schemas
+from sql_app.response_cache import ResponseCache, response_cache
+
+START = datetime(2024, 8, 1)
+RANGE = {"start_time": "2024-08-01T00:00:00", "end_time": "2024-08-03T00:00:00"}
+
+@pytest.fixture(scope="module")
+def cached_point():
+    with database.SessionLocal() as db:
+        crud.create_point(db, schemas.PointCreate(point_code="ETAG1", point_name="ETAG1", device_type="倒垂线", longitude=0, latitude=0, height=0))
+        crud.create_point(db, schemas.PointCreate(point_code="ETAG2", point_name="ETAG2", device_type="倒垂线", longitude=0, latitude=0, height=0))
+        crud.bulk_create(db, rollups.MEASUREMENTS, [
+            schemas.MeasurementCreate(point_code=code, value=i, time=START + timedelta(hours=i), measurement_type="左右岸")
+            for code in ("ETAG1", "ETAG2")
+            for i in range(10)
+        ])
+    return "ETAG1"
+
+def get_range(client, headers, point_code="ETAG1", **extra):
+    return client.get(f"/measurements/{point_code}/range", params=RANGE, headers={**headers, **extra})
+
+def test_etag_and_304(client, admin_headers, cached_point):
+    first = get_range(client, admin_headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    assert first.headers["Vary"] == "Accept"
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert "Last-Modified" in first.headers
+
+    # 同一请求的 ETag 不变；查询参数顺序不同视为同一请求
+    assert get_range(client, admin_headers).headers["ETag"] == etag
+    reordered = client.get(f"/measurements/{cached_point}/range?end_time={RANGE['end_time']}&start_time={RANGE['start_time']}", headers=admin_headers)
+    assert reordered.headers["ETag"] == etag
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        not_modified = get_range(client, admin_headers, **{"If-None-Match": header})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+    assert get_range(client, admin_headers, **{"If-None-Match": '"other"'}).status_code == 200
+
+def test_write_changes_etag(client, admin_headers, cached_point):
+    before = get_range(client, admin_headers)
+    other = get_range(client, admin_headers, "ETAG2")
+    etag = before.headers["ETag"]
+
+    created = client.post("/measurements/", json={
+        "point_code": cached_point, "value": 99, "time": "2024-08-02T12:00:00", "measurement_type": "左右岸"
+    }, headers=admin_headers)
+    assert created.status_code == 200, created.text
+
+    after = get_range(client, admin_headers, **{"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert len(after.json()) == len(before.json()) + 1
+    assert get_range(client, admin_headers, **{"If-None-Match": after.headers["ETag"]}).status_code == 304
+    # 其他测点的版本号不变
+    assert get_range(client, admin_headers, "ETAG2", **{"If-None-Match": other.headers["ETag"]}).status_code == 304
+
+def test_etag_varies_by_format(client, admin_headers, cached_point):
+    row_json = get_range(client, admin_headers)
+    columnar_json = get_range(client, admin_headers, Accept=columnar.COLUMNAR_JSON)
+    assert columnar_json.headers["content-type"] == columnar.COLUMNAR_JSON
+    assert columnar_json.headers["ETag"] != row_json.headers["ETag"]
+    # 另一种格式的 ETag 不能让逐行 JSON 请求得到 304
+    assert get_range(client, admin_headers, **{"If-None-Match": columnar_json.headers["ETag"]}).status_code == 200
+
+def test_if_modified_since(client, admin_headers, cached_point):
+    last_modified = get_range(client, admin_headers).headers["Last-Modified"]
+    assert get_range(client, admin_headers, **{"If-Modified-Since": last_modified}).status_code == 304
+    earlier = format_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc), usegmt=True)
+    assert get_range(client, admin_headers, **{"If-Modified-Since": earlier}).status_code == 200
+
+def test_unauthenticated_request_gets_no_304(client, admin_headers, cached_point):
+    etag = get_range(client, admin_headers).headers["ETag"]
+    assert client.get(f"/measurements/{cached_point}/range", params=RANGE, headers={"If-None-Match": etag}).status_code == 401
+
+def test_repeat_request_served_from_cache(client, admin_headers, cached_point):
+    first = get_range(client, admin_headers, "ETAG2")
+    hits = response_cache.hits
+    second = get_range(client, admin_headers, "ETAG2")
+    assert response_cache.hits == hits + 1
+    assert second.content == first.content
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.headers["content-type"] == first.headers["content-type"]
+
+def test_lru_byte_bound():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("a", "1", b"aaaa", [])
+    cache.put("b", "1", b"bbbb", [])
+    assert cache.get("a", "1") == (b"aaaa", [])
+    # 超出上限时淘汰最久未使用的 b
+    cache.put("c", "1", b"cccc", [])
+    assert cache.size == 8
+    assert cache.get("b", "1") is None
+    assert cache.get("a", "1") is not None and cache.get("c", "1") is not None
+    # 单个超过上限的响应体不缓存；ETag 不同视为过期
+    cache.put("d", "1", b"x" * 11, [])
+    assert cache.get("d", "1") is None
+    assert cache.get("a", "2") is None
+    # 覆盖同一个键时按新的大小计算
+    cache.put("a", "2", b"aa", [])
+    assert cache.size == 6
@@ -0,0 +1,233 @@
+"""汇总表统计：与按原始数据的统计结果一致"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from sql_app import crud, database, models, rollups, schemas
+
+START = datetime(2024, 1, 1)
+
+def add_point(db, point_code: str) -> str:
+    crud.create_point(db, schemas.PointCreate(
+        point_code=point_code, point_name=point_code, device_type="倒垂线", longitude=0, latitude=0, height=0
+    ))
+    return point_code
+
+@pytest.fixture(scope="module")
+def hourly_point():
+    """2024-01-01 起每小时一条，共 48 条，数值为序号"""
+    with database.SessionLocal() as db:
+        code = add_point(db, "STATS_TZ")
+        crud.bulk_create(db, rollups.MEASUREMENTS, [
+            schemas.MeasurementCreate(point_code=code, value=i, time=START + timedelta(hours=i), measurement_type="左右岸")
+            for i in range(48)
+        ])
+    return code
+
+@pytest.mark.parametrize("params, count", [
+    ({"start_time": "2024-01-01T12:00:00"}, 36),
+    ({"start_time": "2024-01-01T12:00:00Z"}, 36),
+    ({"start_time": "2024-01-01T20:00:00+08:00"}, 36),
+    ({"end_time": "2024-01-01T11:00:00"}, 12),
+    ({"end_time": "2024-01-01T11:00:00Z"}, 12),
+    ({"end_time": "2024-01-01T19:00:00+08:00"}, 12),
+    ({"start_time": "2024-01-01T12:00:00Z", "end_time": "2024-01-02T03:00:00+08:00"}, 8),
+])
+def test_stats_one_sided_and_aware(client, admin_headers, hourly_point, params, count):
+    response = client.get(f"/measurements/{hourly_point}/stats", params=params, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["count"] == count
+
+def test_aware_bounds_match_naive_utc(db, hourly_point):
+    aware = datetime.fromisoformat("2024-01-01T15:30:00+08:00")
+    naive = datetime(2024, 1, 1, 7, 30)
+    assert rollups.query_stats(db, rollups.MEASUREMENTS, hourly_point, aware) == rollups.query_stats(db, rollups.MEASUREMENTS, hourly_point, naive)
+    assert rollups.query_stats(db, rollups.MEASUREMENTS, hourly_point, None, aware) == rollups.query_stats(db, rollups.MEASUREMENTS, hourly_point, None, naive)
+
+def raw_stats(db, point_code: str, start=None, end=None, measurement_type=None):
+    """按原始数据统计 [start, end]，与 query_stats 的返回格式相同"""
+    m = models.Measurement
+    query = db.query(
+        func.count(m.value), func.sum(m.value), func.min(m.value), func.max(m.value), func.min(m.time), func.max(m.time)
+    ).filter(m.point_code == point_code)
+    if start is not None:
+        query = query.filter(m.time >= start)
+    if end is not None:
+        query = query.filter(m.time <= end)
+    if measurement_type is not None:
+        query = query.filter(m.measurement_type == measurement_type)
+    count, total, low, high, earliest, latest = query.one()
+    if not count:
+        return None
+    return {"count": count, "sum": pytest.approx(total), "min": low, "max": high, "earliest_time": earliest, "latest_time": latest}
+
+def random_times(rng: random.Random, count: int) -> list:
+    """2023-11 ~ 2024-03 的随机时刻，混入落在整点、零点和月初上的时刻"""
+    begin = datetime(2023, 11, 1)
+    span = int((datetime(2024, 3, 31) - begin).total_seconds())
+    times = [begin + timedelta(seconds=rng.randrange(span), microseconds=rng.choice([0, 0, rng.randrange(10 ** 6)])) for _ in range(count)]
+    times += [datetime(2023, 12, 1), datetime(2024, 1, 1), datetime(2024, 2, 1), datetime(2024, 2, 29, 23, 59, 59, 999999)]
+    times += [rollups.bucket_start(rng.choice(times), granularity) for granularity in rollups.GRANULARITIES for _ in range(20)]
+    return times
+
+def random_bound(rng: random.Random, times: list):
+    """查询边界：随机时刻、恰好为某个读数的时刻、某个时间桶的起点，或不限"""
+    choice = rng.randrange(5)
+    if choice == 0:
+        return None
+    if choice == 1:
+        return rng.choice(times)
+    if choice == 2:
+        return rollups.bucket_start(rng.choice(times), rng.choice(rollups.GRANULARITIES))
+    return datetime(2023, 10, 15) + timedelta(seconds=rng.randrange(200 * 86400))
+
+@pytest.fixture(scope="module")
+def random_point():
+    rng = random.Random(20240101)
+    with database.SessionLocal() as db:
+        code = add_point(db, "ROLLUP_RAND")
+        times = random_times(rng, 1500)
+        crud.bulk_create(db, rollups.MEASUREMENTS, [
+            schemas.MeasurementCreate(point_code=code, value=round(rng.uniform(-50, 50), 3), time=t, measurement_type=rng.choice(["左右岸", "上下游"]))
+            for t in times
+        ])
+    return code, times
+
+def assert_matches_raw(db, point_code: str, times: list, rng: random.Random, ranges: int):
+    assert rollups.query_stats(db, rollups.MEASUREMENTS, point_code) == raw_stats(db, point_code)
+    for _ in range(ranges):
+        start, end = random_bound(rng, times), random_bound(rng, times)
+        if start is not None and end is not None and start > end:
+            start, end = end, start
+        measurement_type = rng.choice([None, "左右岸", "上下游"])
+        expected = raw_stats(db, point_code, start, end, measurement_type)
+        assert rollups.query_stats(db, rollups.MEASUREMENTS, point_code, start, end, measurement_type) == expected, (start, end, measurement_type)
+
+def test_random_ranges_match_raw(db, random_point):
+    code, times = random_point
+    assert_matches_raw(db, code, times, random.Random(1), 400)
+
+@pytest.mark.parametrize("start, end", [
+    # 跨月、跨年，以及恰好落在桶边界上的区间
+    (datetime(2023, 11, 15, 7, 30), datetime(2024, 2, 3, 12, 0)),
+    (datetime(2023, 12, 1), datetime(2024, 1, 31, 23, 59, 59, 999999)),
+    (datetime(2023, 12, 1), datetime(2024, 2, 1)),
+    (datetime(2023, 12, 31, 23), datetime(2024, 1, 1, 1)),
+    (datetime(2024, 1, 1), datetime(2024, 1, 1)),
+    (datetime(2024, 2, 29, 23, 59, 59, 999999), datetime(2024, 3, 1)),
+    (datetime(2023, 11, 30, 23, 59, 59, 999999), datetime(2024, 3, 1, 0, 0, 0, 1)),
+])
+def test_month_boundaries_match_raw(db, random_point, start, end):
+    code, _ = random_point
+    assert rollups.query_stats(db, rollups.MEASUREMENTS, code, start, end) == raw_stats(db, code, start, end)
+
+def fetch_range(client, headers, point_code: str, start, end, **params):
+    params = {"start_time": start.isoformat() if isinstance(start, datetime) else start,
+              "end_time": end.isoformat() if isinstance(end, datetime) else end, **params}
+    response = client.get(f"/measurements/{point_code}/range", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response
+
+def test_range_matches_raw_rows(client, admin_headers, db, random_point):
+    code, times = random_point
+    rng = random.Random(3)
+    m = models.Measurement
+    for _ in range(60):
+        start, end = sorted(rng.choice(times) if rng.random() < 0.5 else datetime(2023, 10, 15) + timedelta(seconds=rng.randrange(200 * 86400)) for _ in range(2))
+        response = fetch_range(client, admin_headers, code, start, end)
+        rows = db.query(m.id, m.value).filter(m.point_code == code, m.time >= start, m.time <= end).all()
+        assert sorted(item["id"] for item in response.json()) == sorted(row.id for row in rows), (start, end)
+        assert int(response.headers["X-Range-Count"]) == len(rows)
+        if rows:
+            assert float(response.headers["X-Range-Min"]) == min(row.value for row in rows)
+            assert float(response.headers["X-Range-Max"]) == max(row.value for row in rows)
+        else:
+            assert "X-Range-Min" not in response.headers
+
+def test_range_headers_describe_whole_range_when_downsampled(client, admin_headers, hourly_point):
+    response = fetch_range(client, admin_headers, hourly_point, START, START + timedelta(days=3), max_points=5)
+    assert len(response.json()) == 5
+    assert (response.headers["X-Range-Count"], response.headers["X-Range-Min"], response.headers["X-Range-Max"]) == ("48", "0.0", "47.0")
+
+def test_range_aware_bounds(client, admin_headers, hourly_point):
+    response = fetch_range(client, admin_headers, hourly_point, "2024-01-01T20:00:00+08:00", "2024-01-01T14:00:00Z")
+    assert [item["value"] for item in response.json()] == [12, 13, 14]
+
+def test_empty_range_skips_raw_scan(client, admin_headers, hourly_point, monkeypatch):
+    from sql_app import async_crud
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("范围内无数据时不应扫描原始数据")
+
+    monkeypatch.setattr(async_crud, "get_measurement_columns", fail)
+    response = fetch_range(client, admin_headers, hourly_point, datetime(2023, 1, 1), datetime(2023, 6, 1))
+    assert response.json() == []
+    assert response.headers["X-Range-Count"] == "0"
+
+def test_cover_is_contiguous_and_aligned():
+    rng = random.Random(7)
+    for _ in range(500):
+        start = datetime(2023, 1, 1) + timedelta(seconds=rng.randrange(2 * 365 * 86400), microseconds=rng.randrange(10 ** 6))
+        end = start + timedelta(seconds=rng.randrange(rng.choice([3600, 86400, 400 * 86400])))
+        pieces = rollups._cover(start, end, len(rollups.GRANULARITIES) - 1)
+        if start == end:
+            assert pieces == []
+            continue
+        assert pieces[0][1] == start and pieces[-1][2] == end
+        for (_, _, hi), (_, lo, _) in zip(pieces, pieces[1:]):
+            assert hi == lo
+        for granularity, lo, hi in pieces:
+            assert lo < hi
+            if granularity is not None:
+                assert rollups.bucket_start(lo, granularity) == lo and rollups.bucket_start(hi, granularity) == hi
+
+def rollup_rows(db, point_code: str) -> dict:
+    table = models.MeasurementRollup
+    rows = db.query(table).filter(table.source == rollups.MEASUREMENTS, table.point_code == point_code)
+    return {
+        (r.granularity, r.bucket_start, r.measurement_type): (r.count, pytest.approx(r.sum_value), r.min_value, r.max_value, r.first_time, r.last_time)
+        for r in rows
+    }
+
+def expected_rollup_rows(db, point_code: str) -> dict:
+    """按原始数据重新汇总，与增量维护的汇总表对比"""
+    m = models.Measurement
+    items = db.query(m).filter(m.point_code == point_code).all()
+    buckets = rollups._aggregate(rollups.MEASUREMENTS, rollups.readings_of(rollups.MEASUREMENTS, items))
+    return {(key[2], key[3], key[4]): (b[0], b[1], b[2], b[3], b[4], b[6]) for key, b in buckets.items()}
+
+def test_update_and_delete_keep_rollups_in_sync(db):
+    rng = random.Random(99)
+    code = add_point(db, "ROLLUP_EDIT")
+    times = random_times(rng, 600)
+    rows = crud.bulk_create(db, rollups.MEASUREMENTS, [
+        schemas.MeasurementCreate(point_code=code, value=round(rng.uniform(-50, 50), 3), time=t, measurement_type=rng.choice(["左右岸", "上下游"]))
+        for t in times
+    ])
+    ids = [row.id for row in rows]
+    rng.shuffle(ids)
+    # 修改数值、把数据挪到别的月份、修改测量类型，以及删除（包括各桶的最值和首尾值所在的行）
+    for measurement_id in ids[:60]:
+        crud.update_measurement(db, measurement_id, schemas.MeasurementUpdate(value=round(rng.uniform(-100, 100), 3)))
+    for measurement_id in ids[60:100]:
+        crud.update_measurement(db, measurement_id, schemas.MeasurementUpdate(time=rng.choice(times) + timedelta(days=rng.randrange(-40, 40))))
+    for measurement_id in ids[100:120]:
+        crud.update_measurement(db, measurement_id, schemas.MeasurementUpdate(measurement_type="上下游"))
+    for measurement_id in ids[120:220]:
+        assert crud.delete_measurement(db, measurement_id)
+
+    assert rollup_rows(db, code) == expected_rollup_rows(db, code)
+    assert_matches_raw(db, code, times, random.Random(2), 200)
+
+def test_delete_everything_clears_rollups(db):
+    code = add_point(db, "ROLLUP_EMPTY")
+    rows = crud.bulk_create(db, rollups.MEASUREMENTS, [
+        schemas.MeasurementCreate(point_code=code, value=i, time=datetime(2024, 1, 31, 23) + timedelta(hours=i), measurement_type="左右岸")
+        for i in range(3)
+    ])
+    for row in rows:
+        crud.delete_measurement(db, row.id)
+    assert rollup_rows(db, code) == {}
+    assert rollups.query_stats(db, rollups.MEASUREMENTS, code) is None
@@ -0,0 +1,67 @@
+"""SQLite 单写入者：等待写入的请求被取消后，写入线程仍继续处理之后的写入"""
+import asyncio
+import threading
+
+import pytest
+
+from sql_app.writer import WriteQueue
+
+class FakeQueue(WriteQueue):
+    """不写数据库，_commit 把每个请求的数据原样作为写入结果；gate 未打开时阻塞在提交中"""
+
+    def __init__(self):
+        super().__init__(interval=0.01, max_rows=1000)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.committed = []
+
+    def _commit(self, jobs):
+        self.gate.wait(5)
+        self.committed.extend(items for _, items, _ in jobs)
+        return [items for _, items, _ in jobs]
+
+def test_cancelled_while_committing():
+    queue = FakeQueue()
+    queue.gate.clear()
+
+    async def scenario():
+        task = asyncio.ensure_future(asyncio.wrap_future(queue.submit("measurements", [1])))
+        await asyncio.sleep(0.1)
+        # 写入已在提交中，请求被取消（客户端断开）
+        task.cancel()
+        queue.gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await asyncio.wait_for(asyncio.wrap_future(queue.submit("measurements", [2])), 5)
+
+    assert asyncio.run(scenario()) == [2]
+    assert queue._thread.is_alive()
+
+def test_cancelled_before_commit_is_skipped():
+    queue = FakeQueue()
+    queue.gate.clear()
+    blocker = queue.submit("measurements", [1])
+    # 写入线程阻塞在第一批，这一批仍在排队时被取消
+    cancelled = queue.submit("measurements", [2])
+    assert cancelled.cancel()
+    queue.gate.set()
+    assert blocker.result(5) == [1]
+    assert queue.submit("measurements", [3]).result(5) == [3]
+    assert queue.committed == [[1], [3]]
+
+def test_unexpected_error_goes_to_submitter():
+    queue = FakeQueue()
+    queue._write = lambda jobs: (_ for _ in ()).throw(RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        queue.submit("measurements", [1]).result(5)
+    del queue._write
+    assert queue.submit("measurements", [2]).result(5) == [2]
+
+def test_dead_thread_is_restarted():
+    queue = FakeQueue()
+    assert queue.submit("measurements", [1]).result(5) == [1]
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    queue._thread = dead
+    assert queue.submit("measurements", [2]).result(5) == [2]
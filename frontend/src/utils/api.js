@@ -69,4 +69,37 @@ export const logout = () => {
     localStorage.removeItem('user');
 };
 
+// 订阅新写入的监测数据（WebSocket /ws/measurements），代替轮询最新值接口
+// filters 形如 { source: 'measurements', point_code: 'IP1' }，值可以是数组；onData 收到 { source, data: [数据行...] }
+// 连接断开后自动重连，返回取消订阅的函数
+export const subscribeMeasurements = (filters, onData) => {
+  let socket = null;
+  let timer = null;
+  let closed = false;
+
+  const connect = () => {
+    const params = new URLSearchParams();
+    const token = localStorage.getItem('token');
+    if (token) params.append('token', token);
+    Object.entries(filters || {}).forEach(([key, value]) => {
+      [].concat(value).filter((v) => v !== undefined && v !== null && v !== '').forEach((v) => params.append(key, v));
+    });
+    socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/ws/measurements?${params}`);
+    socket.onmessage = (event) => onData(JSON.parse(event.data));
+    socket.onclose = (event) => {
+      // 1008 为令牌无效，不再重连
+      if (!closed && event.code !== 1008) {
+        timer = setTimeout(connect, 3000);
+      }
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (socket) socket.close();
+  };
+};
+
 export default api;